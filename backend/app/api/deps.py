@@ -1,6 +1,7 @@
 from collections.abc import Generator
 from typing import Annotated
 
+import httpx
 from fastapi import Depends, FastAPI, Header, HTTPException, Request
 from loguru import logger
 from redis import StrictRedis
@@ -28,6 +29,17 @@ def get_redis(req: Request) -> StrictRedis:
     return app.state.redis
 
 
+def get_agent_client(req: Request) -> httpx.AsyncClient:
+    """获取请求智能体的asyncio客户端
+
+    该客户端在app的lifespan中实例化，所有请求共享连接池。
+    """
+
+    app: FastAPI = req.app
+
+    return app.state.agent_client
+
+
 def get_isc_token(Token: Annotated[str, Header()]) -> str:
     """获取header中的Token的值"""
 
@@ -40,6 +52,7 @@ SessionDep = Annotated[Session, Depends(get_db)]
 IscTokenDep = Annotated[str, Depends(get_isc_token)]
 VerifyIscTokenDep = Depends(get_isc_token)
 RedisDep = Annotated[StrictRedis, Depends(get_redis)]
+AgentClientDep = Annotated[httpx.AsyncClient, Depends(get_agent_client)]
 
 # ------------ ISC 用户信息逻辑 ------------
 
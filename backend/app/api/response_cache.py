@@ -0,0 +1,215 @@
+"""只读接口的响应缓存
+
+前端在审查过程中不断轮询分析统计、项目的文档列表和核查结果，每次都从数据库重新查询相同的结果。
+这些接口的响应(序列化后的json)缓存在redis中, 键由 路由 + 用户范围 + 参数 + 标签的版本号 组成:
+
+- 标签: 缓存依赖的数据, 如分析统计(`analysis`)、某个项目的文档及内容(`project:<id>`)
+- 失效: 修改数据的事务提交后, 调用 `invalidate_response_cache` 将相关标签的版本号+1,
+  之后的请求使用新的键，旧的缓存不再被读取，到期后由redis删除
+
+先读取标签的版本号再查询数据库，版本号增加前写入的旧结果只会保存在旧的键中，不会被读取到。
+
+响应带有ETag(响应内容的sha1), 请求的 If-None-Match 与之相同时返回304。
+redis 不可用时只记录日志，直接查询数据库，不影响接口。
+"""
+
+import hashlib
+import json
+import threading
+import uuid
+from collections.abc import Callable
+from typing import Any
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from loguru import logger
+from redis import RedisError, StrictRedis
+
+from app.api.schems import UserinfoResp
+from app.api.utils import etag_matches
+from app.core.config import settings
+from app.core.redis import get_redis_client
+
+RESPONSE_CACHE_PREFIX = "resp"
+RESPONSE_CACHE_GEN_KEY = "resp:gen"  # hash, 标签 -> 版本号
+RESPONSE_CACHE_STATS_KEY = "resp:stats"
+
+# 标签
+ANALYSIS_TAG = "analysis"
+
+
+def project_tag(proj_id: uuid.UUID | str) -> str:
+    """某个项目的文档、文档内容的标签"""
+
+    if isinstance(proj_id, str):
+        proj_id = uuid.UUID(proj_id)
+
+    return f"project:{proj_id.hex}"
+
+
+def user_scope(uinfo: UserinfoResp) -> str:
+    """接口按用户过滤时的缓存范围, 超级用户可以看到所有用户的数据"""
+
+    return "superuser" if uinfo.is_superuser else f"user:{uinfo.id}"
+
+
+class ResponseCache:
+    """基于redis的响应缓存"""
+
+    def __init__(self, redis: StrictRedis, ttl: int) -> None:
+        self._redis = redis
+        self._ttl = ttl
+
+    def key(
+        self, route: str, scope: str, params: dict[str, Any], tags: list[str]
+    ) -> str:
+        """缓存的键, 包含标签当前的版本号, 须在查询数据库之前获取"""
+
+        gens: list[bytes | None] = self._redis.hmget(RESPONSE_CACHE_GEN_KEY, tags)  # type: ignore
+
+        raw = json.dumps(
+            {
+                "params": params,
+                "gens": {
+                    tag: int(gen or 0) for tag, gen in zip(tags, gens, strict=True)
+                },
+            },
+            sort_keys=True,
+            default=str,
+        )
+        digest = hashlib.sha1(raw.encode()).hexdigest()
+
+        return f"{RESPONSE_CACHE_PREFIX}:{route}:{scope}:{digest}"
+
+    def get(self, route: str, key: str) -> bytes | None:
+        """获取缓存的响应内容, 未命中时返回None"""
+
+        body: bytes | None = self._redis.get(key)  # type: ignore
+
+        self._redis.hincrby(
+            RESPONSE_CACHE_STATS_KEY,
+            f"{route}:{'hits' if body is not None else 'misses'}",
+            1,
+        )
+
+        return body
+
+    def set(self, key: str, body: bytes) -> None:
+        self._redis.setex(key, self._ttl, body)
+
+    def invalidate(self, *tags: str) -> None:
+        """标签的版本号+1, 依赖这些标签的缓存全部失效"""
+
+        with self._redis.pipeline(transaction=False) as pipe:
+            for tag in tags:
+                pipe.hincrby(RESPONSE_CACHE_GEN_KEY, tag, 1)
+
+            pipe.execute()
+
+    def stats(self) -> dict[str, int]:
+        """各路由命中和未命中的次数, 如: {"analysis.overview:hits": 10}"""
+
+        raw: dict[bytes, bytes] = self._redis.hgetall(RESPONSE_CACHE_STATS_KEY)  # type: ignore
+
+        return {k.decode(): int(v) for k, v in raw.items()}
+
+
+_response_cache: ResponseCache | None = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache | None:
+    """获取进程共享的响应缓存, 未启用缓存时返回None"""
+
+    global _response_cache
+
+    if not settings.RESPONSE_CACHE_ENABLED:
+        return None
+
+    with _response_cache_lock:
+        if _response_cache is None:
+            redis = get_redis_client()
+            _response_cache = ResponseCache(redis, settings.RESPONSE_CACHE_TTL)
+
+    return _response_cache
+
+
+def render_json(content: Any) -> bytes:
+    """与 FastAPI 默认的 JSONResponse 相同的序列化"""
+
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def cached_json_response(
+    request: Request,
+    route: str,
+    scope: str,
+    params: dict[str, Any],
+    tags: list[str],
+    create_func: Callable[[], Any],
+) -> Response:
+    """缓存接口的json响应, 并支持If-None-Match条件请求
+
+    Args:
+        request: 请求, 用于读取If-None-Match
+        route: 路由的名称, 如 `analysis.overview`
+        scope: 用户范围, 接口的结果与用户无关时为 `all`, 否则见 `user_scope`
+        params: 影响结果的参数
+        tags: 结果依赖的数据的标签
+        create_func: 查询数据库, 返回响应的内容(模型)
+    """
+
+    response_cache = get_response_cache()
+    key: str | None = None
+
+    if response_cache is not None:
+        try:
+            key = response_cache.key(route, scope, params, tags)
+            body = response_cache.get(route, key)
+
+            if body is not None:
+                return json_response(request, body)
+
+        except RedisError as e:
+            logger.warning(f"【{route}】读取响应缓存失败: {e}")
+
+    body = render_json(create_func())
+
+    if response_cache is not None and key is not None:
+        try:
+            response_cache.set(key, body)
+
+        except RedisError as e:
+            logger.warning(f"【{route}】写入响应缓存失败: {e}")
+
+    return json_response(request, body)
+
+
+def json_response(request: Request, body: bytes) -> Response:
+    """带ETag的json响应, If-None-Match与ETag相同时返回304"""
+
+    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if_none_match = request.headers.get("if-none-match")
+
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def invalidate_response_cache(*tags: str) -> None:
+    """修改数据的事务提交后调用, 使依赖这些标签的缓存失效, 出错时只记录日志"""
+
+    response_cache = get_response_cache()
+
+    if response_cache is None or not tags:
+        return
+
+    try:
+        response_cache.invalidate(*tags)
+
+    except RedisError as e:
+        logger.warning(f"响应缓存失效失败: {tags}, 错误: {e}")
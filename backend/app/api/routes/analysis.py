@@ -5,10 +5,13 @@ from typing import Annotated, Literal
 from fastapi import (
     APIRouter,
     Query,
+    Request,
+    Response,
 )
 from sqlmodel import Session, func, select
 
 from app.api.deps import SessionDep
+from app.api.response_cache import ANALYSIS_TAG, cached_json_response
 from app.api.schems import (
     AnalysisBarChartData,
     AnalysisOverviewTotal,
@@ -19,13 +22,9 @@ from app.api.schems import (
     QuestionSuggestionChartData,
 )
 
-# 文档及内容的模型
-from app.models.documents import (
-    Document,
-    DocumentContentReview,
-    Project,
-)
-from app.models.enums import ReviewStatus
+# 分析统计的日汇总
+from app.models.analysis import AnalysisDailyStat
+from app.models.enums import AnalysisMetric, ReviewStatus
 
 
 class OverviewTimeType(StrEnum):
@@ -39,15 +38,22 @@ class AnalysisRoute:
     router = APIRouter(prefix="/analysis", tags=["analysis"])
 
     def __init__(self) -> None:
-        self.router.get("/overview")(self.get_overview_data)
-        self.router.get("/question")(self.get_question_data)
-        self.router.get("/suggestion")(self.get_suggestion_data)
+        self.router.get(
+            "/overview", response_model=tuple[AnalysisOverviewTotal, ...]
+        )(self.get_overview_data)
+        self.router.get("/question", response_model=QuestionSuggestionChartData)(
+            self.get_question_data
+        )
+        self.router.get("/suggestion", response_model=QuestionSuggestionChartData)(
+            self.get_suggestion_data
+        )
 
     def get_overview_data(
         self,
+        request: Request,
         session: SessionDep,
         time_type: Annotated[OverviewTimeType, Query(description="统计的时间维度")],
-    ) -> tuple[AnalysisOverviewTotal, ...]:
+    ) -> Response:
         """系统概览统计
 
         支持按多个时间维度统计4个总量：
@@ -56,8 +62,24 @@ class AnalysisRoute:
         - 文档总数
         - 等待审查 (工程数)
         - 审查完毕 (工程数)
+
+        结果缓存在redis中, 分析统计的日汇总刷新时失效。
         """
 
+        return cached_json_response(
+            request,
+            "analysis.overview",
+            "all",
+            analysis_params(time_type),
+            [ANALYSIS_TAG],
+            lambda: self.get_overview_total(session, time_type),
+        )
+
+    def get_overview_total(
+        self, session: Session, time_type: OverviewTimeType
+    ) -> tuple[AnalysisOverviewTotal, ...]:
+        """系统概览的4个总量"""
+
         # 工程总量
         proj_total = self.get_proj_total(session, time_type)
 
@@ -91,33 +113,10 @@ class AnalysisRoute:
             amplitude="0%",
         )
 
-        statebase = (
-            select(func.count())
-            .select_from(Document)
-            .where(Document.is_delete == False)  # noqa: E712
+        cur_total, prev_total = get_cur_prev_stat_total(
+            session, time_type, AnalysisMetric.DOCUMENT
         )
 
-        if time_type == OverviewTimeType.ALL:
-            statement = statebase
-            cur_total = session.exec(statement).one()
-
-            prev_total = 0
-
-        else:
-            cur_date, prev_date = get_cur_prev_date(time_type)
-
-            assert cur_date is not None
-            assert prev_date is not None
-
-            cur_total_statement = statebase.where(Document.create_at >= cur_date)
-            cur_total = session.exec(cur_total_statement).one()
-
-            prev_total_statement = statebase.where(
-                cur_date > Document.create_at,
-                Document.create_at >= prev_date,
-            )
-            prev_total = session.exec(prev_total_statement).one()
-
         overview_total.total = cur_total
         overview_total.prevTotal = prev_total
         overview_total.isUp = cur_total > prev_total
@@ -141,8 +140,6 @@ class AnalysisRoute:
     ) -> AnalysisOverviewTotal:
         """获取等待审查总量"""
 
-        filter_date_field = Project.create_at
-
         if review_status is None:
             overview_total = AnalysisOverviewTotal(
                 title="工程总量",
@@ -164,7 +161,6 @@ class AnalysisRoute:
                 isUp=False,
                 amplitude="0%",
             )
-            filter_date_field = Project.review_begin_at  # type: ignore
         else:
             overview_total = AnalysisOverviewTotal(
                 title="审查完毕",
@@ -175,41 +171,17 @@ class AnalysisRoute:
                 isUp=False,
                 amplitude="0%",
             )
-            filter_date_field = Project.review_done_at  # type: ignore
 
-        # 构造基础的where过滤语句
-        statebase = (
-            select(func.count())
-            .select_from(Project)
-            .where(
-                Project.is_delete == False  # noqa: E712
+        # 根据不同日期类型，汇总当前值和上一个日期的值。
+        # 等待审查按开始审查的日期，审查完毕按审核完成的日期统计
+        if review_status is None:
+            cur_total, prev_total = get_cur_prev_stat_total(
+                session, time_type, AnalysisMetric.PROJECT
             )
-        )
-
-        if review_status is not None:
-            statebase = statebase.where(Project.review_status == review_status)
-
-        # 根据不同日期类型，构造不同的当前值和上一个日期的值。
-        if time_type == OverviewTimeType.ALL:
-            statement = statebase
-            cur_total = session.exec(statement).one()
-
-            prev_total = 0
-
         else:
-            cur_date, prev_date = get_cur_prev_date(time_type)
-
-            assert cur_date is not None
-            assert prev_date is not None
-
-            cur_total_statement = statebase.where(filter_date_field >= cur_date)  # type: ignore
-            cur_total = session.exec(cur_total_statement).one()
-
-            prev_total_statement = statebase.where(
-                cur_date > filter_date_field,  # type: ignore
-                filter_date_field >= prev_date,  # type: ignore
+            cur_total, prev_total = get_cur_prev_stat_total(
+                session, time_type, AnalysisMetric.PROJECT_STATUS, review_status.value
             )
-            prev_total = session.exec(prev_total_statement).one()
 
         overview_total.total = cur_total
         overview_total.prevTotal = prev_total
@@ -226,19 +198,33 @@ class AnalysisRoute:
 
     def get_question_data(
         self,
+        request: Request,
         session: SessionDep,
         time_type: Annotated[OverviewTimeType, Query(description="统计的时间维度")],
-    ) -> QuestionSuggestionChartData:
-        return self.get_qs_total(session, "question", time_type)
+    ) -> Response:
+        return cached_json_response(
+            request,
+            "analysis.question",
+            "all",
+            analysis_params(time_type),
+            [ANALYSIS_TAG],
+            lambda: self.get_qs_total(session, "question", time_type),
+        )
 
     def get_suggestion_data(
         self,
+        request: Request,
         session: SessionDep,
         time_type: Annotated[OverviewTimeType, Query(description="统计的时间维度")],
-    ) -> QuestionSuggestionChartData:
-        _bardata = AnalysisBarChartData(categoryData=[], chartdata=[])
-
-        return self.get_qs_total(session, "suggestion", time_type)
+    ) -> Response:
+        return cached_json_response(
+            request,
+            "analysis.suggestion",
+            "all",
+            analysis_params(time_type),
+            [ANALYSIS_TAG],
+            lambda: self.get_qs_total(session, "suggestion", time_type),
+        )
 
     def get_qs_total(
         self,
@@ -246,25 +232,19 @@ class AnalysisRoute:
         _from: Literal["question", "suggestion"],
         time_type: OverviewTimeType,
     ) -> QuestionSuggestionChartData:
-        field = DocumentContentReview.feedback_tag
+        metric = AnalysisMetric.FEEDBACK_TAG
 
         if _from == "question":
-            field = DocumentContentReview.question_tag
+            metric = AnalysisMetric.QUESTION_TAG
 
         statebase = (
-            select(field, func.count().label("value"))
-            .select_from(DocumentContentReview)
-            .where(DocumentContentReview.is_delete == False)  # noqa: E712
+            select(AnalysisDailyStat.dim, func.sum(AnalysisDailyStat.total))
+            .where(AnalysisDailyStat.metric == metric)
+            .group_by(AnalysisDailyStat.dim)
         )
 
-        if _from == "question":
-            statebase.where(DocumentContentReview.question_tag is not None)
-
-        if _from == "suggestion":
-            statebase.where(DocumentContentReview.feedback_tag is not None)
-
         if time_type == OverviewTimeType.ALL:
-            cur_statement = prev_statement = statebase.group_by(field)
+            cur_statement = prev_statement = statebase
 
         else:
             cur_date, prev_date = get_cur_prev_date(time_type)
@@ -273,12 +253,12 @@ class AnalysisRoute:
             assert prev_date is not None
 
             cur_statement = statebase.where(
-                DocumentContentReview.create_at >= cur_date
-            ).group_by(field)
+                AnalysisDailyStat.stat_date >= stat_date(cur_date)
+            )
             prev_statement = statebase.where(
-                cur_date > DocumentContentReview.create_at,
-                DocumentContentReview.create_at >= prev_date,
-            ).group_by(field)
+                stat_date(cur_date) > AnalysisDailyStat.stat_date,
+                AnalysisDailyStat.stat_date >= stat_date(prev_date),
+            )
 
         cur_res = session.exec(cur_statement).all()
         prev_res = session.exec(prev_statement).all()
@@ -379,4 +359,52 @@ def get_cur_prev_date(time_type: OverviewTimeType) -> tuple[date | None, date |
     return cur_date, prev_date
 
 
+def analysis_params(time_type: OverviewTimeType) -> dict[str, str]:
+    """统计结果缓存的参数, 日/月/年的统计与当天的日期相关"""
+
+    return {"time_type": time_type.value, "today": date.today().isoformat()}
+
+
+def stat_date(value: date | datetime) -> date:
+    """日汇总的日期, 统计的起止时间都是某天的0点"""
+
+    return value.date() if isinstance(value, datetime) else value
+
+
+def get_cur_prev_stat_total(
+    session: Session,
+    time_type: OverviewTimeType,
+    metric: AnalysisMetric,
+    dim: str | None = None,
+) -> tuple[int, int]:
+    """从日汇总中统计当前和上一个日期的数量, 不限制维度时汇总所有维度"""
+
+    statebase = select(func.coalesce(func.sum(AnalysisDailyStat.total), 0)).where(
+        AnalysisDailyStat.metric == metric
+    )
+
+    if dim is not None:
+        statebase = statebase.where(AnalysisDailyStat.dim == dim)
+
+    if time_type == OverviewTimeType.ALL:
+        return int(session.exec(statebase).one()), 0
+
+    cur_date, prev_date = get_cur_prev_date(time_type)
+
+    assert cur_date is not None
+    assert prev_date is not None
+
+    cur_total = session.exec(
+        statebase.where(AnalysisDailyStat.stat_date >= stat_date(cur_date))
+    ).one()
+    prev_total = session.exec(
+        statebase.where(
+            stat_date(cur_date) > AnalysisDailyStat.stat_date,
+            AnalysisDailyStat.stat_date >= stat_date(prev_date),
+        )
+    ).one()
+
+    return int(cur_total), int(prev_total)
+
+
 analysis_router = AnalysisRoute().router
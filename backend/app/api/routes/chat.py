@@ -2,6 +2,7 @@ import json
 import uuid
 from typing import Annotated
 
+import httpx
 from fastapi import (
     APIRouter,
     Body,
@@ -9,10 +10,12 @@ from fastapi import (
     Path,
     Query,
 )
+from fastapi.concurrency import run_in_threadpool
 from loguru import logger
 from sqlmodel import Session, asc, col, desc, func, select
 
-from app.api.deps import SessionDep, UserinfoDep
+from app.api.deps import AgentClientDep, SessionDep, UserinfoDep
+from app.core.db import engine
 from app.models.agentsetting import AgentSetting
 
 # 文档及内容的模型
@@ -27,7 +30,8 @@ from app.models.chat import (
     ChatsPublic,
 )
 from app.models.enums import ForSection
-from app.tasks.reviews import get_agent_resp_text, post_agent_api
+from app.tasks.async_reviews import async_post_agent_api
+from app.tasks.reviews import get_agent_resp_text
 
 DEFAULT_SESSION_TITLE = "新会话"
 
@@ -169,36 +173,75 @@ class ChatRoute:
 
         return ChatsPublic(data=publics, count=count)
 
-    def create_chat(
+    async def create_chat(
         self,
-        session: SessionDep,
         uinfo: UserinfoDep,
+        agent_client: AgentClientDep,
         session_id: Annotated[uuid.UUID, Path(description="会话ID")],
         payload: Annotated[ChatCreateFromQuestion, Body(description="创建的问题")],
     ) -> ChatPublic:
-        """创建一个问题（对话记录）"""
+        """创建一个问题（对话记录）
+
+        数据库操作在线程池中用短暂的会话执行，提问记录提交并释放连接后再等待AI回答，
+        等待回答时不占用事件循环和数据库连接。
+        """
+
+        chat_id, setting = await run_in_threadpool(
+            begin_chat, session_id, uinfo.id, payload.question
+        )
+
+        # todo: 向ai发起提取，等待回答
+        # 等待AI回答，但之前应该有提问记录。
+        answer = await ask_agent(agent_client, setting, payload.question)
 
+        return await run_in_threadpool(save_chat_answer, chat_id, answer)
+
+
+def begin_chat(
+    session_id: uuid.UUID, iscuser_id: str, question: str
+) -> tuple[uuid.UUID, AgentSetting]:
+    """保存提问记录，并获取AI助手的agent配置
+
+    Returns:
+        提问记录的ID, agent配置(已与数据库会话分离)
+    """
+
+    with Session(engine) as session:
         csession = session.get(ChatSession, session_id)
 
         if not csession:
             raise HTTPException(404, "该会话不存在")
 
         if csession.title == DEFAULT_SESSION_TITLE:
-            csession.title = payload.question
+            csession.title = question
             session.add(csession)
-            session.commit()
-            session.refresh(csession)
 
-        chat = Chat(
-            question=payload.question, session_id=session_id, iscuser_id=uinfo.id
-        )
+        chat = Chat(question=question, session_id=session_id, iscuser_id=iscuser_id)
         session.add(chat)
         session.commit()
-        session.refresh(chat)
 
-        # todo: 向ai发起提取，等待回答
-        # 等待AI回答，但之前应该有提问记录。
-        chat.answer = ask_agent(session, payload.question)
+        statement = (
+            select(AgentSetting)
+            .where(AgentSetting.section == ForSection.assistant)
+            .limit(1)
+        )
+        setting = session.exec(statement).first()
+
+        if not setting:
+            raise HTTPException(500, "获取agent参数失败！")
+
+        return chat.id, AgentSetting.model_validate(setting.model_dump())
+
+
+def save_chat_answer(chat_id: uuid.UUID, answer: str) -> ChatPublic:
+    """保存AI的回答"""
+
+    with Session(engine) as session:
+        chat = session.get(Chat, chat_id)
+
+        assert chat is not None, "提问记录不存在"
+
+        chat.answer = answer
         session.add(chat)
         session.commit()
         session.refresh(chat)
@@ -206,22 +249,16 @@ class ChatRoute:
         return ChatPublic.model_validate(chat)
 
 
-def ask_agent(session: Session, question: str) -> str:
-    """向AI提问"""
-
-    statement = (
-        select(AgentSetting)
-        .where(AgentSetting.section == ForSection.assistant)
-        .limit(1)
-    )
-    setting = session.exec(statement).first()
-
-    if not setting:
-        raise HTTPException(500, "获取agent参数失败！")
+async def ask_agent(
+    agent_client: httpx.AsyncClient, setting: AgentSetting, question: str
+) -> str:
+    """向AI提问, 等待回答时不占用线程"""
 
     ai_anwser: str = ''
 
-    ai_anwser, err_msg = get_agent_resp_text(post_agent_api(setting, question, is_chat=True))
+    ai_anwser, err_msg = get_agent_resp_text(
+        await async_post_agent_api(agent_client, setting, question, is_chat=True)
+    )
     logger.info(f"ai回答: {ai_anwser}")
 
     if err_msg:
@@ -19,16 +19,30 @@ from fastapi import (
     HTTPException,
     Path,
     Query,
+    Request,
+    Response,
     UploadFile,
 )
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from loguru import logger
 from sqlmodel import Session, col, desc, func, select
 
 from app.api.const import MEDIA_TYPE_MAP
 from app.api.deps import SaveTypeDep, SessionDep, UserinfoDep
+from app.api.response_cache import (
+    cached_json_response,
+    invalidate_response_cache,
+    project_tag,
+    user_scope,
+)
+from app.api.schems import UserinfoResp
 from app.api.utils import (
-    download_document_from_oss_v1,
+    ByteRange,
+    etag_matches,
+    head_document_from_oss_v1,
+    iter_document_from_oss_v1,
+    iter_local_file,
+    parse_range_header,
     save_document_to_local,
     save_document_to_oss_v1,
 )
@@ -69,8 +83,9 @@ from app.models.enums import (
     SectionTitleTypeMap,
     SectionType,
 )
+from app.tasks.analysis_stats import project_stat_days, refresh_analysis_stats
 from app.tasks.audit import audit_docx, audit_scan_pdf_other
-from app.tasks.reviews import review_by_agent
+from app.tasks.reviews import finish_review_by_agent, review_by_agent
 
 
 class DocumentEnumRoute:
@@ -99,8 +114,12 @@ class ProjectsRoute:
     def __init__(self) -> None:
         self.router.get("/")(self.read_projects)
         self.router.get("/search")(self.search_projects)
-        self.router.get("/{proj_id}/documents")(self.read_project_documents)
-        self.router.get("/{proj_id}/reviews")(self.read_project_reviews)
+        self.router.get(
+            "/{proj_id}/documents", response_model=Sequence[DocumentPublic]
+        )(self.read_project_documents)
+        self.router.get(
+            "/{proj_id}/reviews", response_model=Sequence[DocumentContentPublic]
+        )(self.read_project_reviews)
         self.router.post("/{proj_id}/audit")(self.audit_project)
         self.router.get("/{proj_id}/{version}/error")(self.get_proje_version_error)
         self.router.post("/{proj_id}/delete")(self.delete_project)
@@ -186,12 +205,34 @@ class ProjectsRoute:
 
     def read_project_documents(
         self,
+        request: Request,
         session: SessionDep,
         uinfo: UserinfoDep,
         proj_id: Annotated[uuid.UUID, Path(description="项目ID")],
         version: Annotated[int | None, Query(description="版本ID/第几次提交")] = None,
-    ) -> Sequence[DocumentPublic]:
-        """获取某个项目的文档列表"""
+    ) -> Response:
+        """获取某个项目的文档列表
+
+        结果缓存在redis中, 该项目的文档、文档内容修改时失效。
+        """
+
+        return cached_json_response(
+            request,
+            "projects.documents",
+            user_scope(uinfo),
+            {"proj_id": proj_id.hex, "version": version},
+            [project_tag(proj_id)],
+            lambda: self.get_project_documents(session, uinfo, proj_id, version),
+        )
+
+    def get_project_documents(
+        self,
+        session: Session,
+        uinfo: UserinfoResp,
+        proj_id: uuid.UUID,
+        version: int | None,
+    ) -> list[DocumentPublic]:
+        """查询某个项目的文档列表"""
 
         # 默认前置条件, 未删除，项目ID为指定ID
         where_statement: list[Any] = [
@@ -214,12 +255,34 @@ class ProjectsRoute:
 
     def read_project_reviews(
         self,
+        request: Request,
         session: SessionDep,
         uinfo: UserinfoDep,
         proj_id: Annotated[uuid.UUID, Path(description="项目ID")],
         version: Annotated[int, Query(description="版本ID/第几次提交")],
-    ) -> Sequence[DocumentContentPublic]:
-        """获取某个项目的某个版本的核查结果"""
+    ) -> Response:
+        """获取某个项目的某个版本的核查结果
+
+        结果缓存在redis中, 该项目的文档、文档内容修改时失效。
+        """
+
+        return cached_json_response(
+            request,
+            "projects.reviews",
+            user_scope(uinfo),
+            {"proj_id": proj_id.hex, "version": version},
+            [project_tag(proj_id)],
+            lambda: self.get_project_reviews(session, uinfo, proj_id, version),
+        )
+
+    def get_project_reviews(
+        self,
+        session: Session,
+        uinfo: UserinfoResp,
+        proj_id: uuid.UUID,
+        version: int,
+    ) -> list[DocumentContentPublic]:
+        """查询某个项目的某个版本的核查结果"""
 
         # 默认前置条件, 未删除，文档类型为”三措“
         statement = select(Document.id).where(
@@ -280,6 +343,8 @@ class ProjectsRoute:
         ):
             raise HTTPException(400, "要更新的状态不对")
 
+        stat_days = project_stat_days(project)
+
         # 更新状态
         project.review_status = payload.review_status
         project.review_done_at = datetime.now()
@@ -293,6 +358,8 @@ class ProjectsRoute:
         session.commit()
         session.refresh(project)
 
+        refresh_analysis_stats(stat_days | project_stat_days(project))
+
         return ProjectPublic.model_validate(project)
 
     def get_proje_version_error(
@@ -326,7 +393,9 @@ class ProjectsRoute:
         taskresult = session.exec(
             select(CeleryResult).where(
                 CeleryResult.task_id == str(doc.task_id),
-                CeleryResult.name == review_by_agent.name,  # type: ignore
+                col(CeleryResult.name).in_(
+                    (review_by_agent.name, finish_review_by_agent.name)  # type: ignore
+                ),
             )
         ).first()
 
@@ -350,11 +419,15 @@ class ProjectsRoute:
         proj.is_delete = True
         session.add(proj)
 
+        # 项目、文档、问题/建议被统计的日期
+        stat_days = project_stat_days(proj)
+
         doc_statement = select(Document).where(Document.proj_id == proj_id)
         proj_docs = session.exec(doc_statement).all()
         for proj_doc in proj_docs:
             proj_doc.is_delete = True
             session.add(proj_doc)
+            stat_days.add(proj_doc.create_at.date())
 
         doc_content_statement = select(DocumentContent).where(DocumentContent.proj_id == proj_id)
         proj_doc_contents = session.exec(doc_content_statement).all()
@@ -367,9 +440,13 @@ class ProjectsRoute:
         for proj_doc_content_review in proj_doc_content_reviews:
             proj_doc_content_review.is_delete = True
             session.add(proj_doc_content_review)
+            stat_days.add(proj_doc_content_review.create_at.date())
 
         session.commit()
 
+        refresh_analysis_stats(stat_days)
+        invalidate_response_cache(project_tag(proj_id))
+
         return {"detail": "删除项目成功！"}
 
 
@@ -418,9 +495,9 @@ class DocumentRoute:
 
         # 保存到本地
         if save_type == SaveType.LOCAL:
-            save_path = save_document_to_local(uploadfile)
+            saved_file = save_document_to_local(uploadfile)
         else:  # oss
-            save_path = save_document_to_oss_v1(proj_type.name, uploadfile)
+            saved_file = save_document_to_oss_v1(proj_type.name, uploadfile)
 
         document = Document(
             proj_id=project.id,
@@ -428,10 +505,11 @@ class DocumentRoute:
             iscuser_id=iscuser_id,
             file_name=uploadfile.filename,  # type: ignore
             file_suffix=file_suffix,
-            file_size=uploadfile.size,  # type: ignore
+            file_size=saved_file.size,
+            file_sha256=saved_file.sha256,
             file_category=file_category,
             save_type=save_type,
-            save_path=save_path,
+            save_path=saved_file.save_path,
         )
 
         session.add(document)
@@ -555,6 +633,9 @@ class DocumentRoute:
 
         documents.append(DocumentPublic.model_validate(threeone_document))
 
+        # 项目的文档列表已变化
+        invalidate_response_cache(project_tag(project.id))
+
         # 审核docx文件，直接用包提取
         if threeone_file.filename.endswith("docx"):
             task_func = audit_docx
@@ -600,6 +681,9 @@ class DocumentRoute:
         session.add(document)
         session.commit()
         session.refresh(document)
+
+        invalidate_response_cache(project_tag(document.proj_id))
+
         return document
 
     def delete_document(
@@ -620,14 +704,28 @@ class DocumentRoute:
         session.add(document)
         session.commit()
         session.refresh(document)
+
+        # 文档总量
+        refresh_analysis_stats({document.create_at.date()})
+        invalidate_response_cache(project_tag(document.proj_id))
+
         return "文档删除成功"
 
     def download_document(
         self,
+        request: Request,
         session: SessionDep,
         uinfo: UserinfoDep,
         id: Annotated[uuid.UUID, Path()],
-    ) -> StreamingResponse:
+    ) -> Response:
+        """下载文档
+
+        - 支持单个区间的Range请求(断点续传), 返回206
+        - 支持If-None-Match条件请求, 文件未变化时返回304
+        - 本地文件配置了 `DOWNLOAD_X_ACCEL_REDIRECT_PREFIX` 时交给nginx发送
+        - 文件分块读取发送, 内存占用与文件大小无关
+        """
+
         document = session.get(Document, id)
         if not document:
             raise HTTPException(status_code=404, detail="未找到文档")
@@ -638,34 +736,89 @@ class DocumentRoute:
         if document.is_delete:
             raise HTTPException(400, "该文件已被删除")
 
-        media_type = MEDIA_TYPE_MAP.get(document.file_suffix.lower())
+        media_type = MEDIA_TYPE_MAP.get(document.file_suffix.lower()) or "application/octet-stream"
 
-        if document.save_type == SaveType.LOCAL:
-            absolute_filepath = str(settings.UPLOAD_FILES_DIR / document.save_path)
+        # 上传时计算了sha256的，直接使用；否则按文档ID和大小生成
+        if document.file_sha256:
+            etag = f'"{document.file_sha256}"'
+        else:
+            etag = f'"{document.id.hex}-{document.file_size}"'
+
+        headers: dict[str, str] = {
+            "Content-Disposition": f"attachment; filename*=UTF-8''{quote(document.file_name)}",
+            "ETag": etag,
+            "Accept-Ranges": "bytes",
+        }
 
-            # def iter_file_content() -> Generator[bytes, Any, None]:
+        # 文件未变化
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
 
-            #     with open(absolute_filepath, 'rb') as fr:
-            #         yield from fr
+        if document.save_type == SaveType.LOCAL:
+            absolute_filepath = settings.UPLOAD_FILES_DIR / document.save_path
+
+            if not absolute_filepath.is_file():
+                raise HTTPException(status_code=404, detail="文件不存在")
 
-            filecontent = BytesIO(b"")
-            with open(absolute_filepath, "rb") as fr:
-                filecontent.write(fr.read())
+            # 交给nginx发送, nginx处理Range等请求
+            if settings.DOWNLOAD_X_ACCEL_REDIRECT_PREFIX:
+                headers["X-Accel-Redirect"] = (
+                    f"{settings.DOWNLOAD_X_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{quote(document.save_path)}"
+                )
+                return Response(headers=headers, media_type=media_type)
 
-            filecontent.seek(0)
+            file_size = absolute_filepath.stat().st_size
 
         # oss存储
         else:
             logger.info(f"从OSS存储的文件下载, object_name: {document.save_path}")
-            filecontent = download_document_from_oss_v1(document.save_path)
+            file_size = head_document_from_oss_v1(document.save_path)
+
+        # 解析区间, If-Range 与etag不一致时(文件已变化)返回整个文件
+        byte_range: ByteRange | None = None
+        range_header = request.headers.get("range")
+        if_range = request.headers.get("if-range")
+
+        if range_header and (not if_range or etag_matches(if_range, etag)):
+            try:
+                byte_range = parse_range_header(range_header, file_size)
+            except ValueError:
+                raise HTTPException(
+                    status_code=416,
+                    detail="请求的区间无效",
+                    headers={"Content-Range": f"bytes */{file_size}"},
+                )
+
+        # 整个本地文件, 使用文件响应发送
+        if byte_range is None and document.save_type == SaveType.LOCAL:
+            return FileResponse(
+                absolute_filepath,
+                headers=headers,
+                media_type=media_type,
+                stat_result=absolute_filepath.stat(),
+            )
 
-        headers: dict[str, str] = {}
-        headers["Content-Disposition"] = f"attachment; filename={document.file_name}"
+        if document.save_type == SaveType.LOCAL:
+            content = iter_local_file(absolute_filepath, byte_range)
+        else:
+            content = iter_document_from_oss_v1(document.save_path, byte_range)
 
-        if media_type:
-            headers["Content-Type"] = media_type  # "application/octet-stream"
+        status_code = 200
+        content_length = file_size
+
+        if byte_range is not None:
+            status_code = 206
+            content_length = byte_range.length
+            headers["Content-Range"] = (
+                f"bytes {byte_range.start}-{byte_range.end}/{file_size}"
+            )
 
-        return StreamingResponse(filecontent, media_type=media_type)
+        headers["Content-Length"] = str(content_length)
+
+        return StreamingResponse(
+            content, status_code=status_code, headers=headers, media_type=media_type
+        )
 
 
 class DocumentContentRoute:
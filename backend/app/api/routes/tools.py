@@ -3,13 +3,12 @@ import uuid
 from datetime import datetime
 from typing import Annotated, Any
 
-import html2text
 import pytz
 from fastapi import APIRouter, File, Form, HTTPException, Path, Query, UploadFile
 from loguru import logger
 from sqlmodel import col, desc, func, select
 
-from app.api.deps import SaveTypeDep, SessionDep, UserinfoDep
+from app.api.deps import RedisDep, SaveTypeDep, SessionDep, UserinfoDep
 from app.api.utils import save_document_to_local, save_document_to_oss_v1
 from app.core.config import settings
 from app.core.enums import OcrApiType
@@ -24,6 +23,7 @@ from app.models.parsedfile import (
 )
 from app.mydocx.entry import Extract, RenderFormat
 from app.tasks.audit import ocr_file2text
+from app.tasks.ocr_cache import OcrCache
 
 
 class ToolRoute:
@@ -37,6 +37,7 @@ class ToolRoute:
 
         # ocr调试
         self.router.post("/ocr/debug")(self.post_ocr_debug)
+        self.router.get("/ocr/cache/stats")(self.get_ocr_cache_stats)
 
     def get_parsed_files(
         self, session: SessionDep, uinfo: UserinfoDep
@@ -85,9 +86,9 @@ class ToolRoute:
 
         # 保存到本地
         if save_type == SaveType.LOCAL:
-            save_path = save_document_to_local(docx_file)
+            save_path = save_document_to_local(docx_file).save_path
         else:
-            save_path = save_document_to_oss_v1("parsedfile", docx_file)
+            save_path = save_document_to_oss_v1("parsedfile", docx_file).save_path
 
         parsedfile = ParsedFile(
             iscuser_id=uinfo.id,
@@ -105,10 +106,14 @@ class ToolRoute:
         session.commit()
         session.refresh(parsedfile)
 
+        # 遍历1次文档，同时渲染3种格式
         extracter = Extract(docx_file.file, use_oss=False)
-        html_content = extracter.parse(render_format=RenderFormat.shtml)
-        md_content = html2text.html2text(html_content)
-        txt_content = extracter.parse(render_format=RenderFormat.txt)
+        rendered = extracter.parse_formats(
+            [RenderFormat.shtml, RenderFormat.markdown, RenderFormat.txt]
+        )
+        html_content = rendered[RenderFormat.shtml]
+        md_content = rendered[RenderFormat.markdown]
+        txt_content = rendered[RenderFormat.txt]
 
         logger.info(f"解析的txt文本: {txt_content = }")
 
@@ -196,8 +201,10 @@ class ToolRoute:
             assert doc_file.filename is not None, "文件名不能为空！"
 
             timeout = 599 # nginx代理设置的10分钟超时(600),
+            # 调试时总是调用ocr接口，不使用缓存的结果
             resp_text, process_msg = ocr_file2text(doc_file.filename,
-                doc_file.file, proj_name="ocrdebug", proj_version=1, api_type=api_type, timeout=timeout
+                doc_file.file, proj_name="ocrdebug", proj_version=1, api_type=api_type, timeout=timeout,
+                use_cache=False,
             )
             resp_res_text = resp_text
 
@@ -246,5 +253,19 @@ class ToolRoute:
             "process_msg": process_msg,
         }
 
+    def get_ocr_cache_stats(
+        self, redis: RedisDep, uinfo: UserinfoDep
+    ) -> dict[str, int]:
+        """ocr识别结果缓存的命中和未命中次数, 统计不区分用户, 只有超级用户可以查看"""
+
+        if not uinfo.is_superuser:
+            raise HTTPException(status_code=403, detail="只有超级用户可以查看")
+
+        ocr_cache = OcrCache(
+            redis, settings.OCR_CACHE_TTL, settings.OCR_CACHE_MAX_TEXT_BYTES
+        )
+
+        return ocr_cache.stats()
+
 
 tools_router = ToolRoute().router
@@ -1,7 +1,13 @@
+import hashlib
+import itertools
 import os
+import threading
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from io import BytesIO
 from pathlib import Path
+from typing import BinaryIO, NamedTuple
 
 import alibabacloud_oss_v2 as oss
 import oss2
@@ -9,6 +15,8 @@ import requests
 from fastapi import UploadFile
 from loguru import logger
 from oss2.credentials import StaticCredentialsProvider
+from oss2.models import PartInfo
+from requests.adapters import HTTPAdapter
 
 from app.api.schems import (
     ClearSessionPayload,
@@ -19,9 +27,144 @@ from app.api.schems import (
 from app.core.config import settings
 from app.models.agentsetting import AgentSetting
 
+# ------ 流式读取上传文件 -------------
+
+
+class SavedFile(NamedTuple):
+    """保存后的上传文件"""
+
+    save_path: str
+    """ 保存的路径, 本地为相对 UPLOAD_FILES_DIR 的路径, oss为对象名称 """
+
+    size: int
+    """ 文件大小, 单位字节 """
+
+    sha256: str
+    """ 文件内容的sha256 """
+
+
+class DigestReader:
+    """分块读取文件, 读取的同时计算sha256和大小, 内存占用只有1个块"""
+
+    def __init__(self, fileobj: BinaryIO, chunk_size: int | None = None) -> None:
+        self._fileobj = fileobj
+        self._chunk_size = chunk_size or settings.UPLOAD_CHUNK_SIZE
+        self._sha256 = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._fileobj.read(size)
+        self._sha256.update(data)
+        self.size += len(data)
+
+        return data
+
+    def chunks(self) -> Iterator[bytes]:
+        """按块依次读取到文件结束"""
+
+        while chunk := self.read(self._chunk_size):
+            yield chunk
+
+    @property
+    def sha256(self) -> str:
+        return self._sha256.hexdigest()
+
+
+# --------- 下载文件相关 -----------------
+
+
+class ByteRange(NamedTuple):
+    """请求的字节区间, 包含两端"""
+
+    start: int
+    end: int
+
+    @property
+    def length(self) -> int:
+        return self.end - self.start + 1
+
+
+def parse_range_header(range_header: str, size: int) -> ByteRange | None:
+    """解析Range请求头, 只支持单个区间, 如: bytes=0-1023, bytes=1024-, bytes=-512
+
+    多个区间或格式不支持时返回None(返回整个文件), 空文件没有可以满足的区间, 也返回None。
+
+    Raises:
+        ValueError: 区间超出文件大小
+    """
+
+    if size <= 0:
+        return None
+
+    unit, _, ranges = range_header.partition("=")
+
+    if unit.strip() != "bytes" or "," in ranges:
+        return None
+
+    start_str, sep, end_str = ranges.strip().partition("-")
+
+    if not sep:
+        return None
+
+    try:
+        # 最后的n个字节
+        if not start_str:
+            suffix_length = int(end_str)
+            if suffix_length <= 0:
+                raise ValueError(f"无效的区间: {range_header}")
+
+            return ByteRange(max(size - suffix_length, 0), size - 1)
+
+        start = int(start_str)
+        end = int(end_str) if end_str else size - 1
+
+    except ValueError as e:
+        raise ValueError(f"无效的区间: {range_header}") from e
+
+    if start >= size or start > end:
+        raise ValueError(f"无效的区间: {range_header}")
+
+    return ByteRange(start, min(end, size - 1))
+
+
+def etag_matches(etag_header: str, etag: str) -> bool:
+    """If-None-Match/If-Range 请求头中是否包含该etag(弱比较)"""
+
+    if etag_header.strip() == "*":
+        return True
+
+    candidates = (tag.strip().removeprefix("W/") for tag in etag_header.split(","))
+
+    return etag.removeprefix("W/") in candidates
+
+
+def iter_local_file(
+    filepath: str | Path, byte_range: ByteRange | None = None
+) -> Iterator[bytes]:
+    """分块读取本地文件(或其中的一个区间), 内存中只有1个块"""
+
+    chunk_size = settings.DOWNLOAD_CHUNK_SIZE
+
+    with open(filepath, "rb") as fr:
+        if byte_range is None:
+            while chunk := fr.read(chunk_size):
+                yield chunk
+
+            return
+
+        fr.seek(byte_range.start)
+        remaining = byte_range.length
+
+        while remaining > 0 and (chunk := fr.read(min(chunk_size, remaining))):
+            remaining -= len(chunk)
+            yield chunk
+
+
 # ------ 本地保存文件相关 -------------
 
-def save_document_to_local(uploadfile: UploadFile) -> str:
+def save_document_to_local(uploadfile: UploadFile) -> SavedFile:
+    """分块保存上传文件到本地, 保存完成后文件指针恢复到开头"""
+
     upload_dir = settings.UPLOAD_FILES_DIR / datetime.now().strftime("%Y%m%d")
     os.makedirs(upload_dir, exist_ok=True)
 
@@ -30,13 +173,20 @@ def save_document_to_local(uploadfile: UploadFile) -> str:
 
     filepath = upload_dir / uploadfile.filename
 
+    reader = DigestReader(uploadfile.file)
+
     with open(filepath, "wb") as fw:
-        fw.write(uploadfile.file.read())
+        for chunk in reader.chunks():
+            fw.write(chunk)
+
+    uploadfile.file.seek(0)
 
     # 去掉前缀 + /, 必须加 '/' 否则为绝对地址了。
     relative_filepath = str(filepath).replace(f"{settings.UPLOAD_FILES_DIR}/", "")
 
-    return relative_filepath
+    logger.info(f"保存文件到本地: {relative_filepath}, 大小: {reader.size}, sha256: {reader.sha256}")
+
+    return SavedFile(relative_filepath, reader.size, reader.sha256)
 
 # --------- oss v1 处理文件相关 -----------------
 # https://help.aliyun.com/zh/oss/developer-reference/getting-started-with-oss-sdk-for-python
@@ -57,12 +207,16 @@ def get_oss_v1_bucket() -> oss2.Bucket:
 
     return oss2.Bucket(auth, endpoint, bucket_name)
 
-def save_document_to_oss_v1(proj_type: str, uploadfile: UploadFile) -> str:
+def save_document_to_oss_v1(proj_type: str, uploadfile: UploadFile) -> SavedFile:
     """上传文档至阿里云OSS存储
 
+    小于 `OSS_MULTIPART_PART_SIZE` 的文件直接上传, 否则分片上传, 内存中最多只有1个分片,
+    上传完成后文件指针恢复到开头。
+
     文档参考:
 
         https://help.aliyun.com/zh/oss/developer-reference/getting-started-with-oss-sdk-for-python
+        https://help.aliyun.com/zh/oss/developer-reference/multipart-upload-9
 
         仓库:
 
@@ -80,11 +234,69 @@ def save_document_to_oss_v1(proj_type: str, uploadfile: UploadFile) -> str:
 
     bucket = get_oss_v1_bucket()
 
-    result = bucket.put_object(object_name, uploadfile.file)
+    part_size = settings.OSS_MULTIPART_PART_SIZE
+    reader = DigestReader(uploadfile.file, chunk_size=part_size)
+    chunks = reader.chunks()
 
-    logger.info(f"oss推送文件成功, ETag {result.etag}")
+    first_part = next(chunks, b"")
+
+    # 只有1个分片, 直接上传
+    if len(first_part) < part_size:
+        result = bucket.put_object(object_name, first_part)
+        etag = result.etag
+
+    else:
+        upload_id = bucket.init_multipart_upload(object_name).upload_id
+        parts: list[PartInfo] = []
+
+        try:
+            for part_number, part in enumerate(
+                itertools.chain([first_part], chunks), start=1
+            ):
+                part_result = bucket.upload_part(object_name, upload_id, part_number, part)
+                parts.append(PartInfo(part_number, part_result.etag))
+
+            result = bucket.complete_multipart_upload(object_name, upload_id, parts)
+            etag = result.etag
+
+        except Exception:
+            bucket.abort_multipart_upload(object_name, upload_id)
+            raise
+
+        logger.info(f"oss分片上传文件, 共 {len(parts)} 个分片")
+
+    uploadfile.file.seek(0)
+
+    logger.info(f"oss推送文件成功, ETag {etag}, 大小: {reader.size}, sha256: {reader.sha256}")
+
+    return SavedFile(str(object_name), reader.size, reader.sha256)
+
+def head_document_from_oss_v1(object_name: str) -> int:
+    """获取oss中文件的大小, 单位字节"""
+
+    bucket = get_oss_v1_bucket()
+
+    return bucket.head_object(object_name).content_length  # type: ignore
+
+
+def iter_document_from_oss_v1(
+    object_name: str, byte_range: ByteRange | None = None
+) -> Iterator[bytes]:
+    """分块读取oss中的文件(或其中的一个区间), 内存中只有1个块"""
+
+    bucket = get_oss_v1_bucket()
+
+    oss_byte_range = (byte_range.start, byte_range.end) if byte_range else None
+    file_obj = bucket.get_object(object_name, byte_range=oss_byte_range)
+
+    try:
+        while chunk := file_obj.read(settings.DOWNLOAD_CHUNK_SIZE):
+            yield chunk
+
+    finally:
+        # 客户端提前断开时生成器被关闭, 释放oss的连接
+        file_obj.close()
 
-    return str(object_name)
 
 def download_document_from_oss_v1(object_name: str) -> BytesIO:
     """ 从oss下载文件
@@ -196,6 +408,45 @@ def download_document_from_oss_v2(object_name: str) -> BytesIO:
 
     return filecontent
 
+# --------- agent http 连接池 ------------------
+
+# 每个智能体主机共享1个http会话, 复用 keep-alive 连接
+_agent_http_sessions: dict[str, requests.Session] = {}
+_agent_http_sessions_lock = threading.Lock()
+
+
+def get_agent_http_session(agent_setting: AgentSetting) -> requests.Session:
+    """获取智能体主机(协议 + 主机 + 端口)共享的http会话
+
+    会话带有连接池，同一主机的请求复用已建立的TCP/TLS连接。
+    """
+
+    key = f"{agent_setting.protocol}://{agent_setting.host}:{agent_setting.port}"
+
+    with _agent_http_sessions_lock:
+        http_session = _agent_http_sessions.get(key)
+
+        if http_session is None:
+            http_session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=1, pool_maxsize=settings.AGENT_HTTP_POOL_MAXSIZE
+            )
+            http_session.mount("http://", adapter)
+            http_session.mount("https://", adapter)
+            _agent_http_sessions[key] = http_session
+
+    return http_session
+
+
+def build_agent_headers(agent_setting: AgentSetting) -> dict[str, str]:
+    """智能体接口的请求头"""
+
+    return {
+        "Authorization": f"Bearer {agent_setting.app_key}",
+        "Content-Type": "application/json",
+    }
+
+
 # --------- agent session 相关操作 ------------------
 
 
@@ -204,16 +455,15 @@ def create_agent_session( agent_setting: AgentSetting) -> str:
 
     url = settings.build_agent_create_session_api(agent_setting.protocol, agent_setting.host, agent_setting.port)
     logger.info(f"创建session url: {url}")
-    headers = {
-        "Authorization": f"Bearer {agent_setting.app_key}",
-        "Content-Type": "application/json",
-    }
+    headers = build_agent_headers(agent_setting)
     payload = CreateSessionPayload(
         agentCode=agent_setting.agent_code,
         agentVersion=agent_setting.agent_version,
     ).model_dump(mode="json")
 
-    resp = requests.post(url, json=payload, headers=headers)
+    resp = get_agent_http_session(agent_setting).post(
+        url, json=payload, headers=headers, timeout=settings.AGENT_SESSION_TIMEOUT
+    )
 
     if resp.status_code != 200:
         logger.info(f"获取session失败: {resp.text}")
@@ -223,18 +473,18 @@ def create_agent_session( agent_setting: AgentSetting) -> str:
 
     return res.data.uniqueCode
 
-def clear_agent_session(agent_setting: AgentSetting, session_id: str | None = None) -> None:
+def clear_agent_session(agent_setting: AgentSetting, session_id: str | None = None) -> bool:
     """调用接口停止已有的session
 
     session_id: 动态传入的session_id
+
+    Returns:
+        是否清理成功
     """
 
     url = settings.build_agent_clear_session_api(agent_setting.protocol, agent_setting.host, agent_setting.port)
     logger.info(f"清理session url: {url}")
-    headers = {
-        "Authorization": f"Bearer {agent_setting.app_key}",
-        "Content-Type": "application/json",
-    }
+    headers = build_agent_headers(agent_setting)
 
     clear_session_id = session_id or agent_setting.session_id
 
@@ -242,7 +492,9 @@ def clear_agent_session(agent_setting: AgentSetting, session_id: str | None = No
 
     payload = ClearSessionPayload(sessionId=clear_session_id).model_dump(mode='json')
 
-    resp = requests.post(url, json=payload, headers=headers)
+    resp = get_agent_http_session(agent_setting).post(
+        url, json=payload, headers=headers, timeout=settings.AGENT_SESSION_TIMEOUT
+    )
 
     if resp.status_code != 200:
         logger.error(f"清理session失败！status_code:{resp.status_code} {resp.text}")
@@ -252,7 +504,7 @@ def clear_agent_session(agent_setting: AgentSetting, session_id: str | None = No
     if not res.success:
         logger.error(f"清理session失败！status_code:{resp.status_code} {resp.text}")
 
-    return None
+    return resp.status_code == 200 and res.success
 
 
 def delete_agent_session(agent_setting: AgentSetting, session_id: str | None = None) -> None:
@@ -263,10 +515,7 @@ def delete_agent_session(agent_setting: AgentSetting, session_id: str | None = N
 
     url = settings.build_agent_delete_session_api(agent_setting.protocol, agent_setting.host, agent_setting.port)
     logger.info(f"删除session url: {url}")
-    headers = {
-        "Authorization": f"Bearer {agent_setting.app_key}",
-        "Content-Type": "application/json",
-    }
+    headers = build_agent_headers(agent_setting)
 
     delete_session_id = session_id or agent_setting.session_id
 
@@ -274,7 +523,9 @@ def delete_agent_session(agent_setting: AgentSetting, session_id: str | None = N
 
     payload = ClearSessionPayload(sessionId=delete_session_id).model_dump(mode='json')
 
-    resp = requests.post(url, json=payload, headers=headers)
+    resp = get_agent_http_session(agent_setting).post(
+        url, json=payload, headers=headers, timeout=settings.AGENT_SESSION_TIMEOUT
+    )
 
     if resp.status_code != 200:
         logger.error(f"删除session失败！err:{resp.text}")
@@ -285,3 +536,132 @@ def delete_agent_session(agent_setting: AgentSetting, session_id: str | None = N
         logger.error(f"删除session失败！err:{resp.text}")
 
     return None
+
+
+# --------- agent session 池 ------------------
+
+# 归还session时，在后台清理，不阻塞请求
+_agent_session_executor = ThreadPoolExecutor(
+    max_workers=2, thread_name_prefix="agent-session"
+)
+
+
+class AgentSessionPool:
+    """预热的智能体session池
+
+    请求时从池中取出空闲的session，用完后在后台清理(clearSession)并放回池中复用，
+    代替每次请求都 创建 + 清理 + 删除 session。
+
+    请求失败的session不再复用，清理后删除，防止上一个请求超时后影响后面的请求。
+    """
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self._idle: list[str] = []
+        self._lock = threading.Lock()
+
+    def acquire_idle(self) -> str | None:
+        """取出1个空闲的session, 没有时返回None, 不会阻塞(可在事件循环中调用)"""
+
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+
+        return None
+
+    def acquire(self, agent_setting: AgentSetting) -> str:
+        """取出1个空闲的session, 没有时新建"""
+
+        session_id = self.acquire_idle()
+
+        if session_id is not None:
+            return session_id
+
+        return create_agent_session(agent_setting)
+
+    def release(
+        self, agent_setting: AgentSetting, session_id: str, *, reusable: bool = True
+    ) -> None:
+        """归还session, 在后台清理后放回池中(或删除)"""
+
+        snapshot = AgentSetting.model_validate(agent_setting.model_dump())
+        _agent_session_executor.submit(self._recycle, snapshot, session_id, reusable)
+
+    def warm(self, agent_setting: AgentSetting) -> None:
+        """预热: 创建session直到池满"""
+
+        while True:
+            with self._lock:
+                if len(self._idle) >= self.size:
+                    return
+
+            try:
+                session_id = create_agent_session(agent_setting)
+            except Exception as e:
+                logger.warning(f"预热agent session失败: {e}")
+                return
+
+            with self._lock:
+                if len(self._idle) < self.size:
+                    self._idle.append(session_id)
+                    continue
+
+            # 预热期间池已被归还的session填满，多余的删除
+            delete_agent_session(agent_setting, session_id)
+            return
+
+    def _recycle(
+        self, agent_setting: AgentSetting, session_id: str, reusable: bool
+    ) -> None:
+        try:
+            cleared = clear_agent_session(agent_setting, session_id)
+
+            with self._lock:
+                if cleared and reusable and len(self._idle) < self.size:
+                    self._idle.append(session_id)
+                    return
+
+            delete_agent_session(agent_setting, session_id)
+            logger.info(f"删除agent session_id: {session_id} 成功!")
+        except Exception as e:
+            logger.exception(f"回收agent session_id: {session_id} 失败: {e}")
+
+
+_agent_session_pools: dict[str, AgentSessionPool] = {}
+_agent_session_pools_lock = threading.Lock()
+
+
+def get_agent_session_pool(agent_setting: AgentSetting) -> AgentSessionPool | None:
+    """获取智能体的session池，`AGENT_SESSION_POOL_SIZE` 为0时不使用session池
+
+    session池按 地址 + APP KEY + 智能体编码 + 智能体版本 区分，
+    第一次获取时在后台预热。
+    """
+
+    if settings.AGENT_SESSION_POOL_SIZE <= 0:
+        return None
+
+    key = "|".join(
+        (
+            agent_setting.protocol,
+            agent_setting.host,
+            str(agent_setting.port),
+            agent_setting.app_key,
+            agent_setting.agent_code,
+            agent_setting.agent_version,
+        )
+    )
+
+    with _agent_session_pools_lock:
+        pool = _agent_session_pools.get(key)
+
+        if pool is not None:
+            return pool
+
+        pool = AgentSessionPool(settings.AGENT_SESSION_POOL_SIZE)
+        _agent_session_pools[key] = pool
+
+    snapshot = AgentSetting.model_validate(agent_setting.model_dump())
+    _agent_session_executor.submit(pool.warm, snapshot)
+
+    return pool
@@ -1,4 +1,6 @@
 from celery import Celery
+from celery.schedules import crontab
+from celery.signals import worker_process_init
 
 from app.core.config import settings
 
@@ -18,5 +20,23 @@ app.autodiscover_tasks(
     [
         "app.tasks.reviews",
         "app.tasks.audit",
+        "app.tasks.analysis_stats",
     ]
 )
+
+# 定时任务(需要运行 celery beat): 每天凌晨全量校正分析统计的日汇总
+app.conf.beat_schedule = {
+    "reconcile-analysis-stats": {
+        "task": "app.tasks.analysis_stats.reconcile_analysis_stats",
+        "schedule": crontab(hour=2, minute=30),
+    },
+}
+
+
+@worker_process_init.connect
+def init_worker_process(**_kwargs) -> None:
+    """prefork 子进程初始化: 配置图片缓存"""
+
+    from app.tasks.image_cache import setup_image_cache
+
+    setup_image_cache()
@@ -43,6 +43,10 @@ class Settings(BaseSettings):
 
     # 本地文件上传目录
     UPLOAD_FILES_DIR: Path = PROJECT_PATH / "uploads"
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # 流式保存上传文件时每次读写的大小, 单位字节
+    DOWNLOAD_CHUNK_SIZE: int = 256 * 1024  # 流式下载文件时每次读取的大小, 单位字节
+    # 本地文件交给nginx发送(X-Accel-Redirect)时的内部路径前缀, 如: /protected-uploads/, 为空时由应用发送
+    DOWNLOAD_X_ACCEL_REDIRECT_PREFIX: str = ""
 
     FILE_SAVE_TYPE: Literal["oss", "local"] = "local"
 
@@ -53,6 +57,7 @@ class Settings(BaseSettings):
     OSS_ACCESS_BUCKET: str = ""
     OSS_ACCESS_ENDPOINT: str = ""
     OSS_STORE_PATH: str = ""
+    OSS_MULTIPART_PART_SIZE: int = 8 * 1024 * 1024  # 分片上传每个分片的大小(最小100KB), 小于该大小的文件直接上传
 
     # 60 minutes * 24 hours * 8 days = 8 days
     FRONTEND_HOST: str = "http://localhost:5173"
@@ -83,6 +88,29 @@ class Settings(BaseSettings):
     AGENT_CLEAR_SESSION_PATH: str = '/xlm-gateway-bo-ihi/sfm-api-gateway/gateway/agent/api/clearSession'
     AGENT_DELETE_SESSION_PATH: str = '/xlm-gateway-bo-ihi/sfm-api-gateway/gateway/agent/api/deleteSession'
 
+    # agent 审查并发配置
+    # AGENT_REVIEW_USE_CHORD 开启(默认)时，每节是单独的celery子任务，按同步的方式请求智能体(复用session池)，
+    # AGENT_REVIEW_CONCURRENT、AGENT_REVIEW_ENGINE、AGENT_REVIEW_MAX_WORKERS 只在关闭 chord，
+    # 由单个任务(review_by_agent)审查整个文档时生效
+    AGENT_REVIEW_CONCURRENT: bool = True  # 是否并发审查各节，False 时逐节审查
+    AGENT_REVIEW_ENGINE: Literal["thread", "asyncio"] = "asyncio"  # 并发审查的方式: 线程池 或 asyncio
+    AGENT_REVIEW_MAX_WORKERS: int = 8  # 并发审查时的线程数
+    AGENT_CONCURRENCY_PER_AGENT: int = 4  # 同一个智能体(地址 + 智能体编码)同时在途的请求数
+    AGENT_MIN_INTERVAL: float = 0.5  # 同一个智能体两次请求之间的最小间隔, 单位秒
+    AGENT_LIMITER_BACKEND: Literal["local", "redis"] = "redis"  # 限流的范围: 进程内 或 所有worker进程共享(redis)
+    AGENT_LIMITER_LEASE_SECONDS: int = 600  # redis限流时每个在途请求占用并发数的最长时间, 超过后自动释放
+    AGENT_RUN_TIMEOUT: float = 480  # 请求智能体执行(审查、对话)的超时时间, 单位秒, 须小于限流的占用时间, 见 _enforce_agent_run_timeout
+    AGENT_REVIEW_USE_CHORD: bool = True  # 是否将每节拆分为单独的celery子任务(chord)审查
+    AGENT_REVIEW_SECTION_MAX_RETRIES: int = 2  # 每节子任务失败时的最大重试次数
+    AGENT_REVIEW_SECTION_RETRY_DELAY: int = 10  # 每节子任务重试的间隔, 单位秒
+    AGENT_REVIEW_INCREMENTAL: bool = True  # 输入(内容、附件、智能体配置)未变化的节复用之前版本的审查结果
+
+    # agent http 连接池和会话池配置
+    AGENT_HTTP_POOL_MAXSIZE: int = 16  # 每个智能体主机保持的最大连接数
+    AGENT_ASYNC_MAX_CONNECTIONS: int = 100  # asyncio 客户端的最大连接数
+    AGENT_SESSION_TIMEOUT: float = 30  # 创建/清理/删除session的超时时间, 单位秒
+    AGENT_SESSION_POOL_SIZE: int = 0  # 每个智能体预热复用的session数量, 为0时每次请求新建session
+
     # isc auth 的接口定义
     ISC_AUTH_HOST: str = '127.0.0.1'
     ISC_AUTH_PORT: int = 8003
@@ -100,6 +128,14 @@ class Settings(BaseSettings):
     PPOCR_PORT: int = 9966
     PPOCR_PATH: str = '/api/ocr/text_rec'
 
+    # ppocr 识别pdf的流水线配置
+    PPOCR_RENDER_PROCESSES: int = 2  # 渲染pdf页面的进程数, 为0时在当前进程的线程中渲染
+    PPOCR_MAX_INFLIGHT: int = 4  # 同时在途(渲染中 + 识别中)的页面数, 即请求ppocr的最大并发数
+    PPOCR_TIMEOUT: float = 120  # 请求ppocr识别1页的超时时间, 单位秒
+
+    # pdf 页面的文本层(非空白)字符数不少于该值时直接提取文本, 不再OCR识别; 为0时全部OCR识别
+    PDF_TEXT_LAYER_MIN_CHARS: int = 50
+
     # baidu ocr 配置
     BAIDUOCR_PROTOCOL: str = 'http'
     BAIDUOCR_HOST: str = '25.78.180.90'
@@ -119,6 +155,25 @@ class Settings(BaseSettings):
     # OCR 使用的API类型
     OCR_API_TYPE: OcrApiType = OcrApiType.PPOCR
 
+    # OCR 识别结果的缓存(redis)配置
+    OCR_CACHE_ENABLED: bool = True
+    OCR_CACHE_TTL: int = 30 * 24 * 3600  # 缓存的过期时间, 单位秒
+    OCR_CACHE_MAX_TEXT_BYTES: int = 1024 * 1024  # 超过该大小的识别结果不缓存
+
+    # 图片缓存(转换后的png、上传后的短链接)配置
+    IMAGE_CACHE_MEMORY_BYTES: int = 64 * 1024 * 1024  # 进程内LRU的最大字节数
+    IMAGE_CACHE_MAX_ITEM_BYTES: int = 8 * 1024 * 1024  # 超过该大小的图片不缓存
+    IMAGE_CACHE_BACKEND: Literal["none", "redis", "disk"] = "redis"  # 进程间共享的缓存层
+    IMAGE_CACHE_DIR: str = ""  # disk 缓存层的目录, 为空时使用系统临时目录下的 image-cache
+    IMAGE_CACHE_TTL: int = 7 * 24 * 3600  # 共享层缓存的过期时间, 单位秒
+
+    # 只读接口(分析统计、项目的文档列表和核查结果)的响应缓存(redis)配置
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_TTL: int = 10 * 60  # 缓存的过期时间, 单位秒, 数据修改时立即失效
+
+    # 分析统计的增量刷新任务延迟执行的时间, 单位秒, 期间同一天的多次修改只刷新1次
+    ANALYSIS_STATS_REFRESH_DELAY: int = 5
+
     # 超级用户的用户名
     SUPERUSER_USERNAME: str = "lbhai5217"
 
@@ -278,6 +333,20 @@ class Settings(BaseSettings):
 
         return self
 
+    @model_validator(mode="after")
+    def _enforce_agent_run_timeout(self) -> Self:
+        # 限流的占用期间包括创建session、执行以及清理/删除session,
+        # 请求未结束时占用就过期的话，其他请求会占用其并发数，超过 AGENT_CONCURRENCY_PER_AGENT
+        if self.AGENT_LIMITER_BACKEND == "redis" and (
+            self.AGENT_RUN_TIMEOUT + 3 * self.AGENT_SESSION_TIMEOUT
+            >= self.AGENT_LIMITER_LEASE_SECONDS
+        ):
+            raise ValueError(
+                "AGENT_RUN_TIMEOUT + 3 * AGENT_SESSION_TIMEOUT 须小于 AGENT_LIMITER_LEASE_SECONDS"
+            )
+
+        return self
+
 
 settings = Settings()  # type: ignore
 
@@ -0,0 +1,45 @@
+"""进程共享的redis客户端
+
+api 的 lifespan(`app.state.redis`)、响应缓存、OCR缓存、图片缓存、限流器以及分析统计共用同一个连接池,
+每个进程只创建1个连接池。连接池在 fork 后的子进程(celery prefork worker)中第一次使用时自动重建。
+"""
+
+import threading
+
+from redis import StrictRedis
+from redis.connection import ConnectionPool
+
+from app.core.config import settings
+
+_redis: StrictRedis | None = None
+_redis_lock = threading.Lock()
+
+
+def get_redis_client() -> StrictRedis:
+    """获取进程共享的redis客户端, 第一次使用时创建"""
+
+    global _redis
+
+    with _redis_lock:
+        if _redis is None:
+            _redis = StrictRedis.from_pool(
+                ConnectionPool(
+                    host=settings.REDIS_HOST,
+                    port=settings.REDIS_PORT,
+                    password=settings.REDIS_PASS,
+                    db=0,
+                )
+            )
+
+    return _redis
+
+
+def close_redis_client() -> None:
+    """关闭进程共享的redis客户端及其连接池, 之后再次使用时重新创建"""
+
+    global _redis
+
+    with _redis_lock:
+        if _redis is not None:
+            _redis.close()
+            _redis = None
@@ -4,12 +4,13 @@ from typing import Any
 from fastapi import FastAPI
 from fastapi.routing import APIRoute
 from loguru import logger
-from redis import StrictRedis
-from redis.connection import ConnectionPool
 from starlette.middleware.cors import CORSMiddleware
 
 from app.api.main import api_router
 from app.core.config import settings
+from app.core.redis import close_redis_client, get_redis_client
+from app.tasks.async_reviews import new_async_agent_client
+from app.tasks.image_cache import setup_image_cache
 
 
 def custom_generate_unique_id(route: APIRoute) -> str:
@@ -19,14 +20,23 @@ def custom_generate_unique_id(route: APIRoute) -> str:
 async def lifespan(app: FastAPI) -> Any:
     logger.info("【lifespan】初始化...")
 
-    # 初始化Redis
-    redis = StrictRedis.from_pool(ConnectionPool(host=settings.REDIS_HOST, port=settings.REDIS_PORT, password=settings.REDIS_PASS, db=0))
-    app.state.redis = redis
+    # 初始化Redis, 与缓存、限流器等共用进程的连接池
+    app.state.redis = get_redis_client()
+
+    # 初始化解析文档使用的图片缓存
+    setup_image_cache()
+
+    # 初始化请求智能体的asyncio客户端
+    agent_client = new_async_agent_client()
+    app.state.agent_client = agent_client
 
     yield
 
     # 关闭redis
-    redis.close()
+    close_redis_client()
+
+    # 关闭智能体客户端
+    await agent_client.aclose()
 
 
 app = FastAPI(
@@ -1,8 +1,9 @@
 # mypy: ignore-errors
 
-from .documents import Project, Document, DocumentContent, DocumentContentReview # noqa
+from .documents import Project, Document, DocumentContent, DocumentContentReview, DocumentSectionReview # noqa
 from .chat import ChatSession, Chat # noqa
 from .parsedfile import ParsedFile # noqa
 from .celery_result import CeleryResult # noqa
 from .agentsetting import AgentSetting, AgentSettingDebugRecord # noqa
-from .iscuser import IscUser # noqa
\ No newline at end of file
+from .iscuser import IscUser # noqa
+from .analysis import AnalysisDailyStat # noqa
\ No newline at end of file
@@ -0,0 +1,26 @@
+"""分析统计相关模型"""
+
+from datetime import date, datetime
+
+from sqlmodel import Field, SQLModel
+
+from app.models.enums import AnalysisMetric
+
+
+class AnalysisDailyStat(SQLModel, table=True):
+    """分析统计的日汇总表
+
+    每天、每个指标、每个维度值1行, 由审查任务按天增量刷新, 定时任务全量校正。
+    系统概览、问题/建议统计从该表汇总，不再扫描工程、文档、审查详细表。
+    """
+
+    stat_date: date = Field(primary_key=True, description="统计日期")
+    metric: AnalysisMetric = Field(primary_key=True, description="统计指标")
+    dim: str = Field(
+        default="",
+        primary_key=True,
+        max_length=255,
+        description="维度的值, 如工程类型、审核状态、问题标签; 没有维度时为空",
+    )
+    total: int = Field(default=0, description="数量")
+    update_at: datetime = Field(default_factory=datetime.now, description="刷新时间")
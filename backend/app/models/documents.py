@@ -10,11 +10,12 @@ from zoneinfo import ZoneInfo
 from pydantic import computed_field
 from sqlalchemy.dialects.mysql.types import MEDIUMTEXT
 from sqlalchemy.orm import Mapped, relationship
-from sqlmodel import Field, Relationship, SQLModel, UniqueConstraint
+from sqlmodel import Field, Index, Relationship, SQLModel, UniqueConstraint
 
 from app.models.common import TableBase
 from app.models.enums import (
     FileCategory,
+    ForSection,
     ProjectTypeEnum,
     ReviewStatus,
     SaveType,
@@ -81,6 +82,16 @@ class Project(TableBase, ProjectBase, table=True):
     # )
     # 由于项目信息软删除，所以取消这个约束
 
+    # 项目列表: 按用户(超级用户不过滤)过滤未删除的项目，按更新时间倒序分页
+    __table_args__ = (
+        Index("ix_project_iscuser_id_is_delete_update_at", "iscuser_id", "is_delete", "update_at"),
+        Index("ix_project_is_delete_update_at", "is_delete", "update_at"),
+        # 按天刷新分析统计
+        Index("ix_project_create_at", "create_at"),
+        Index("ix_project_review_begin_at", "review_begin_at"),
+        Index("ix_project_review_done_at", "review_done_at"),
+    )
+
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     iscuser_id: str = Field(
         description="isc用户ID",
@@ -196,7 +207,17 @@ class DocumentUpdate(SQLModel):
 
 # 数据库模型, 根据类名推断出的数据库表
 class Document(TableBase, DocumentBase, table=True):
+    # 项目某个版本的某类文档(如三措文档)
+    __table_args__ = (
+        Index("ix_document_proj_id_proj_version_file_category", "proj_id", "proj_version", "file_category"),
+        # 按天刷新分析统计
+        Index("ix_document_create_at", "create_at"),
+    )
+
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    file_sha256: str | None = Field(
+        default=None, max_length=64, description="文件内容的sha256, 上传时计算"
+    )
     iscuser_id: str = Field(
         description="isc用户ID",
         foreign_key="iscuser.id",
@@ -332,6 +353,11 @@ class DocumentContentCreate(DocumentContentBase):
 
 # 数据库模型, 根据类名推断出的数据库表
 class DocumentContent(TableBase, DocumentContentBase, table=True):
+    # 文档的某节内容, 以及文档的所有内容
+    __table_args__ = (
+        Index("ix_documentcontent_doc_id_section", "doc_id", "section"),
+    )
+
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     iscuser_id: str = Field(
         description="isc用户ID",
@@ -383,6 +409,13 @@ class DocumentContentReviewBase(SQLModel):
 class DocumentContentReview(TableBase, DocumentContentReviewBase, table=True):
     """文档内容审查结果表"""
 
+    # 某节内容(某个智能体)的审查详细、项目某个版本的审查详细、按创建时间的统计
+    __table_args__ = (
+        Index("ix_documentcontentreview_content_id_for_section", "content_id", "for_section"),
+        Index("ix_documentcontentreview_proj_id_proj_version", "proj_id", "proj_version"),
+        Index("ix_documentcontentreview_is_delete_create_at", "is_delete", "create_at"),
+    )
+
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     iscuser_id: str = Field(
         description="isc用户ID",
@@ -419,6 +452,7 @@ class DocumentContentReview(TableBase, DocumentContentReviewBase, table=True):
     )
 
     section: SectionType = Field(description="所属节")
+    for_section: ForSection | None = Field(default=None, description="审查该节使用的智能体")
 
     question: str | None = Field(default=None, description="存在的问题描述", sa_type=MEDIUMTEXT)
     question_tag: str | None = Field(default=None, max_length=255, description="问题标签")
@@ -440,6 +474,42 @@ class DocumentContentReview(TableBase, DocumentContentReviewBase, table=True):
     )
 
 
+class DocumentSectionReview(TableBase, SQLModel, table=True):
+    """某节的某个智能体(ForSection)的审查记录, 用于增量审查
+
+    review_hash 为请求智能体的全部输入(该节及依赖节的内容、附件、智能体配置)的摘要,
+    之后的版本 review_hash 相同时, 直接复用该次的审查结果, 不再请求智能体。
+    """
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+
+    # 反射项目
+    proj_id: uuid.UUID = Field(
+        foreign_key="project.id",
+        nullable=False,
+        ondelete="CASCADE",
+        description="所属项目",
+    )
+    proj_version: int = Field(
+        description="文件对应项目的第几个版本ID, 该版本id 小于等于项目的版本ID"
+    )
+
+    # 反射文档内容
+    content_id: uuid.UUID = Field(
+        description="所属文档内容",
+        foreign_key="documentcontent.id",
+        nullable=False,
+        ondelete="CASCADE",
+    )
+
+    section: SectionType = Field(description="所属节")
+    for_section: ForSection = Field(description="审查该节使用的智能体")
+
+    review_hash: str = Field(max_length=64, index=True, description="审查输入的摘要, sha256")
+    review_pass: bool = Field(description="是否审查通过")
+    err_msg: str = Field(default="", description="审查的错误信息", sa_type=MEDIUMTEXT)
+
+
 class DocumentContentReviewPublic(SQLModel):
     """api接口返回内容"""
 
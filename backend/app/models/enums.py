@@ -169,4 +169,13 @@ ForSectionTitleMap: dict[ForSection, str] = {
     ForSection.eight: "应急处置措施",
     ForSection.nine: "施工作业工艺标准及验收",
     ForSection.ten: "现场作业示意图",
-}
\ No newline at end of file
+}
+
+class AnalysisMetric(StrEnum):
+    """分析统计(日汇总)的指标"""
+
+    PROJECT = "project"  # 工程数, 按创建日期, 维度: 工程类型
+    PROJECT_STATUS = "project_status"  # 工程数, 按状态对应的日期, 维度: 审核状态
+    DOCUMENT = "document"  # 文档数, 按创建日期
+    QUESTION_TAG = "question_tag"  # 问题数, 按创建日期, 维度: 问题标签
+    FEEDBACK_TAG = "feedback_tag"  # 建议数, 按创建日期, 维度: 建议标签
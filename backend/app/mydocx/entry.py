@@ -1,19 +1,23 @@
 from __future__ import annotations  # 支持类型注解
 
 import copy
+import functools
 import html
 import json
 import os
 import shutil
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future
 from datetime import datetime
 from enum import StrEnum
 from pathlib import Path
-from typing import Any, BinaryIO, Literal
+from typing import Any, BinaryIO
 from urllib.parse import quote, unquote
 
 from loguru import logger
 
 from ms_office.api import open_docx
+from ms_office.exceptions import RevisionMarkupError
 from ms_office.oxml.dml.main import (
     namespace_c,  # 图表: 柱状图, 饼图...
     namespace_dgm,  # 智能图形
@@ -53,33 +57,50 @@ from ms_office.oxml.wml.main import (
     # 表格
     CT_Tbl,
     CT_Tc,
-    CT_TcPr,
     CT_Text,  # 文本
-    ST_DecimalNumber,
     ST_Merge,
     Union_CT_SdtCellRowRunBlock,
     Union_CT_TabStop,  # tab
     qn,
 )
+from ms_office.shared.image import Image
 from ms_office.units import Emu
 from ms_office.wml.number import Numbering
+from ms_office.wml.styles import Styles
 from ms_office.wml.wordprocessing import WordProcessing
 
 from .exceptions import ChartDrawingException, ParseException, ReviewException
 
 # 标题支持
 from .tools.consts import FileType, HeadingType, HeadingTypeTagMap
-from .tools.convert import ImageTool
+from .tools.convert import ImageTool, get_image_convert_pool
+from .tools.image_cache import IMAGE_FORMAT_PNG, get_image_cache
 
 # 云盘支持
 from .tools.oss import OssTool
-from .tools.struct import HtmlParagraph, HtmlRun
+from .tools.render import (
+    gen_a_tag,
+    render_block_markdown,
+    render_block_shtml,
+    render_block_txt,
+)
+from .tools.struct import (
+    Block,
+    BlockCell,
+    BlockParagraph,
+    BlockTable,
+    HtmlParagraph,
+    HtmlRun,
+    InlineLink,
+    InlineMark,
+)
 
 # 解析样式支持
 from .tools.style import (
+    TableGridCell,
     character_ct_style2html,
     # 表格单元格跨列，跨行
-    gen_table_tcpr_matrix,
+    gen_table_grid,
     get_cell_styles_from_define,
     get_character_styles_from_define,
     get_docx_default_character_style,
@@ -88,10 +109,10 @@ from .tools.style import (
     get_paragraph_styles_from_define,
     get_table_cell_colspan,
     get_table_cell_default_styls,
-    get_table_cell_rowspan,
     get_table_cell_styles,
     get_table_character_styles_from_define,
     get_table_paragraph_styles_from_define,
+    get_table_row_cells,
     get_table_row_styles,
     # 表格样式
     get_table_styles,
@@ -117,6 +138,22 @@ class RenderFormat(StrEnum):
     txt = "txt"
     html = "html"
     shtml = "shtml"  # simple html 没有多余的样式信息
+    markdown = "markdown"
+
+
+# 由不带样式的块级内容渲染的格式, 返回None的块不输出
+_block_renderers: dict[RenderFormat, Callable[[Block], str | None]] = {
+    RenderFormat.txt: render_block_txt,
+    RenderFormat.shtml: render_block_shtml,
+    RenderFormat.markdown: render_block_markdown,
+}
+
+# 块与块之间的分隔符
+_block_separators: dict[RenderFormat, str] = {
+    RenderFormat.txt: "\n",
+    RenderFormat.shtml: "\n",
+    RenderFormat.markdown: "\n\n",
+}
 
 
 class Extract:
@@ -146,7 +183,7 @@ class Extract:
             self.docx_temp_path = self.doc_name
 
             with open(self.doc_name, "wb") as fw:
-                fw.write(doc_path.read())
+                shutil.copyfileobj(doc_path, fw)
 
             # 恢复到一开始的位置
             doc_path.seek(0)
@@ -154,6 +191,9 @@ class Extract:
         self.docx: WordProcessing = open_docx(doc_path)  # 打开ppt文件
         self.need_rm_files.append(self.docx_temp_path)
 
+        # 在工作池中转换格式的图片, 以部件名称为键
+        self._converted_images: dict[str, Future[bytes | None]] = {}
+
         # 当前解析的数据，调试使用
         self._current_slide: int = 0  # 当前解析的幻灯片索引
         self._current_shape_level: int = (
@@ -191,6 +231,24 @@ class Extract:
             # 重新创建当前目录
             os.makedirs(self._debug_dir, exist_ok=True)
 
+    @functools.cached_property
+    def styles(self) -> Styles | None:
+        """文档的样式表, 文档没有样式定义部件时为None"""
+
+        try:
+            return self.docx.styles
+
+        # 缺少部件时 WMLPartFinder 抛出 ValueError, 部件为空时 Styles 抛出 AttributeError
+        except (ValueError, AttributeError):
+            logger.warning("文档没有样式定义部件")
+            return None
+
+    @property
+    def style_map(self) -> dict[str, Any]:
+        """样式ID -> 样式, 文档没有样式定义部件时为空"""
+
+        return self.styles.style_map if self.styles is not None else {}
+
     def debug_write(self, filename: str, xml: str) -> None:
         """调试时将xml写入文件"""
 
@@ -215,18 +273,22 @@ class Extract:
     def parse(self, render_format: RenderFormat = RenderFormat.html) -> str:
         # 解析docx文件入口
 
-        self.render_format = render_format
+        return self.parse_formats([render_format])[render_format]
 
-        _body = self.docx.body
+    def parse_formats(
+        self, render_formats: Iterable[RenderFormat]
+    ) -> dict[RenderFormat, str]:
+        """解析docx文件, 返回每种格式的渲染结果
 
-        if _body is None:
-            raise ParseException("文件内容为空，无法解析。")
+        txt、shtml、markdown 不需要样式，只遍历1次正文即可同时渲染；
+        html 需要计算样式，单独遍历1次正文。
+        """
 
-        if self.docx.is_review:
-            raise ReviewException("文档处于修订模式，无法解析。")
+        render_formats = list(dict.fromkeys(render_formats))
 
-        total_pragrahs = len(_body.block_level_elts)
-        logger.info(f"docx共有{total_pragrahs}个段落")
+        # 批注范围和修订标记在流式解析正文时检查
+        if self.docx.comments is not None:
+            raise ReviewException("文档处于修订模式，无法解析。")
 
         # 调试输出 document.xml
         if self._debug_dir:
@@ -239,9 +301,10 @@ class Extract:
                     self.docx.part.rels.xml.decode(),
                 )
             # styles.xml
-            self.debug_write(
-                self.docx.styles.part.part_name.filename, self.docx.styles.part.oxml.xml
-            )
+            if self.styles is not None:
+                self.debug_write(
+                    self.styles.part.part_name.filename, self.styles.part.oxml.xml
+                )
             # numbering.xml
             if self.docx.number is not None:
                 self.debug_write(
@@ -256,6 +319,80 @@ class Extract:
                     self.docx.theme.part.oxml.xml,
                 )
 
+        rendered: dict[RenderFormat, str] = {}
+
+        block_formats = [fmt for fmt in render_formats if fmt in _block_renderers]
+
+        if block_formats:
+            rendered.update(self.parse_block_formats(block_formats))
+
+        if RenderFormat.html in render_formats:
+            rendered[RenderFormat.html] = self.parse_html()
+
+        return rendered
+
+    def reset_numbering(self) -> None:
+        """编号的计数有状态，每次遍历正文前重置"""
+
+        if self.docx.number is not None:
+            self.docx.number.reset_numbering()
+
+    def parse_block_formats(
+        self, render_formats: list[RenderFormat]
+    ) -> dict[RenderFormat, str]:
+        """遍历1次正文, 将每个块同时渲染为多种格式"""
+
+        self.reset_numbering()
+
+        rendered_arrs: dict[RenderFormat, list[str]] = {
+            fmt: [] for fmt in render_formats
+        }
+
+        for block in self.parse_blocks(self.iter_body_elts()):
+            for fmt, rendered_arr in rendered_arrs.items():
+                text = _block_renderers[fmt](block)
+
+                if text is not None:
+                    rendered_arr.append(text)
+
+        return {
+            fmt: _block_separators[fmt].join(rendered_arr)
+            for fmt, rendered_arr in rendered_arrs.items()
+        }
+
+    def iter_rendered_blocks(
+        self, render_format: RenderFormat = RenderFormat.txt
+    ) -> Iterator[str]:
+        """边解析边渲染正文，逐块返回渲染结果，不生成整个文档的字符串
+
+        以块之间的分隔符连接所有块，与 parse 的结果相同。仅支持不带样式的格式(txt、shtml、markdown)。
+        """
+
+        renderer = _block_renderers.get(render_format)
+
+        if renderer is None:
+            raise ValueError(f"不支持逐块渲染的格式: {render_format}")
+
+        if self.docx.comments is not None:
+            raise ReviewException("文档处于修订模式，无法解析。")
+
+        self.reset_numbering()
+
+        for block in self.parse_blocks(self.iter_body_elts()):
+            text = renderer(block)
+
+            if text is not None:
+                yield text
+
+    def parse_html(self) -> str:
+        """解析正文并计算样式，渲染为html格式"""
+
+        self.render_format = RenderFormat.html
+        self.reset_numbering()
+
+        # 解析正文的同时，在工作池中并行转换图片
+        self.prefetch_converted_images()
+
         paragraph_arr: list[HtmlParagraph | str] = []
 
         # 获取文档默认段落样式
@@ -267,9 +404,8 @@ class Extract:
         )
         logger.info(f"docx段落默认样式: {paragraph_styles}")
 
-        for block_no, block_ele in enumerate(_body.block_level_elts, start=1):
+        for block_no, block_ele in enumerate(self.iter_body_elts(), start=1):
             # logger.info(f"{block_no} -> {type(block_ele) = }: {block_ele.text = }")
-            # logger.info(f"处理段落: {block_no}/{total_pragrahs} ...")
 
             # 目录模块判断
             # 三措文档没有目录块
@@ -293,17 +429,36 @@ class Extract:
                 # logger.info(f"[{block_no}]忽略段落块级内容: {type(block_ele)}")
                 ...
 
-            # 清除lxml建立的xml树，释放内存
-            # block_ele.clear()  # type: ignore
-
-        # 清除lxml建立的xml树，释放内存
-        # _body.clear()  # type: ignore
+            # 处理完的块级元素在下一次迭代时由 iter_body_elts 清除，释放内存
 
         # 渲染为html格式
         rendered_text = self.render_paragraph(paragraph_arr)
 
         return rendered_text
 
+    def iter_body_elts(self) -> Iterator[Any]:
+        """流式遍历正文的块级元素，每个元素处理完后即被释放
+
+        Raises:
+            ReviewException: 正文中有批注范围或修订标记
+            ParseException: 正文中没有任何内容
+        """
+
+        total_blocks = 0
+
+        try:
+            for block_ele in self.docx.iter_body_elts():
+                total_blocks += 1
+                yield block_ele
+
+        except RevisionMarkupError as e:
+            raise ReviewException("文档处于修订模式，无法解析。") from e
+
+        if total_blocks == 0:
+            raise ParseException("文件内容为空，无法解析。")
+
+        logger.info(f"docx共有{total_blocks}个段落")
+
     # --- 正文段落块 ----
     def parse_paragraph(
         self,
@@ -559,6 +714,16 @@ class Extract:
 
             a_tag_content = "\n".join(txts)
 
+        return self.gen_hyperlink_tag(ele, a_tag_content)
+
+    def gen_hyperlink_tag(self, ele: CT_Hyperlink, a_tag_content: str) -> str:
+        """生成超链接的a标签"""
+
+        return gen_a_tag(self.gen_hyperlink_attrs(ele), a_tag_content)
+
+    def gen_hyperlink_attrs(self, ele: CT_Hyperlink) -> dict[str, Any]:
+        """超链接a标签的属性"""
+
         # a标签属性
         a_tag_attr: dict[str, Any] = {}
 
@@ -573,14 +738,7 @@ class Extract:
         if ele.anchor is not None:
             a_tag_attr["href"] = f"#{ele.anchor.lower()}"
 
-        # 构造a标签属性字符串
-        a_tag_attr_str = ""
-        if a_tag_attr:
-            a_tag_attr_str = " ".join(
-                [f'{name}="{val}"' for name, val in a_tag_attr.items()]
-            )
-
-        return f"<a {a_tag_attr_str}>{a_tag_content}</a>"
+        return a_tag_attr
 
     def parse_paragraph_sdtrun(
         self, ele: CT_SdtRun, character_styles: dict[str, Any] | None = None
@@ -1089,8 +1247,8 @@ class Extract:
         # 行解析
         tblrows = ele.tr_lst
 
-        # 单元格属性矩阵
-        tcpr_matrix = gen_table_tcpr_matrix(ele)
+        # 单元格的网格, 跨行跨列信息
+        table_grid = gen_table_grid(ele)
 
         row_html_arr: list[str] = []
 
@@ -1132,8 +1290,7 @@ class Extract:
                 current_cell_styles,
                 current_paragraph_styles,
                 current_character_styles,
-                r_no,
-                tcpr_matrix,
+                table_grid[r_no],
             )
 
             row_html_arr.append(row_html)
@@ -1170,8 +1327,7 @@ class Extract:
         cell_default_styles: dict[str, Any],
         paragraph_styls: dict[str, Any],
         character_styles: dict[str, Any],
-        row_no: int,
-        tcpr_matrix: list[list[CT_TcPr | None]],
+        grid_row: list[TableGridCell],
     ) -> str:
         """解析行(Row)里面的内容"""
 
@@ -1182,56 +1338,19 @@ class Extract:
 
         # 行解析
         cell_html_arr: list[str] = []
-        colspans: list[int] = []
-        rowspans: list[int] = []  # 该变量声明，还未使用，以做不时之需.
 
-        # 常规的tc标签
-        for col_no, cell in enumerate(ele.tc_lst):
-            colspans_total = sum(colspans)
-
-            cell_html, colspan, rowspan = self.parse_table_cell(
+        # 常规的tc标签以及sdt标签里面的tc标签
+        for cell, grid_cell in zip(get_table_row_cells(ele), grid_row, strict=True):
+            cell_html = self.parse_table_cell(
                 cell,
                 cell_default_styles,
                 paragraph_styls,
                 character_styles,
-                row_no,
-                col_no,
-                tcpr_matrix,
-                colspans_total,
+                grid_cell,
             )
 
             if cell_html is not None:
-                cell_html_arr.append(cell_html) if cell_html is not None else ""
-
-                colspans.append(colspan)
-                rowspans.append(rowspan)
-
-        # sdt标签里面的tc标签处理
-        if (
-            ele.sdt is not None
-            and isinstance(ele.sdt, Union_CT_SdtCellRowRunBlock)
-            and ele.sdt.sdtContent_cell is not None
-            and ele.sdt.sdtContent_cell.tc_lst is not None
-        ):
-            for col_no, cell in enumerate(ele.sdt.sdtContent_cell.tc_lst):
-                colspans_total = sum(colspans)
-
-                cell_html, colspan, rowspan = self.parse_table_cell(
-                    cell,
-                    cell_default_styles,
-                    paragraph_styls,
-                    character_styles,
-                    row_no,
-                    col_no,
-                    tcpr_matrix,
-                    colspans_total,
-                )
-
-                if cell_html is not None:
-                    cell_html_arr.append(cell_html) if cell_html is not None else ""
-
-                    colspans.append(colspan)
-                    rowspans.append(rowspan)
+                cell_html_arr.append(cell_html)
 
         # 封装tr标签内容
         row_html_content = "\n".join(cell_html_arr)
@@ -1260,14 +1379,8 @@ class Extract:
         cell_default_styls: dict[str, Any],
         table_paragraph_styls: dict[str, Any],
         table_character_styles: dict[str, Any],
-        row_no: int,
-        col_no: int,
-        tcpr_matrix: list[list[CT_TcPr | None]],
-        colspans_total: int,
-    ) -> (
-        tuple[None, ST_DecimalNumber | Literal[1], Literal[1]]
-        | tuple[str, ST_DecimalNumber | int, int]
-    ):
+        grid_cell: TableGridCell,
+    ) -> str | None:
         """解析单元格里面的内容"""
 
         # 单元格属性
@@ -1312,28 +1425,15 @@ class Extract:
         # ---- 获取单元格内容 end -----
 
         # ---- 获取跨行跨列信息 start -----
-        colspan: int = 1
-        rowspan: int = 1
+        colspan = grid_cell.colspan
+        rowspan = grid_cell.rowspan
 
         if ele.tcPr is not None:
             get_table_cell_styles(ele.tcPr, cell_styles)
-            colspan = get_table_cell_colspan(ele.tcPr)
-            # logger.info(f"re{colspan = }")
-
-            # 纵向合并的单元格,计算合并的行数
-            if ele.tcPr.vMerge is not None and ele.tcPr.vMerge.val == ST_Merge.restart:
-                # 可能存在跨列的情况, col_no不能真实反映当前cell所处的col索引.
-                really_colspan = colspans_total if colspans_total > col_no else col_no
-                rowspan = get_table_cell_rowspan(tcpr_matrix, row_no, really_colspan)
-
-            # 说明当前单元格与前行单元格合并, 不处理当前单元格. 跳过.
-            elif (
-                ele.tcPr.vMerge is not None and ele.tcPr.vMerge.val == ST_Merge.Continue
-            ):
-                return None, colspan, rowspan  # type: ignore
 
-        # logger.info(f"{colspan = }")
-        # logger.info(f"{rowspan = }")
+        # 说明当前单元格与前行单元格合并, 不处理当前单元格. 跳过.
+        if grid_cell.covered:
+            return None
 
         # ---- 获取跨行跨列信息 end -----
 
@@ -1381,7 +1481,157 @@ class Extract:
         # ---- 封装html标签 end -----
         # logger.info(f"{td_html = }")
 
-        return td_html, colspan, rowspan
+        return td_html
+
+    # --- 不带样式的块级内容解析 ----
+    # 只保留影响文字内容的部分: 编号、制表符、换行、超链接和表格单元格的顺序，不解析任何样式，
+    # 解析出的块级内容可以同时渲染为 txt、shtml、markdown 格式。
+
+    def parse_blocks(self, block_elts: Iterable[Any]) -> Iterator[Block]:
+        """将正文的块级元素解析为不带样式的段落、表格"""
+
+        for block_ele in block_elts:
+            # 三措文档没有目录块
+            if isinstance(block_ele, Union_CT_SdtCellRowRunBlock):
+                continue
+
+            if isinstance(block_ele, CT_P):
+                yield self.parse_paragraph_block(block_ele)
+
+            elif isinstance(block_ele, CT_Tbl):
+                yield self.parse_table_block(block_ele)
+
+    def parse_paragraph_block(self, ele: CT_P) -> BlockParagraph:
+        """解析段落的标签名、编号以及文本内容"""
+
+        number_text = ""
+        style_id = ""
+        style_name = ""
+
+        # 编号的计数有状态，调用顺序须与样式解析时一致: 先样式表中的编号，再段落自身的编号
+        if ele.pPr is not None:
+            if ele.pPr.pStyle is not None:
+                style_id = ele.pPr.pStyle.val_str
+                ct_style = self.style_map.get(style_id)
+
+                if ct_style is not None and ct_style.name is not None:
+                    style_name = ct_style.name.val_str
+
+                if (
+                    self.docx.number is not None
+                    and ct_style is not None
+                    and ct_style.pPr is not None
+                    and ct_style.pPr.numPr is not None
+                ):
+                    number_text = self.parse_number_text(
+                        self.docx.number, ct_style.pPr.numPr
+                    )
+
+            if ele.pPr.numPr is not None and self.docx.number is not None:
+                number_text = self.parse_number_text(self.docx.number, ele.pPr.numPr)
+
+        # 标题段落标签, p 或 h1..h6 标签
+        paragraph_tag = "p"
+
+        if HeadingType.have_value(style_id):
+            paragraph_tag = HeadingTypeTagMap[HeadingType(style_id)]
+
+        elif HeadingType.have_value(style_name):
+            paragraph_tag = HeadingTypeTagMap[HeadingType(style_name)]
+
+        items: list[str | InlineMark | InlineLink] = []
+
+        for content_ele in ele.p_content:
+            if isinstance(content_ele, CT_R):
+                items.extend(self.parse_paragraph_run_items(content_ele))
+
+            elif isinstance(content_ele, CT_Hyperlink):
+                items.append(self.parse_paragraph_hyperlink_block(content_ele))
+
+            elif (
+                isinstance(content_ele, CT_SdtRun)
+                and content_ele.sdtContent_run is not None
+            ):
+                for sdt_ele in content_ele.sdtContent_run.p_content:
+                    if isinstance(sdt_ele, CT_R):
+                        items.extend(self.parse_paragraph_run_items(sdt_ele))
+
+        return BlockParagraph(paragraph_tag, number_text, items)
+
+    def parse_paragraph_hyperlink_block(self, ele: CT_Hyperlink) -> InlineLink:
+        """解析段落中的超链接"""
+
+        items: list[str | InlineMark] = []
+
+        for r in ele.r:
+            items.extend(self.parse_paragraph_run_items(r))
+
+        return InlineLink(items, self.gen_hyperlink_attrs(ele))
+
+    def parse_paragraph_run_items(self, ele: CT_R) -> list[str | InlineMark]:
+        """解析run中的文本、换行和制表符，忽略绘制对象"""
+
+        # 如果包含webHidden，则不处理此run元素
+        if ele.rPr is not None and ele.rPr.webHidden is not None:
+            return []
+
+        items: list[str | InlineMark] = []
+
+        for content_ele in ele.run_inner_content:
+            # 换行
+            if isinstance(content_ele, CT_Br):
+                items.append(InlineMark.br)
+
+            # 常规文本
+            elif isinstance(content_ele, CT_Text):
+                if content_ele.local_tagname == "t" and content_ele.text:
+                    items.append(content_ele.text)
+
+            # 制表符
+            elif (
+                isinstance(content_ele, Union_CT_TabStop)
+                and content_ele.local_tagname == "tab"
+            ):
+                items.append(InlineMark.tab)
+
+        return items
+
+    def parse_table_block(self, ele: CT_Tbl) -> BlockTable:
+        """解析表格中每一行的单元格"""
+
+        return BlockTable([self.parse_table_row_block(row) for row in ele.tr_lst])
+
+    def parse_table_row_block(self, ele: CT_Row) -> list[BlockCell]:
+        """解析行(Row)里面的单元格"""
+
+        return [self.parse_table_cell_block(cell) for cell in get_table_row_cells(ele)]
+
+    def parse_table_cell_block(self, ele: CT_Tc) -> BlockCell:
+        """解析单元格里面的段落以及跨列、合并信息"""
+
+        # 合并的单元格中的编号也要计数, 所以先解析段落
+        paragraphs = [self.parse_paragraph_block(p) for p in ele.p_lst]
+
+        # sdt 标签
+        if (
+            ele.sdt is not None
+            and isinstance(ele.sdt, Union_CT_SdtCellRowRunBlock)
+            and ele.sdt.sdtContent_block is not None
+            and ele.sdt.sdtContent_block.p_lst is not None
+        ):
+            paragraphs.extend(
+                self.parse_paragraph_block(p) for p in ele.sdt.sdtContent_block.p_lst
+            )
+
+        if ele.tcPr is None:
+            return BlockCell(paragraphs)
+
+        # 当前单元格是否与前行单元格合并
+        merged = (
+            ele.tcPr.vMerge is not None and ele.tcPr.vMerge.val == ST_Merge.Continue
+        )
+
+        return BlockCell(paragraphs, get_table_cell_colspan(ele.tcPr), merged)
 
     # ---- 绘制(drawing)对象块 -------
 
@@ -1654,6 +1904,35 @@ class Extract:
 
     # ---- 生成img标签工具函数 -------
 
+    def prefetch_converted_images(self) -> None:
+        """将文档中需要转换格式(wmf、emf)的图片提交到工作池中并行转换"""
+
+        pool = get_image_convert_pool()
+
+        for image in self.docx.get_images():
+            part_name = str(image.part.part_name)
+
+            if part_name in self._converted_images or not ImageTool.need_convert(
+                image.filename
+            ):
+                continue
+
+            self._converted_images[part_name] = pool.submit(
+                image.filename, image.blob, image.sha1
+            )
+
+    def convert_image(self, image: Image, sha1: str) -> bytes | None:
+        """转换图片格式, 优先使用工作池中已转换的结果"""
+
+        future = self._converted_images.get(str(image.part.part_name))
+
+        if future is None:
+            return get_image_convert_pool().convert_cached(
+                image.filename, image.blob, sha1
+            )
+
+        return future.result()
+
     def gen_img_by_rid(self, rid: str, width: float, height: float) -> str | None:
         """根据传入的img 的关系id，返回图片
 
@@ -1667,21 +1946,25 @@ class Extract:
         if image is None:
             return None
 
+        sha1 = image.sha1
+
         # 转换图片
         if image.filename.endswith(".wmf") and ImageTool.wmf2gd_exists():
-            image_bytes = ImageTool.convert_wmf_image(image)
+            image_bytes = self.convert_image(image, sha1)
 
             if not image_bytes:
                 return f"<span>[{image.filename}]:转换wmf图片失败</span>"
 
         elif image.filename.endswith(".emf") and ImageTool.inkscape_exists():
-            image_bytes = ImageTool.convert_emf_image_by_inkscape(image)
+            image_bytes = self.convert_image(image, sha1)
 
             if not image_bytes:
                 return f"<span>[{image.filename}]:转换emf图片失败</span>"
 
         elif image.filename.endswith((".tif", ".tiff")):
-            image_bytes = ImageTool.convert_tif_image_by_pil(image)
+            image_bytes = get_image_cache().get_or_create(
+                sha1, IMAGE_FORMAT_PNG, lambda: ImageTool.convert_tif_image_by_pil(image)
+            )
 
             if not image_bytes:
                 return f"<span>[{image.filename}]:转换tif格式图片失败</span>"
@@ -1689,7 +1972,7 @@ class Extract:
         else:
             image_bytes = image.blob
 
-        return self.gen_img_tag(image.filename, image.sha1, image_bytes, width, height)
+        return self.gen_img_tag(image.filename, sha1, image_bytes, width, height)
 
     def gen_img_tag(
         self,
@@ -1743,6 +2026,12 @@ class Extract:
 
         for current_p in paragraph_arr:
             if isinstance(current_p, str):
+                if context_spacing_arr:
+                    rendered_arr.extend(
+                        self.render_same_style_id_pragraphs(context_spacing_arr)
+                    )
+                    context_spacing_arr.clear()
+
                 rendered_arr.append(current_p)
                 continue
 
@@ -1765,6 +2054,10 @@ class Extract:
                 else:
                     rendered_arr.append(gen_paragraph_txt(current_p))
 
+        # 最后一组上下文边距段落
+        if context_spacing_arr:
+            rendered_arr.extend(self.render_same_style_id_pragraphs(context_spacing_arr))
+
         return "\n".join(rendered_arr)
 
     def render_same_style_id_pragraphs(self, paragraph_arr: list[HtmlParagraph]) -> list[str]:
@@ -1,15 +1,22 @@
 
+import atexit
+import functools
 import os
+import select
 import shutil
 import subprocess
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from io import BytesIO
-from pathlib import Path
 
 from loguru import logger
 from PIL import Image as PIL_Image
 
 from ms_office.shared.image import Image
 
+from .image_cache import IMAGE_FORMAT_PNG, get_image_cache
+
 
 class ImageTool:
     """图片工具"""
@@ -49,44 +56,7 @@ class ImageTool:
         这里对emf的兼容性最好， 但是解析出来是1页.
         """
 
-        blob = image.blob
-        filename = image.filename
-
-        emf_file = str(Path(filename).resolve())  # 以wmf结尾
-
-        # xxx.pdf => xxx.png
-        png_file = f"{emf_file[0:-4]}.png"
-
-        if os.path.exists(png_file):
-            return png_file
-
-        with open(emf_file, "wb") as fw:
-            fw.write(blob)  # type: ignore
-
-        # cmd = cls.inkscape_command_line(png_file, emf_file)
-        cmd = f"soffice --headless --convert-to png {emf_file}"
-        logger.info(f"转换 emf文件: {cmd}")
-
-        if cmd is None:
-            return None
-
-        logger.info(cmd)
-
-        process = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE)
-        process.wait()
-
-        # returncode 不为 0 表示非正常退出
-        if process.returncode and process.stdout:
-            logger.warning(
-                f"emf:【{emf_file}】{cmd} 转换emf文件失败: {process.stdout.read() !r}"
-            )
-            return None
-
-        # 删除使用过的pdf文件
-        if os.path.exists(emf_file):
-            os.remove(emf_file)
-
-        return png_file
+        return get_image_convert_pool().convert_emf_by_soffice(image.blob)
 
     @classmethod
     def convert_emf_image_by_inkscape(cls, image: Image):
@@ -95,86 +65,25 @@ class ImageTool:
         inkscape emf -> png
         """
 
-        blob = image.blob
-        filename = image.filename
-
-        filename_prefix = str(Path(filename).resolve())
-
-        emf_file = filename_prefix  # 以wmf结尾
-        png_file = filename_prefix.replace(".emf", ".png")
-
-        with open(emf_file, "wb") as fw:
-            fw.write(blob)  # type: ignore
-
-        cmd = cls.inkscape_command_line(png_file, emf_file)
-
-        if cmd is None:
-            return None
-
-        logger.info(cmd)
-
-        process = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE)
-        process.wait()
-
-        logger.info(f"{process.returncode = } {process.stdout = }")
-
-        # returncode 不为 0 表示非正常退出
-        if process.returncode and process.stdout:
-            logger.warning(
-                f"【{image.filename}】{cmd} 转换wmf文件失败: {process.stdout.read() !r}"
-            )
-            return None
-
-        with open(png_file, "rb") as fr:
-            image_bytes = fr.read()
-
-        try:
-            # 删除缓存文件
-            os.remove(emf_file)
-            os.remove(png_file)
-        except FileNotFoundError:
-            pass
-
-        return image_bytes
+        return get_image_convert_pool().convert_emf(image.blob)
 
     @classmethod
     def convert_wmf_image(cls, image: Image):
         """转换wmf文件"""
 
-        blob = image.blob
-        filename = image.filename
+        return get_image_convert_pool().convert_wmf(image.blob)
 
-        filename_prefix = str(Path(filename).resolve())
-
-        wmf_file = filename_prefix
-        png_file = filename_prefix.replace(".wmf", ".png")
-
-        with open(wmf_file, "wb") as fw:
-            fw.write(blob)  # type: ignore
-
-        cmd = f"wmf2gd --maxpect -o {png_file} {wmf_file}"
-
-        process = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE)
-        process.wait()
-
-        # returncode 不为 0 表示非正常退出
-        if process.returncode and process.stdout:
-            logger.error(
-                f"【{Image.filename}】{cmd} 转换wmf文件失败: {process.stdout.read() !r}"
-            )
-            return None
+    @classmethod
+    def need_convert(cls, filename: str) -> bool:
+        """图片是否需要(且可以)转换为png格式"""
 
-        with open(png_file, "rb") as fr:
-            image_bytes = fr.read()
+        if filename.endswith(".wmf"):
+            return cls.wmf2gd_exists()
 
-        try:
-            # 删除缓存文件
-            os.remove(wmf_file)
-            os.remove(png_file)
-        except FileNotFoundError:
-            pass
+        if filename.endswith(".emf"):
+            return cls.inkscape_exists()
 
-        return image_bytes
+        return False
 
     @classmethod
     def wmf2gd_exists(cls):
@@ -208,6 +117,7 @@ class ImageTool:
         return shutil.which("inkscape") is not None
 
     @classmethod
+    @functools.cache
     def inkscape_version(cls) -> tuple | None:
         """获取inkscape 版本
 
@@ -244,25 +154,298 @@ class ImageTool:
             logger.exception("获取inkscape版本失败!")
             return None
 
-    @classmethod
-    def inkscape_command_line(cls, target: str, source: str):
-        """根据inkscape版本构造不同的命令行
 
-        - 0.91 -> inkscape --export-png=<target> <source>
-        - 1.1.2 -> inkscape --export-filename=<target> <source>
+class InkscapeShell:
+    """常驻的 inkscape 交互(--shell)进程
+
+    每次转换只发送1条命令，省去每张图片启动1次inkscape的耗时(约1~2秒)。
+    同一个进程同时只能转换1张图片。
+    """
+
+    # 交互模式的提示符，每条命令执行完成后输出在单独的一行:
+    # 0.92 为 ">", 1.x 为 "> ", 比较时忽略空白
+    PROMPT = b">"
+
+    def __init__(self, version: tuple, timeout: float) -> None:
+        self.version = version
+        self.timeout = timeout
+        self._process: subprocess.Popen | None = None
+
+    def _start(self) -> subprocess.Popen:
+        process = subprocess.Popen(
+            ["inkscape", "--shell"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        self._process = process
+        self._read_until_prompt(process)
+
+        logger.info(f"启动 inkscape --shell 进程: {process.pid}")
+        return process
+
+    def _read_until_prompt(self, process: subprocess.Popen) -> bytes:
+        """读取输出直到出现提示符，超时则结束进程"""
+
+        assert process.stdout is not None
+
+        output = b""
+        fd = process.stdout.fileno()
+
+        while not self._ends_with_prompt(output):
+            readable, _, _ = select.select([fd], [], [], self.timeout)
+
+            chunk = os.read(fd, 4096) if readable else b""
+
+            # 超时或进程已退出
+            if not chunk:
+                self.close()
+                raise TimeoutError(f"inkscape --shell 无响应: {output[-200:]!r}")
+
+            output += chunk
+
+        return output
+
+    def _ends_with_prompt(self, output: bytes) -> bool:
+        """输出的最后一行(去掉空白后)是否为提示符"""
+
+        return output.rsplit(b"\n", 1)[-1].strip() == self.PROMPT
+
+    def command_line(self, source: str, target: str) -> str:
+        """根据inkscape版本构造交互模式的命令
+
+        - 0.9x -> <source> --export-png=<target>
+        - 1.x -> file-open:<source>;export-filename:<target>;export-do;file-close
+        """
+
+        if self.version < (1,):
+            return f"{source} --export-png={target}\n"
+
+        return f"file-open:{source};export-filename:{target};export-do;file-close\n"
+
+    def convert(self, source: str, target: str) -> bool:
+        """转换文件，返回是否生成了目标文件"""
+
+        process = self._process
+
+        if process is None or process.poll() is not None:
+            process = self._start()
+
+        assert process.stdin is not None
+
+        process.stdin.write(self.command_line(source, target).encode())
+        process.stdin.flush()
+        self._read_until_prompt(process)
+
+        return os.path.exists(target)
+
+    def close(self) -> None:
+        if self._process is None:
+            return
+
+        process, self._process = self._process, None
+
+        try:
+            if process.stdin is not None:
+                process.stdin.close()
+            process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            process.kill()
+
+
+class ImageConvertPool:
+    """图片转换的工作池
+
+    - 多个线程同时转换1个文档中的图片
+    - 每个线程持有1个常驻的 inkscape --shell 进程转换emf
+    - wmf2gd 没有常驻模式，每张图片启动1次，但多张图片并行
+    - 转换时的临时文件都在池私有的临时目录中, 不写入当前工作目录
+    """
+
+    def __init__(self, max_workers: int | None = None, timeout: float = 60) -> None:
+        self.timeout = timeout
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="image-convert"
+        )
+        self._local = threading.local()
+        self._shells: list[InkscapeShell] = []
+        self._lock = threading.Lock()
+        self._temp_dir = tempfile.mkdtemp(prefix="image-convert-")
+
+    def submit(
+        self, filename: str, blob: bytes, sha1: str | None = None
+    ) -> Future[bytes | None]:
+        """在工作池中转换图片, 返回转换后的png字节，不需要转换时返回原图片
+
+        传入原图的 sha1 时, 先查图片缓存，转换成功后写入缓存。
+        """
+
+        if sha1 is None:
+            return self._executor.submit(self.convert, filename, blob)
+
+        return self._executor.submit(self.convert_cached, filename, blob, sha1)
+
+    def convert_cached(self, filename: str, blob: bytes, sha1: str) -> bytes | None:
+        """同 convert, 转换的结果以原图的 sha1 缓存"""
+
+        if not ImageTool.need_convert(filename):
+            return blob
+
+        return get_image_cache().get_or_create(
+            sha1, IMAGE_FORMAT_PNG, lambda: self.convert(filename, blob)
+        )
+
+    def convert(self, filename: str, blob: bytes) -> bytes | None:
+        """转换图片, 转换失败返回None"""
+
+        if filename.endswith(".wmf") and ImageTool.wmf2gd_exists():
+            return self.convert_wmf(blob)
+
+        if filename.endswith(".emf") and ImageTool.inkscape_exists():
+            return self.convert_emf(blob)
+
+        return blob
+
+    def _run(self, cmd: list[str]) -> bool:
+        """执行转换命令, 返回是否成功"""
+
+        try:
+            process = subprocess.run(cmd, capture_output=True, timeout=self.timeout)
+
+        except subprocess.TimeoutExpired:
+            logger.warning(f"{cmd} 转换图片超时")
+            return False
+
+        # returncode 不为 0 表示非正常退出
+        if process.returncode:
+            logger.warning(f"{cmd} 转换图片失败: {process.stdout!r} {process.stderr!r}")
+            return False
+
+        return True
+
+    def convert_wmf(self, blob: bytes) -> bytes | None:
+        """wmf -> png"""
+
+        with tempfile.TemporaryDirectory(dir=self._temp_dir) as work_dir:
+            wmf_file = os.path.join(work_dir, "image.wmf")
+            png_file = os.path.join(work_dir, "image.png")
+
+            with open(wmf_file, "wb") as fw:
+                fw.write(blob)
+
+            if not self._run(["wmf2gd", "--maxpect", "-o", png_file, wmf_file]):
+                return None
+
+            with open(png_file, "rb") as fr:
+                return fr.read()
+
+    def _inkscape_shell(self) -> InkscapeShell | None:
+        """当前线程的 inkscape --shell 进程"""
+
+        shell: InkscapeShell | None = getattr(self._local, "inkscape", None)
+
+        if shell is None:
+            version = ImageTool.inkscape_version()
+
+            if version is None:
+                return None
+
+            shell = InkscapeShell(version, self.timeout)
+            self._local.inkscape = shell
+
+            with self._lock:
+                self._shells.append(shell)
+
+        return shell
+
+    def convert_emf(self, blob: bytes) -> bytes | None:
+        """emf -> png, inkscape"""
+
+        shell = self._inkscape_shell()
+
+        if shell is None:
+            return None
+
+        with tempfile.TemporaryDirectory(dir=self._temp_dir) as work_dir:
+            emf_file = os.path.join(work_dir, "image.emf")
+            png_file = os.path.join(work_dir, "image.png")
+
+            with open(emf_file, "wb") as fw:
+                fw.write(blob)
+
+            try:
+                converted = shell.convert(emf_file, png_file)
+            except (OSError, TimeoutError):
+                logger.exception("inkscape 转换emf文件失败!")
+                return None
+
+            if not converted:
+                logger.warning("inkscape 转换emf文件失败, 没有生成png文件")
+                return None
+
+            with open(png_file, "rb") as fr:
+                return fr.read()
+
+    def convert_emf_by_soffice(self, blob: bytes) -> bytes | None:
+        """emf -> png, soffice
+
+        每次转换使用独立的用户配置目录，多个soffice进程可以同时运行。
         """
 
-        version = cls.inkscape_version()
+        with tempfile.TemporaryDirectory(dir=self._temp_dir) as work_dir:
+            emf_file = os.path.join(work_dir, "image.emf")
+            png_file = os.path.join(work_dir, "image.png")
+
+            with open(emf_file, "wb") as fw:
+                fw.write(blob)
+
+            cmd = [
+                "soffice",
+                f"-env:UserInstallation=file://{work_dir}/profile",
+                "--headless",
+                "--convert-to",
+                "png",
+                "--outdir",
+                work_dir,
+                emf_file,
+            ]
+
+            if not self._run(cmd) or not os.path.exists(png_file):
+                return None
+
+            with open(png_file, "rb") as fr:
+                return fr.read()
+
+    def shutdown(self) -> None:
+        """关闭工作线程和常驻的转换进程, 删除临时目录"""
+
+        self._executor.shutdown(wait=True)
+
+        with self._lock:
+            for shell in self._shells:
+                shell.close()
+            self._shells.clear()
+
+        shutil.rmtree(self._temp_dir, ignore_errors=True)
+
+
+_image_convert_pool: ImageConvertPool | None = None
+_image_convert_pool_lock = threading.Lock()
+
+
+def get_image_convert_pool() -> ImageConvertPool:
+    """进程内共享的图片转换工作池, 第一次使用时创建
+
+    在使用时才创建，celery的prefork子进程各自持有自己的工作池。
+    """
 
-        # 测试服 inkscape 版本
-        if version == (0, 91):
-            return f"inkscape --export-png={target} {source}"
+    global _image_convert_pool
 
-        # 本地开发服务器(wac) inkscape 版本
-        # 预览服务器版本
-        # pro3服务器版本
-        # pro4服务器版本
-        elif version == (1, 1, 2):
-            return f"inkscape --export-filename={target} {source}"
+    with _image_convert_pool_lock:
+        if _image_convert_pool is None:
+            _image_convert_pool = ImageConvertPool()
+            atexit.register(_image_convert_pool.shutdown)
 
-        return None
+        return _image_convert_pool
@@ -0,0 +1,278 @@
+"""图片的内容寻址缓存
+
+以原图的 sha1 + 目标格式为键, 缓存转换后的图片(wmf/emf/tif -> png)以及上传后的短链接(url):
+
+- 进程内: LRU, 按缓存内容的总字节数限制大小
+- 进程间共享(可选): redis 或 磁盘目录, celery worker、api 进程共用，每条缓存都有过期时间
+
+先查进程内，再查共享层，共享层命中后回填进程内的LRU。
+共享层不可用(redis 连接失败、磁盘读写出错)时只记录日志，不影响图片的转换、上传。
+
+本模块不依赖 app 的配置, 由 app 在启动时通过 `set_image_cache` 配置共享层，
+未配置时只使用进程内的LRU。
+"""
+
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Protocol
+
+from loguru import logger
+from redis import RedisError, StrictRedis
+
+IMAGE_CACHE_PREFIX = "image"
+IMAGE_CACHE_STATS_KEY = "image:stats"
+
+# 目标格式
+IMAGE_FORMAT_PNG = "png"  # 转换后的png图片
+IMAGE_FORMAT_URL = "url"  # 上传后的短链接
+
+
+class SharedImageCache(Protocol):
+    """进程间共享的缓存层"""
+
+    def get(self, key: str) -> bytes | None: ...
+
+    def set(self, key: str, value: bytes) -> None: ...
+
+
+class RedisImageCache:
+    """基于redis的共享缓存层, 命中和未命中的次数记录在redis的hash中"""
+
+    def __init__(self, redis: StrictRedis, ttl: int) -> None:
+        self._redis = redis
+        self._ttl = ttl
+
+    def get(self, key: str) -> bytes | None:
+        value: bytes | None = self._redis.get(key)  # type: ignore
+
+        fmt = key.rsplit(":", 1)[-1]
+        self._redis.hincrby(
+            IMAGE_CACHE_STATS_KEY,
+            f"{fmt}:{'hits' if value is not None else 'misses'}",
+            1,
+        )
+
+        return value
+
+    def set(self, key: str, value: bytes) -> None:
+        self._redis.setex(key, self._ttl, value)
+
+    def stats(self) -> dict[str, int]:
+        """所有进程共享层的命中和未命中次数, 如: {"png:hits": 10, "png:misses": 2}"""
+
+        raw: dict[bytes, bytes] = self._redis.hgetall(IMAGE_CACHE_STATS_KEY)  # type: ignore
+
+        return {k.decode(): int(v) for k, v in raw.items()}
+
+
+class DiskImageCache:
+    """基于磁盘目录的共享缓存层, 同一台机器上的进程共享
+
+    文件按键的前2个字符分目录存放，先写临时文件再重命名，读取时不会读到写了一半的文件；
+    超过过期时间(按文件的修改时间)的文件视为未命中并删除。
+    """
+
+    def __init__(self, directory: str, ttl: int) -> None:
+        self._directory = directory
+        self._ttl = ttl
+
+    def _path(self, key: str) -> str:
+        # 键中的 ":" 在部分文件系统中不合法
+        name = key.replace(":", "_")
+        digest = key.split(":")[2]
+
+        return os.path.join(self._directory, digest[:2], name)
+
+    def get(self, key: str) -> bytes | None:
+        path = self._path(key)
+
+        try:
+            if time.time() - os.path.getmtime(path) > self._ttl:
+                os.remove(path)
+                return None
+
+            with open(path, "rb") as fr:
+                return fr.read()
+
+        except FileNotFoundError:
+            return None
+
+    def set(self, key: str, value: bytes) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+
+        try:
+            with os.fdopen(fd, "wb") as fw:
+                fw.write(value)
+
+            os.replace(tmp_path, path)
+
+        except OSError:
+            os.unlink(tmp_path)
+            raise
+
+
+class ImageCache:
+    """两级的图片缓存: 进程内的LRU + 可选的共享层"""
+
+    def __init__(
+        self,
+        max_memory_bytes: int = 64 * 1024 * 1024,
+        max_item_bytes: int = 8 * 1024 * 1024,
+        shared: SharedImageCache | None = None,
+    ) -> None:
+        self.max_memory_bytes = max_memory_bytes
+        self.max_item_bytes = max_item_bytes
+        self.shared = shared
+
+        self._lru: OrderedDict[str, bytes] = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+        self._stats = {
+            "memory_hits": 0,
+            "shared_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+        }
+
+    @staticmethod
+    def _key(sha1: str, fmt: str) -> str:
+        return f"{IMAGE_CACHE_PREFIX}:{fmt}:{sha1}"
+
+    def _put_memory(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_item_bytes:
+            return
+
+        with self._lock:
+            old = self._lru.pop(key, None)
+            if old is not None:
+                self._memory_bytes -= len(old)
+
+            self._lru[key] = value
+            self._memory_bytes += len(value)
+
+            # 淘汰最久未使用的缓存
+            while self._memory_bytes > self.max_memory_bytes:
+                _, evicted = self._lru.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+                self._stats["evictions"] += 1
+
+    def get(self, sha1: str, fmt: str) -> bytes | None:
+        """获取缓存的内容, 未命中时返回None"""
+
+        key = self._key(sha1, fmt)
+
+        with self._lock:
+            value = self._lru.get(key)
+
+            if value is not None:
+                self._lru.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return value
+
+        if self.shared is not None:
+            try:
+                value = self.shared.get(key)
+
+            except (RedisError, OSError) as e:
+                logger.warning(f"读取图片共享缓存失败: {e}")
+
+        if value is None:
+            with self._lock:
+                self._stats["misses"] += 1
+            return None
+
+        with self._lock:
+            self._stats["shared_hits"] += 1
+
+        self._put_memory(key, value)
+
+        return value
+
+    def set(self, sha1: str, fmt: str, value: bytes) -> None:
+        """缓存内容, 超过 max_item_bytes 的内容不缓存"""
+
+        if len(value) > self.max_item_bytes:
+            return
+
+        key = self._key(sha1, fmt)
+        self._put_memory(key, value)
+
+        if self.shared is not None:
+            try:
+                self.shared.set(key, value)
+
+            except (RedisError, OSError) as e:
+                logger.warning(f"写入图片共享缓存失败: {e}")
+
+    def get_or_create(
+        self, sha1: str, fmt: str, create_func: Callable[[], bytes | None]
+    ) -> bytes | None:
+        """先查缓存, 未命中时调用 create_func 生成并缓存; 生成失败(返回None)时不缓存"""
+
+        value = self.get(sha1, fmt)
+
+        if value is not None:
+            return value
+
+        value = create_func()
+
+        if value is not None:
+            self.set(sha1, fmt, value)
+
+        return value
+
+    def get_text(self, sha1: str, fmt: str) -> str | None:
+        value = self.get(sha1, fmt)
+
+        return value.decode() if value is not None else None
+
+    def set_text(self, sha1: str, fmt: str, text: str) -> None:
+        self.set(sha1, fmt, text.encode())
+
+    def stats(self) -> dict[str, float]:
+        """本进程的命中次数、命中率以及LRU的占用"""
+
+        with self._lock:
+            stats: dict[str, float] = dict(self._stats)
+            stats["memory_items"] = len(self._lru)
+            stats["memory_bytes"] = self._memory_bytes
+
+        hits = stats["memory_hits"] + stats["shared_hits"]
+        total = hits + stats["misses"]
+        stats["hit_rate"] = hits / total if total else 0.0
+
+        return stats
+
+    def clear(self) -> None:
+        """清空进程内的LRU, 不影响共享层"""
+
+        with self._lock:
+            self._lru.clear()
+            self._memory_bytes = 0
+
+
+_image_cache: ImageCache = ImageCache()
+_image_cache_lock = threading.Lock()
+
+
+def get_image_cache() -> ImageCache:
+    """进程内共享的图片缓存"""
+
+    return _image_cache
+
+
+def set_image_cache(image_cache: ImageCache) -> None:
+    """替换进程内共享的图片缓存, 由 app 在启动时按配置调用"""
+
+    global _image_cache
+
+    with _image_cache_lock:
+        _image_cache = image_cache
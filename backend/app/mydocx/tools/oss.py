@@ -4,6 +4,8 @@ from __future__ import annotations
 
 import base64
 
+from .image_cache import IMAGE_FORMAT_URL, get_image_cache
+
 
 class OssTool:
     """阿里云盘工具类"""
@@ -26,9 +28,6 @@ class OssTool:
         "ogg": "video/ogg",
     }
 
-    # 已上传阿里云图片的sha1合集
-    uploaded_imags: dict[str, str] = {}
-
     @classmethod
     def upload_image(cls, sha1: str, image: bytes, file_suffix: str = "png"):
         """上传图片到阿里云"""
@@ -71,13 +70,16 @@ class OssTool:
     def short_url(cls, use_oss: bool, sha1: str, data: bytes, file_suffix: str = "png"):
         """获取图片或其他文件格式的短链接"""
 
-        # 上传过到阿里云，直接使用缓存，降低网络请求，提升解析进度。
-        if use_oss and sha1 in cls.uploaded_imags:
-            short_url = cls.uploaded_imags[sha1]
+        # 上传过到阿里云，直接使用缓存(进程间共享)，降低网络请求，提升解析进度。
+        if use_oss:
+            image_cache = get_image_cache()
+            short_url = image_cache.get_text(sha1, IMAGE_FORMAT_URL)
+
+            if short_url is None:
+                short_url = OssTool.upload_image(sha1, data, file_suffix=file_suffix)
 
-        elif use_oss:
-            short_url = OssTool.upload_image(sha1, data, file_suffix=file_suffix)
-            cls.uploaded_imags[sha1] = short_url
+                if short_url:
+                    image_cache.set_text(sha1, IMAGE_FORMAT_URL, short_url)
 
         # 先用base64显示出来:
         else:
@@ -0,0 +1,254 @@
+"""将不带样式的块级内容(段落、表格)渲染为 txt、shtml、markdown 格式
+
+同一份块级内容可以渲染为多种格式，解析文档一次即可得到所有格式的结果。
+"""
+
+import re
+from typing import Any
+
+from .struct import (
+    Block,
+    BlockCell,
+    BlockParagraph,
+    BlockTable,
+    InlineLink,
+    InlineMark,
+)
+
+# ---- 超链接 ----
+
+
+def gen_a_tag(attrs: dict[str, Any], content: str) -> str:
+    """生成超链接的a标签"""
+
+    attr_str = " ".join([f'{name}="{val}"' for name, val in attrs.items()])
+
+    return f"<a {attr_str}>{content}</a>"
+
+
+# ---- txt ----
+
+_txt_marks = {InlineMark.br: "\n", InlineMark.tab: "    "}
+
+
+def render_items_txt(items: list[str | InlineMark]) -> list[str]:
+    return [
+        _txt_marks[item] if isinstance(item, InlineMark) else item for item in items
+    ]
+
+
+def render_paragraph_txt(p: BlockParagraph) -> str:
+    """编号 + 文本内容, 超链接保留a标签"""
+
+    txt_arr: list[str] = []
+
+    for item in p.items:
+        if isinstance(item, InlineLink):
+            txt_arr.append(
+                gen_a_tag(item.attrs, "\n".join(render_items_txt(item.items)))
+            )
+
+        else:
+            txt_arr.extend(render_items_txt([item]))
+
+    # 空段落保留1个空格，与其他格式一致
+    return f"{p.number_text}{''.join(txt_arr) or ' '}"
+
+
+def render_block_txt(block: Block) -> str:
+    """表格每行1行文本，单元格之间以 | 分隔"""
+
+    if isinstance(block, BlockParagraph):
+        return render_paragraph_txt(block)
+
+    return "\n".join(
+        "|".join(
+            "\n".join(render_paragraph_txt(p) for p in cell.paragraphs)
+            for cell in row
+            if not cell.merged
+        )
+        for row in block.rows
+    )
+
+
+# ---- shtml ----
+
+_shtml_marks = {InlineMark.br: "<br/>", InlineMark.tab: "&emsp;"}
+
+
+def render_items_shtml(items: list[str | InlineMark]) -> list[str]:
+    return [
+        _shtml_marks[item] if isinstance(item, InlineMark) else item for item in items
+    ]
+
+
+def render_paragraph_shtml(p: BlockParagraph) -> str:
+    """段落标签中只有文本，没有样式"""
+
+    content_arr: list[str] = []
+
+    for item in p.items:
+        if isinstance(item, InlineLink):
+            content_arr.append(
+                gen_a_tag(item.attrs, "\n".join(render_items_shtml(item.items)))
+            )
+
+        else:
+            content_arr.extend(render_items_shtml([item]))
+
+    content = "".join(content_arr) or " "
+
+    return f"<{p.tag_name}>{p.number_text} {content}</{p.tag_name}>"
+
+
+def render_block_shtml(block: Block) -> str:
+    """表格只保留边框合并的样式"""
+
+    if isinstance(block, BlockParagraph):
+        return render_paragraph_shtml(block)
+
+    rows_html = "\n".join(
+        "<tr>{}</tr>".format(
+            "\n".join(
+                "<td>{}</td>".format(
+                    "\n".join(render_paragraph_shtml(p) for p in cell.paragraphs)
+                )
+                for cell in row
+                if not cell.merged
+            )
+        )
+        for row in block.rows
+    )
+
+    return f'<table style="border-collapse:collapse;">{rows_html}</table>'
+
+
+# ---- markdown ----
+
+_md_marks = {InlineMark.br: "  \n", InlineMark.tab: "\u2003"}
+
+# 行内有特殊含义的字符
+_md_inline_special = re.compile(r"([\\`*_\[\]<>])")
+
+# 行首有特殊含义的内容: 标题、引用、列表、分隔线
+_md_line_start_special = re.compile(r"^(\s*)([#>+\-=]|\d+(?=[.)]))", re.MULTILINE)
+
+_md_heading_level = {f"h{level}": "#" * level for level in range(1, 7)}
+
+
+def escape_markdown(text: str) -> str:
+    """转义文本中的markdown标记"""
+
+    return _md_inline_special.sub(r"\\\1", text)
+
+
+def escape_markdown_line_start(text: str) -> str:
+    """转义行首的markdown标记, 比如以 "1." 开头的编号不应成为有序列表"""
+
+    def _escape(m: re.Match[str]) -> str:
+        # 有序列表: 转义数字后面的 . 或 )
+        if m.group(2)[0].isdigit():
+            return f"{m.group(1)}{m.group(2)}\\"
+
+        return f"{m.group(1)}\\{m.group(2)}"
+
+    return _md_line_start_special.sub(_escape, text)
+
+
+def render_items_markdown(items: list[str | InlineMark]) -> list[str]:
+    return [
+        _md_marks[item] if isinstance(item, InlineMark) else escape_markdown(item)
+        for item in items
+    ]
+
+
+def render_paragraph_markdown_text(p: BlockParagraph) -> str:
+    """段落的markdown文本, 不含标题标记"""
+
+    content_arr: list[str] = [escape_markdown(p.number_text)]
+
+    for item in p.items:
+        if isinstance(item, InlineLink):
+            link_text = "".join(render_items_markdown(item.items))
+            href = item.attrs.get("href")
+
+            if href:
+                title = item.attrs.get("title")
+                title_text = f' "{title}"' if title else ""
+                content_arr.append(f"[{link_text}](<{href}>{title_text})")
+
+            else:
+                content_arr.append(link_text)
+
+        else:
+            content_arr.extend(render_items_markdown([item]))
+
+    return escape_markdown_line_start("".join(content_arr).strip())
+
+
+def render_paragraph_markdown(p: BlockParagraph) -> str:
+    """标题段落使用 # 标记"""
+
+    text = render_paragraph_markdown_text(p)
+
+    if text and p.tag_name in _md_heading_level:
+        # 标题只能有1行
+        text = text.replace("  \n", " ")
+        return f"{_md_heading_level[p.tag_name]} {text}"
+
+    return text
+
+
+def render_table_cell_markdown(cell: BlockCell) -> str:
+    """表格单元格中不能换行，段落之间以<br>分隔"""
+
+    if cell.merged:
+        return ""
+
+    paragraphs = [render_paragraph_markdown_text(p) for p in cell.paragraphs]
+    text = "<br>".join(p for p in paragraphs if p)
+
+    return text.replace("  \n", "<br>").replace("|", "\\|")
+
+
+def render_table_markdown(table: BlockTable) -> str:
+    """渲染为管道表格, 第1行作为表头，跨列的单元格用空单元格补齐"""
+
+    rows: list[list[str]] = []
+
+    for row in table.rows:
+        cells: list[str] = []
+
+        for cell in row:
+            cells.append(render_table_cell_markdown(cell))
+            cells.extend([""] * (cell.colspan - 1))
+
+        rows.append(cells)
+
+    total_cols = max((len(cells) for cells in rows), default=0)
+
+    if total_cols == 0:
+        return ""
+
+    lines: list[str] = []
+
+    for row_no, cells in enumerate(rows):
+        cells = cells + [""] * (total_cols - len(cells))
+        lines.append(f"| {' | '.join(cells)} |")
+
+        # 表头分隔行
+        if row_no == 0:
+            lines.append(f"|{'|'.join([' --- '] * total_cols)}|")
+
+    return "\n".join(lines)
+
+
+def render_block_markdown(block: Block) -> str | None:
+    """空段落、空表格不输出"""
+
+    if isinstance(block, BlockParagraph):
+        text = render_paragraph_markdown(block)
+    else:
+        text = render_table_markdown(block)
+
+    return text or None
@@ -1,3 +1,4 @@
+from enum import Enum
 from typing import Any, NamedTuple
 
 
@@ -39,3 +40,62 @@ class HtmlRun(NamedTuple):
 
     style: str
     """ 样式列表 """
+
+
+# ---- 不带样式的块级内容, 用于 txt、shtml、markdown 格式的渲染 ----
+
+
+class InlineMark(Enum):
+    """ 段落中影响文本的非文字内容 """
+
+    br = "br"
+    """ 换行 """
+
+    tab = "tab"
+    """ 制表符 """
+
+
+class InlineLink(NamedTuple):
+    """ 段落中的超链接 """
+
+    items: list[str | InlineMark]
+    """ 超链接中的文字和换行、制表符 """
+
+    attrs: dict[str, Any]
+    """ a标签的属性, title 和 href """
+
+
+class BlockParagraph(NamedTuple):
+    """ 解析出的段落 """
+
+    tag_name: str
+    """ 段落级标签名称, h1...h6 或 p """
+
+    number_text: str
+    """ 如果为列表时，项目符号 """
+
+    items: list[str | InlineMark | InlineLink]
+    """ 段落中的文字、换行、制表符和超链接 """
+
+
+class BlockCell(NamedTuple):
+    """ 解析出的表格单元格 """
+
+    paragraphs: list[BlockParagraph]
+    """ 单元格中的段落 """
+
+    colspan: int = 1
+    """ 跨列数 """
+
+    merged: bool = False
+    """ 是否与前行的单元格合并(纵向合并的后续单元格) """
+
+
+class BlockTable(NamedTuple):
+    """ 解析出的表格 """
+
+    rows: list[list[BlockCell]]
+    """ 每一行的单元格 """
+
+
+Block = BlockParagraph | BlockTable
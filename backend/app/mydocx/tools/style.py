@@ -1,4 +1,7 @@
-from typing import Any
+import weakref
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Any, NamedTuple
 
 from loguru import logger
 
@@ -7,11 +10,13 @@ from ms_office.oxml.wml.main import (
     # 边框
     CT_Border,
     CT_PPrBase,
+    CT_Row,
     # 表格样式
     CT_Tbl,
     CT_TblPrBase,
     # 宽度单位
     CT_TblWidth,
+    CT_Tc,
     # 单元格样式
     CT_TcPr,
     # 行(Row)样式
@@ -34,6 +39,7 @@ from ms_office.oxml.wml.main import (
     ST_TextDirection,
     # 垂直对齐方式
     ST_VerticalJc,
+    Union_CT_SdtCellRowRunBlock,
 )
 from ms_office.wml.styles import Styles
 
@@ -674,6 +680,115 @@ def get_docx_default_character_style(styls: Styles):
     return html_styles
 
 
+# -------- 样式表中样式的解析缓存 -----------
+# 同一个样式ID在文档中会被成千上万的段落、run引用，每次都遍历 basedOn 样式链并转换为css的开销很大，
+# 这里对每个文档(样式表)按样式ID缓存样式链解析后的结果，引用时只需要合并到当前的样式字典中。
+
+
+class _RecordingStyles(dict):
+    """记录被删除的样式键的样式字典"""
+
+    def __init__(self, *args: Any) -> None:
+        super().__init__(*args)
+        self.removed: set[str] = set()
+
+    def pop(self, key: str, *default: Any) -> Any:
+        self.removed.add(key)
+        return super().pop(key, *default)
+
+
+class ResolvedStyle(NamedTuple):
+    """样式链解析后的结果，只读
+
+    合并时先删除 removed 中的样式，再设置 styles 中的样式，与依次应用样式链中的每个样式的结果相同。
+    """
+
+    styles: Mapping[str, Any]
+    """ 设置的样式 """
+
+    removed: frozenset[str]
+    """ 删除的样式键 """
+
+    def merge_into(self, target: dict[str, Any]) -> dict[str, Any]:
+        """将解析的样式合并到 target 中并返回 target"""
+
+        for key in self.removed:
+            target.pop(key, None)
+
+        target.update(self.styles)
+
+        return target
+
+    @classmethod
+    def from_styles(cls, styles: dict[str, Any]):
+        removed = getattr(styles, "removed", set())
+
+        return cls(MappingProxyType(dict(styles)), frozenset(removed))
+
+
+# 每个文档的样式表对应1个缓存, 文档释放后缓存随之释放
+_resolved_style_caches: weakref.WeakKeyDictionary[
+    Styles, dict[tuple[Any, ...], ResolvedStyle]
+] = weakref.WeakKeyDictionary()
+
+
+def get_resolved_style_cache(styles: Styles) -> dict[tuple[Any, ...], ResolvedStyle]:
+    """获取文档样式表的解析缓存"""
+
+    cache = _resolved_style_caches.get(styles)
+
+    if cache is None:
+        cache = _resolved_style_caches[styles] = {}
+
+    return cache
+
+
+def resolve_paragraph_style(
+    styles: Styles,
+    style_id: str,
+    font_size: str | None = None,
+    line_height: str | None = None,
+) -> ResolvedStyle:
+    """解析样式表中段落样式链的段落样式
+
+    段前段后间距、首行缩进的计算依赖当前的字号(font-size)和行高(line-height)，所以二者也是缓存键的一部分。
+    """
+
+    cache = get_resolved_style_cache(styles)
+    key = ("paragraph", style_id, font_size, line_height)
+
+    resolved = cache.get(key)
+
+    if resolved is None:
+        character_styles = {} if font_size is None else {"font-size": font_size}
+        paragrah_styles = _RecordingStyles(
+            {} if line_height is None else {"line-height": line_height}
+        )
+
+        _apply_paragraph_styles_from_define(
+            styles, style_id, character_styles, paragrah_styles
+        )
+
+        resolved = cache[key] = ResolvedStyle.from_styles(paragrah_styles)
+
+    return resolved
+
+
+def resolve_character_style(styles: Styles, style_id: str) -> ResolvedStyle:
+    """解析样式表中段落、字符样式链的字符样式"""
+
+    cache = get_resolved_style_cache(styles)
+    key = ("character", style_id)
+
+    resolved = cache.get(key)
+
+    if resolved is None:
+        character_styles = _apply_character_styles_from_define(styles, style_id, {})
+        resolved = cache[key] = ResolvedStyle.from_styles(character_styles)
+
+    return resolved
+
+
 def get_paragraph_styles_from_define(
     styles: Styles,
     style_id: str,
@@ -682,6 +797,38 @@ def get_paragraph_styles_from_define(
 ):
     """获取段落样式树中的最终样式"""
 
+    if paragrah_styles is None:
+        paragrah_styles = {}
+
+    resolved = resolve_paragraph_style(
+        styles,
+        style_id,
+        character_styles.get("font-size"),
+        paragrah_styles.get("line-height"),
+    )
+
+    return resolved.merge_into(paragrah_styles)
+
+
+def get_character_styles_from_define(
+    styles: Styles, style_id: str, character_styles: dict[str, Any] | None = None
+):
+    """获取字符样式树中的最终样式"""
+
+    if character_styles is None:
+        character_styles = {}
+
+    return resolve_character_style(styles, style_id).merge_into(character_styles)
+
+
+def _apply_paragraph_styles_from_define(
+    styles: Styles,
+    style_id: str,
+    character_styles: dict[str, Any],
+    paragrah_styles: dict[str, Any] | None = None,
+):
+    """依次应用段落样式树中的样式，不使用缓存"""
+
     # logger.info(f"获取样式ID为: { style_id } 的样式")
 
     ct_styles = styles.get_styles(style_id)
@@ -697,7 +844,7 @@ def get_paragraph_styles_from_define(
         # 处理继承的样式
         if ct_style.basedOn is not None:
             parent_style_id = ct_style.basedOn.val_str
-            get_paragraph_styles_from_define(
+            _apply_paragraph_styles_from_define(
                 styles, parent_style_id, character_styles, paragrah_styles
             )
             # logger.info(f"处理父样式: {[parent_style_id]} -> {paragrah_styles}")
@@ -718,10 +865,10 @@ def get_paragraph_styles_from_define(
     return paragrah_styles
 
 
-def get_character_styles_from_define(
+def _apply_character_styles_from_define(
     styles: Styles, style_id: str, character_styles: dict[str, Any] | None = None
 ):
-    """获取字符样式树中的最终样式"""
+    """依次应用字符样式树中的样式，不使用缓存"""
 
     ct_styles = styles.get_styles(style_id)
 
@@ -1303,125 +1450,92 @@ def get_table_cell_colspan(tcpr: CT_TcPr):
     return colspan
 
 
-def get_table_cell_rowspan1(
-    row_col_matrix: list[list[CT_TcPr | None]], ridx: int, cidx: int
-):
-    """获取单元格的行合并数
+class TableGridCell(NamedTuple):
+    """单元格在表格网格中的位置以及跨行、跨列信息"""
 
-    row_col_matrix: 行和列的矩阵
-    ridx: 行索引, 从 0 开始
-    cidx: 列索引, 从 0 开始
-    """
+    col: int
+    """起始的网格列, 从 0 开始"""
 
-    rowspan = 1
+    colspan: int
+    """跨列数"""
 
-    row_lenth = len(row_col_matrix)
+    rowspan: int
+    """跨行数, 仅纵向合并的起始单元格大于1"""
 
-    # 遍历后面每一行该列位置的单元格合并类型
-    for idx in range(ridx + 1, row_lenth):
-        current_cell_pr = row_col_matrix[idx][cidx]
+    covered: bool
+    """是否与前行的单元格纵向合并"""
 
-        # 终止计算合并的行数
-        if current_cell_pr is None:
-            break
 
-        # 终止计算合并的行数
-        if current_cell_pr.vMerge is None:
-            break
+def get_table_row_cells(tr: CT_Row) -> list[CT_Tc]:
+    """行(Row)中的单元格, 包含sdt标签里面的单元格"""
 
-        # 重新开始计算合并行或继续计算合并的函数
-        elif current_cell_pr.vMerge is not None:
-            # 终止计算合并的行数
-            if current_cell_pr.vMerge.val == ST_Merge.restart:
-                break
+    cells: list[CT_Tc] = list(tr.tc_lst)
 
-            # 说明与上一行合并
-            elif current_cell_pr.vMerge.val == ST_Merge.Continue:
-                rowspan += 1
+    if (
+        tr.sdt is not None
+        and isinstance(tr.sdt, Union_CT_SdtCellRowRunBlock)
+        and tr.sdt.sdtContent_cell is not None
+        and tr.sdt.sdtContent_cell.tc_lst is not None
+    ):
+        cells.extend(tr.sdt.sdtContent_cell.tc_lst)
 
-    return rowspan
+    return cells
 
 
-def get_table_cell_rowspan(
-    row_col_matrix: list[list[CT_TcPr | None]], ridx: int, cidx: int
-):
-    """获取单元格的行合并数
+def gen_table_grid(tbl: CT_Tbl) -> list[list[TableGridCell]]:
+    """生成表格的网格, 与 `get_table_row_cells` 返回的每行的单元格一一对应
 
-    row_col_matrix: 行和列的矩阵
-    ridx: 行索引, 从 0 开始
-    cidx: 列索引, 从 0 开始
+    从最后一行往前遍历1次所有单元格, 同时计算纵向合并的行数。
     """
 
-    rowspan = 1
-
-    row_lenth = len(row_col_matrix)
-    # logger.info(f"search: {ridx}:{cidx}")
-
-    # 遍历后面每一行该列位置的单元格合并类型
-    for idx in range(ridx + 1, row_lenth):
-        current_row = row_col_matrix[idx]
-
-        need_break = False
+    # 每行单元格的 (起始网格列, 跨列数, 纵向合并类型)
+    rows: list[list[tuple[int, int, ST_Merge | None]]] = []
 
-        really_cell_idx = 0
+    for tr in tbl.tr_lst:
+        row: list[tuple[int, int, ST_Merge | None]] = []
+        col = 0
 
-        # 这里单元格可能会跨多列，所以某一个单元格可能是占了n列的纵向位置，
-        # 所以这里需要遍历手动计算cellidx，而不是用二维数组表示就行.
-        for _idx, current_cell_pr in enumerate(current_row):
-            if really_cell_idx == cidx:
-                # logger.info(f"{idx}:{_idx} == {idx}:{cidx}")
-                # 终止计算合并的行数
-                if current_cell_pr is None:
-                    need_break = True
-                    break
+        for tc in get_table_row_cells(tr):
+            colspan = 1
+            v_merge = None
 
-                # 终止计算合并的行数
-                if current_cell_pr.vMerge is None:
-                    need_break = True
-                    break
+            # 子元素的查找比较耗时，每个只取1次
+            tcpr = tc.tcPr
 
-                # 重新开始计算合并行或继续计算合并的函数
-                elif current_cell_pr.vMerge is not None:
-                    # 终止计算合并的行数
-                    if current_cell_pr.vMerge.val == ST_Merge.restart:
-                        need_break = True
-                        break
+            if tcpr is not None:
+                colspan = get_table_cell_colspan(tcpr)
 
-                    # 说明与上一行合并
-                    elif current_cell_pr.vMerge.val == ST_Merge.Continue:
-                        rowspan += 1
+                v_merge_ele = tcpr.vMerge
+                if v_merge_ele is not None:
+                    v_merge = v_merge_ele.val
 
-            if current_cell_pr is None:
-                # logger.info(f"cell is None")
-                really_cell_idx += 1
-            else:
-                gridspan = get_table_cell_colspan(current_cell_pr)
-                # logger.info(f"cell is not None: {idx}:{gridspan}")
-                really_cell_idx += gridspan
+            row.append((col, colspan, v_merge))
+            col += colspan
 
-        if need_break:
-            break
+        rows.append(row)
 
-    return rowspan
+    grid: list[list[TableGridCell]] = [[] for _ in rows]
 
+    # 每个网格列中, 当前行下面连续的纵向合并的单元格数
+    continued_below: dict[int, int] = {}
 
-def gen_table_tcpr_matrix(tbl: CT_Tbl):
-    """生成表格的单元格属性的矩阵.
+    for r_no in range(len(rows) - 1, -1, -1):
+        grid_row: list[TableGridCell] = []
+        continued: dict[int, int] = {}
 
-    n x m 的矩阵
+        for col, colspan, v_merge in rows[r_no]:
+            covered = v_merge == ST_Merge.Continue
+            rowspan = 1
 
-    n: 行数
-    m: 列数
-    """
+            if v_merge == ST_Merge.restart:
+                rowspan += continued_below.get(col, 0)
 
-    tr_arr: list[list[CT_TcPr | None]] = []
-
-    for tr in tbl.tr_lst:
-        td_arr: list[CT_TcPr | None] = []
+            grid_row.append(TableGridCell(col, colspan, rowspan, covered))
 
-        for td in tr.tc_lst:
-            td_arr.append(td.tcPr)
+            if covered:
+                continued[col] = 1 + continued_below.get(col, 0)
 
-        tr_arr.append(td_arr)
+        grid[r_no] = grid_row
+        continued_below = continued
 
-    return tr_arr
+    return grid
@@ -0,0 +1,322 @@
+"""分析统计的日汇总
+
+按天汇总工程(按类型、按审核状态)、文档、问题/建议标签的数量，保存到 `AnalysisDailyStat`,
+系统概览、问题/建议统计从汇总表查询，耗时不随历史数据的增长而增加:
+
+- 增量: 审查任务、复核、删除项目后，提交任务(`refresh_daily_stats`)重新汇总受影响的日期,
+  (当天的数据只扫描当天的行), 同一天在 `ANALYSIS_STATS_REFRESH_DELAY` 秒内的多次修改只提交1个任务
+- 校正: 定时任务(`reconcile_analysis_stats`)全量重新汇总，修正增量刷新遗漏的修改(如刷新失败)
+
+汇总使用 INSERT ... ON DUPLICATE KEY UPDATE 写入，同一天的并发刷新不会因主键冲突而失败。
+提交增量刷新出错时只记录日志，不影响审查、复核等业务的提交。
+汇总提交后, 分析统计接口的响应缓存失效。
+"""
+
+from collections import defaultdict
+from collections.abc import Iterable
+from datetime import date, datetime, timedelta
+from typing import Any
+
+from loguru import logger
+from redis import RedisError
+from sqlalchemy import delete, update
+from sqlalchemy.dialects.mysql import insert
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, func, select
+
+from app.api.response_cache import ANALYSIS_TAG, invalidate_response_cache
+from app.core import celery_app
+from app.core.config import settings
+from app.core.db import engine
+from app.core.redis import get_redis_client
+from app.models.analysis import AnalysisDailyStat
+from app.models.documents import Document, DocumentContentReview, Project
+from app.models.enums import AnalysisMetric, ReviewStatus
+
+# 审核状态统计时使用的日期: 等待审查按开始审查的时间，复核完毕按审核完成的时间
+# 对应的日期为空(如刚创建，还未开始解析的工程)时不统计
+_status_date_fields: dict[ReviewStatus, Any] = {
+    ReviewStatus.UNREVIEWED: Project.review_begin_at,
+    ReviewStatus.HUMAN_REVIEW_FAILD: Project.review_done_at,
+    ReviewStatus.HUMAN_REVIEW_PASSED: Project.review_done_at,
+}
+
+# 已提交刷新任务、还未开始执行的日期的标记
+ANALYSIS_STATS_PENDING_KEY = "analysis_stats:pending:{day}"
+ANALYSIS_STATS_PENDING_TTL = 10 * 60  # 标记的过期时间, 任务未能执行时允许再次提交
+
+
+def _as_date(value: date | datetime | str) -> date:
+    """数据库返回的日期, sqlite 中 date() 的结果为字符串"""
+
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+
+    if isinstance(value, datetime):
+        return value.date()
+
+    return value
+
+
+def _count_by_day(
+    session: Session,
+    date_field: Any,
+    dim_field: Any,
+    where: list[Any],
+    start: date | None,
+    end: date | None,
+) -> list[tuple[date, Any, int]]:
+    """按天(以及维度)分组计数, 只统计 [start, end) 范围内的行"""
+
+    stat_date = func.date(date_field)
+    group_fields = [stat_date] if dim_field is None else [stat_date, dim_field]
+
+    statement = select(*group_fields, func.count()).where(
+        *where, date_field.is_not(None)
+    )
+
+    if start is not None:
+        statement = statement.where(date_field >= start)
+
+    if end is not None:
+        statement = statement.where(date_field < end)
+
+    rows = session.exec(statement.group_by(*group_fields)).all()  # type: ignore
+
+    if dim_field is None:
+        return [(_as_date(row[0]), "", row[1]) for row in rows]
+
+    return [(_as_date(row[0]), row[1], row[2]) for row in rows]
+
+
+def compute_daily_stats(
+    session: Session, start: date | None = None, end: date | None = None
+) -> list[AnalysisDailyStat]:
+    """从工程、文档、审查详细表汇总 [start, end) 范围内每天的统计, 为None时不限制"""
+
+    counts: dict[tuple[date, AnalysisMetric, str], int] = defaultdict(int)
+
+    def _add(metric: AnalysisMetric, rows: list[tuple[date, Any, int]]) -> None:
+        for stat_date, dim, total in rows:
+            if dim is None:
+                continue
+
+            counts[(stat_date, metric, str(dim))] += total
+
+    # 工程, 按类型
+    _add(
+        AnalysisMetric.PROJECT,
+        _count_by_day(
+            session,
+            Project.create_at,
+            Project.type,
+            [Project.is_delete == False],  # noqa: E712
+            start,
+            end,
+        ),
+    )
+
+    # 工程, 按审核状态
+    for review_status, date_field in _status_date_fields.items():
+        rows = _count_by_day(
+            session,
+            date_field,
+            None,
+            [
+                Project.is_delete == False,  # noqa: E712
+                Project.review_status == review_status,
+            ],
+            start,
+            end,
+        )
+        _add(
+            AnalysisMetric.PROJECT_STATUS,
+            [(stat_date, review_status, total) for stat_date, _, total in rows],
+        )
+
+    # 文档
+    _add(
+        AnalysisMetric.DOCUMENT,
+        _count_by_day(
+            session,
+            Document.create_at,
+            None,
+            [Document.is_delete == False],  # noqa: E712
+            start,
+            end,
+        ),
+    )
+
+    # 问题、建议标签
+    for metric, tag_field in (
+        (AnalysisMetric.QUESTION_TAG, DocumentContentReview.question_tag),
+        (AnalysisMetric.FEEDBACK_TAG, DocumentContentReview.feedback_tag),
+    ):
+        _add(
+            metric,
+            _count_by_day(
+                session,
+                DocumentContentReview.create_at,
+                tag_field,
+                [DocumentContentReview.is_delete == False],  # noqa: E712
+                start,
+                end,
+            ),
+        )
+
+    return [
+        AnalysisDailyStat(stat_date=stat_date, metric=metric, dim=dim, total=total)
+        for (stat_date, metric, dim), total in counts.items()
+    ]
+
+
+def save_daily_stats(
+    session: Session, start: date | None = None, end: date | None = None
+) -> int:
+    """重新汇总并替换 [start, end) 范围内的日汇总, 由调用者提交
+
+    1. 范围内已有的行数量置0, 行锁使同一天的并发刷新依次执行
+    2. 写入(upsert)新的汇总
+    3. 删除数量仍为0的行(维度已不存在, 如标签被修改)
+
+    Returns:
+        写入的行数
+    """
+
+    where = []
+
+    if start is not None:
+        where.append(AnalysisDailyStat.stat_date >= start)  # type: ignore
+
+    if end is not None:
+        where.append(AnalysisDailyStat.stat_date < end)  # type: ignore
+
+    session.exec(
+        update(AnalysisDailyStat).where(*where).values(total=0)  # type: ignore
+    )
+
+    stats = compute_daily_stats(session, start, end)
+
+    if stats:
+        statement = insert(AnalysisDailyStat).values(
+            [stat.model_dump() for stat in stats]
+        )
+        statement = statement.on_duplicate_key_update(
+            total=statement.inserted.total,
+            update_at=statement.inserted.update_at,
+        )
+        session.exec(statement)  # type: ignore
+
+    session.exec(
+        delete(AnalysisDailyStat).where(*where, AnalysisDailyStat.total == 0)  # type: ignore
+    )
+
+    return len(stats)
+
+
+def project_stat_days(project: Project) -> set[date]:
+    """工程被统计的日期: 创建、开始审查、审核完成的日期"""
+
+    return {
+        value.date()
+        for value in (
+            project.create_at,
+            project.review_begin_at,
+            project.review_done_at,
+        )
+        if value is not None
+    }
+
+
+def _pending_keys(days: Iterable[date]) -> list[str]:
+    return [ANALYSIS_STATS_PENDING_KEY.format(day=day.isoformat()) for day in days]
+
+
+def refresh_analysis_stats(days: Iterable[date]) -> None:
+    """提交重新汇总指定日期统计的任务, 须在修改数据的事务提交后调用, 不阻塞调用者
+
+    已提交任务、还未开始执行的日期不再重复提交, 任务开始执行后的修改会再次提交。
+    出错时只记录日志，由定时任务校正。
+    """
+
+    stat_days = sorted(set(days))
+
+    if not stat_days:
+        return
+
+    try:
+        redis = get_redis_client()
+        pending_days = [
+            day
+            for day, key in zip(stat_days, _pending_keys(stat_days), strict=True)
+            if redis.set(key, 1, nx=True, ex=ANALYSIS_STATS_PENDING_TTL)
+        ]
+
+    except RedisError as e:
+        logger.warning(f"记录待刷新的分析统计日期失败: {stat_days}, 错误: {e}")
+        pending_days = stat_days
+
+    if not pending_days:
+        return
+
+    try:
+        refresh_daily_stats.apply_async(  # type: ignore
+            args=([day.isoformat() for day in pending_days],),
+            countdown=settings.ANALYSIS_STATS_REFRESH_DELAY,
+        )
+
+    except Exception as e:
+        logger.warning(f"提交刷新分析统计的任务失败: {pending_days}, 错误: {e}")
+
+        try:
+            get_redis_client().delete(*_pending_keys(pending_days))
+
+        except RedisError:
+            pass
+
+
+@celery_app.task(
+    autoretry_for=(OperationalError,),
+    max_retries=3,
+    retry_backoff=True,
+)
+def refresh_daily_stats(days: list[str]) -> str:
+    """重新汇总指定日期(iso格式)的统计, 由 `refresh_analysis_stats` 提交
+
+    并发刷新同一天时可能发生死锁, 由 `autoretry_for` 重试。
+    """
+
+    stat_days = [date.fromisoformat(day) for day in days]
+
+    # 先删除标记再查询, 之后提交的修改会再次提交任务
+    try:
+        get_redis_client().delete(*_pending_keys(stat_days))
+
+    except RedisError as e:
+        logger.warning(f"删除待刷新的分析统计日期失败: {days}, 错误: {e}")
+
+    with Session(engine) as session:
+        for day in stat_days:
+            save_daily_stats(session, day, day + timedelta(days=1))
+
+        session.commit()
+
+    invalidate_response_cache(ANALYSIS_TAG)
+
+    return f"刷新分析统计完成: {days}"
+
+
+@celery_app.task
+def reconcile_analysis_stats() -> str:
+    """全量重新汇总分析统计, 由 celery beat 定时执行"""
+
+    with Session(engine) as session:
+        total = save_daily_stats(session)
+        session.commit()
+
+    invalidate_response_cache(ANALYSIS_TAG)
+
+    msg = f"重新汇总分析统计完成, 共{total}行"
+    logger.info(msg)
+
+    return msg
@@ -0,0 +1,460 @@
+"""基于 asyncio(httpx) 的智能体客户端和各节审查
+
+接口与 `app.tasks.reviews` 中的同步版本一致，请求智能体时不阻塞线程，
+单个进程(事件循环)即可同时保持大量在途的智能体请求。
+"""
+
+import asyncio
+import uuid
+
+import httpx
+from loguru import logger
+from sqlmodel import Session
+
+from app.api.response_cache import invalidate_response_cache, project_tag
+from app.api.schems import (
+    AgentResponseModel,
+    ClearSessionPayload,
+    ClearSessionResponseModel,
+    CreateSessionPayload,
+    CreateSessionResponseModel,
+)
+from app.api.utils import build_agent_headers, get_agent_session_pool
+from app.core.config import settings
+from app.core.db import engine
+from app.models.agentsetting import AgentSetting
+from app.models.documents import DocumentContent, Project
+from app.models.enums import ForSection, SectionType
+from app.tasks.common import cur_time, review_err
+from app.tasks.limiter import get_async_agent_limiter
+from app.tasks.reviews import (
+    REVIEW_PROJ_TYPE_MAP,
+    AgentReviewRequest,
+    SectionReviewResult,
+    build_agent_run_payload,
+    build_review_hash,
+    load_dcontent_map,
+    parse_agent_raw_rasp,
+    prepare_agent_request,
+    record_section_review,
+    reuse_prior_review,
+    save_agent_review,
+    save_section_error,
+    section_error_result,
+)
+
+
+def new_async_agent_client() -> httpx.AsyncClient:
+    """创建请求智能体的asyncio客户端, 带连接池(keep-alive)
+
+    需要在使用完后关闭(`aclose` 或 `async with`)。
+    """
+
+    limits = httpx.Limits(
+        max_connections=settings.AGENT_ASYNC_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.AGENT_HTTP_POOL_MAXSIZE,
+    )
+
+    return httpx.AsyncClient(limits=limits)
+
+
+# --------- agent session 相关操作 ------------------
+
+
+async def async_create_agent_session(
+    client: httpx.AsyncClient, agent_setting: AgentSetting
+) -> str:
+    """创建1个session"""
+
+    url = settings.build_agent_create_session_api(
+        agent_setting.protocol, agent_setting.host, agent_setting.port
+    )
+    logger.info(f"创建session url: {url}")
+    payload = CreateSessionPayload(
+        agentCode=agent_setting.agent_code,
+        agentVersion=agent_setting.agent_version,
+    ).model_dump(mode="json")
+
+    resp = await client.post(
+        url,
+        json=payload,
+        headers=build_agent_headers(agent_setting),
+        timeout=settings.AGENT_SESSION_TIMEOUT,
+    )
+
+    if resp.status_code != 200:
+        logger.info(f"获取session失败: {resp.text}")
+        raise Exception(f"获取session失败, err: {resp.text}")
+
+    res = CreateSessionResponseModel.model_validate(resp.json())
+
+    return res.data.uniqueCode
+
+
+async def async_clear_agent_session(
+    client: httpx.AsyncClient, agent_setting: AgentSetting, session_id: str
+) -> bool:
+    """调用接口停止已有的session
+
+    Returns:
+        是否清理成功
+    """
+
+    url = settings.build_agent_clear_session_api(
+        agent_setting.protocol, agent_setting.host, agent_setting.port
+    )
+    logger.info(f"清理session url: {url}")
+    payload = ClearSessionPayload(sessionId=session_id).model_dump(mode="json")
+
+    resp = await client.post(
+        url,
+        json=payload,
+        headers=build_agent_headers(agent_setting),
+        timeout=settings.AGENT_SESSION_TIMEOUT,
+    )
+
+    if resp.status_code != 200:
+        logger.error(f"清理session失败！status_code:{resp.status_code} {resp.text}")
+
+    res = ClearSessionResponseModel.model_validate(resp.json())
+
+    if not res.success:
+        logger.error(f"清理session失败！status_code:{resp.status_code} {resp.text}")
+
+    return resp.status_code == 200 and res.success
+
+
+async def async_delete_agent_session(
+    client: httpx.AsyncClient, agent_setting: AgentSetting, session_id: str
+) -> None:
+    """调用接口删除已有的session"""
+
+    url = settings.build_agent_delete_session_api(
+        agent_setting.protocol, agent_setting.host, agent_setting.port
+    )
+    logger.info(f"删除session url: {url}")
+    payload = ClearSessionPayload(sessionId=session_id).model_dump(mode="json")
+
+    resp = await client.post(
+        url,
+        json=payload,
+        headers=build_agent_headers(agent_setting),
+        timeout=settings.AGENT_SESSION_TIMEOUT,
+    )
+
+    if resp.status_code != 200:
+        logger.error(f"删除session失败！err:{resp.text}")
+
+    res = ClearSessionResponseModel.model_validate(resp.json())
+
+    if not res.success:
+        logger.error(f"删除session失败！err:{resp.text}")
+
+
+# --------- 请求智能体 ------------------
+
+
+async def async_post_agent_api(
+    client: httpx.AsyncClient,
+    agent_setting: AgentSetting,
+    _message: str,
+    attachment: dict | None = None,
+    is_chat: bool = False,
+) -> AgentResponseModel:
+    """请求智能体接口并返回结果, 同 `post_agent_api`"""
+
+    url, headers, payload, session_id, resp = await async_post_agent_api_core(
+        client,
+        agent_setting,
+        _message,
+        attachment=attachment,
+        is_chat=is_chat,
+        timeout=settings.AGENT_RUN_TIMEOUT,
+    )
+
+    logger.info(f"调用agent 返回: {resp.text = }")
+
+    if resp.status_code != 200:
+        raise Exception(f"请求agent接口失败: {resp.text}")
+
+    return parse_agent_raw_rasp(resp)
+
+
+async def async_post_agent_api_core(
+    client: httpx.AsyncClient,
+    agent_setting: AgentSetting,
+    _message: str,
+    attachment: dict | None = None,
+    is_chat: bool = False,
+    timeout: float | None = None,
+) -> tuple[str, dict, dict, str, httpx.Response]:
+    """请求智能体接口并返回结果, 同 `post_agent_api_core`
+
+    Args:
+        client (httpx.AsyncClient): 请求使用的asyncio客户端。
+        agent_setting (AgentSetting): 智能体设置实例。
+        _message (str): 对话的内容。
+        attachment (str): 附件内容。
+        timout (float): 超时时间， 单位为秒(S), 默认为None, 无超时限制。
+
+    Returns:
+        5个值的元祖，分别代表:
+
+        - 请求的url,
+        - 请求的headers,
+        - 请求的payload,
+        - 使用的session_id,
+        - 请求的响应，resp
+    """
+
+    url = settings.build_agent_api(
+        agent_setting.protocol, agent_setting.host, agent_setting.port
+    )
+
+    headers = build_agent_headers(agent_setting)
+
+    # 创建1个新的session, 用于当前请求，防止上一个session_id执行超时后，影响后面的请求。
+    # 启用session池时，复用已清理过的session(与同步版本共用同一个池), 池中没有空闲的session时再新建
+    session_pool = get_agent_session_pool(agent_setting)
+    new_session_id = session_pool.acquire_idle() if session_pool is not None else None
+
+    if new_session_id is None:
+        new_session_id = await async_create_agent_session(client, agent_setting)
+
+    payload = build_agent_run_payload(
+        agent_setting, _message, new_session_id, attachment=attachment, is_chat=is_chat
+    )
+
+    # 请求成功的session才可以放回池中复用
+    reusable = False
+
+    try:
+        resp = await client.post(url, json=payload, headers=headers, timeout=timeout)
+        reusable = resp.status_code == 200
+
+        return url, headers, payload, new_session_id, resp
+
+    finally:
+        if session_pool is not None:
+            # 在后台线程中清理后放回池中，不阻塞事件循环
+            session_pool.release(agent_setting, new_session_id, reusable=reusable)
+            logger.info(f"归还agent session_id: {new_session_id} 到session池!")
+        else:
+            await async_clear_agent_session(client, agent_setting, new_session_id)
+            logger.info(f"清理新创建的agent session_id: {new_session_id} 成功!")
+            await async_delete_agent_session(client, agent_setting, new_session_id)
+            logger.info(f"删除新创建的agent session_id: {new_session_id} 成功!")
+
+
+# --------- 各节审查 ------------------
+
+
+async def async_run_section_reviews(
+    agent_params: dict[str, str],
+    review_jobs: list[tuple[SectionType, ForSection]],
+) -> list[SectionReviewResult]:
+    """在同一个事件循环中并发审查各节，返回的结果与 review_jobs 的顺序一致
+
+    对智能体的请求数量和频率由 `app.tasks.limiter` 限制。
+    """
+
+    async with new_async_agent_client() as client:
+        results = await asyncio.gather(
+            *(
+                async_review_one_section(client, agent_params, section, for_section)
+                for section, for_section in review_jobs
+            ),
+            return_exceptions=True,
+        )
+
+    section_results: list[SectionReviewResult] = []
+
+    # 单个节的异常不影响其他节, 保证之后汇总审查结果(finish_review)
+    for (section, for_section), result in zip(review_jobs, results, strict=True):
+        if isinstance(result, SectionReviewResult):
+            section_results.append(result)
+        elif isinstance(result, Exception):
+            section_results.append(section_error_result(section, for_section, result))
+        else:
+            raise result
+
+    return section_results
+
+
+async def async_review_one_section(
+    client: httpx.AsyncClient,
+    agent_params: dict[str, str],
+    section: SectionType,
+    for_section: ForSection,
+) -> SectionReviewResult:
+    """调用某个智能体审查某节的内容, 同 `review_one_section`
+
+    数据库操作(同步的会话)在线程中执行，不阻塞事件循环；同一时间只有1个线程使用该会话。
+    """
+
+    process_msgs: list[str] = []
+    review_pass = False
+    raised_error = False
+
+    with Session(engine) as session:
+        # 加载失败时没有项目的信息
+        doc_content: DocumentContent | None = None
+        proj_label = f"【{for_section.value}】"
+        proj_id: uuid.UUID | None = None
+
+        try:
+            dcontent_map, doc_content, project = await asyncio.to_thread(
+                load_section, session, agent_params, section
+            )
+
+            # 提交后对象的属性会过期，提前取出日志和缓存失效使用的值
+            proj_label = f"项目:【{project.name}】【第{project.version}次提交】的【{for_section.value}】"
+            proj_id = project.id
+
+            msg = f"{proj_label}开始审查."
+            process_msgs.append(f"{cur_time()} - {msg}")
+            logger.info(msg)
+
+            agent_request, err_msg, review_pass, review_hash = await asyncio.to_thread(
+                prepare_section_review,
+                session,
+                project,
+                doc_content,
+                dcontent_map,
+                for_section,
+            )
+
+            if agent_request is not None:
+                limiter = get_async_agent_limiter(agent_request.agent_setting)
+
+                async with limiter.limit():
+                    agent_resp = await async_post_agent_api(
+                        client,
+                        agent_request.agent_setting,
+                        agent_request.message,
+                        attachment=agent_request.attachment,
+                    )
+
+                err_msg, review_pass = await asyncio.to_thread(
+                    save_section_review,
+                    session,
+                    doc_content,
+                    for_section,
+                    review_hash,
+                    agent_resp,
+                )
+
+            if err_msg:
+                raised_error = True
+                msg = f"{proj_label}agent 审查异常, 错误: {review_err(err_msg)}"
+                process_msgs.append(f"{cur_time()} - {msg}")
+                logger.info(msg)
+
+        except Exception as e:
+            msg = f"{proj_label}审查异常, 错误: {review_err(str(e))}"
+            process_msgs.append(f"{cur_time()} - {msg}")
+            logger.exception(msg)
+
+            if doc_content is not None:
+                await asyncio.to_thread(
+                    save_section_error,
+                    session,
+                    doc_content,
+                    f"审查异常: {review_err(str(e))}",
+                )
+
+            # 继续审查， 不过要标识发生过错误，表示【算法审查失败】！
+            raised_error = True
+
+        # 记录一下，将来在页面中好搜索
+        msg = f"{proj_label}审查完成."
+        process_msgs.append(f"{cur_time()} - {msg}")
+        logger.info(msg)
+
+        # 该节的建议已变化
+        if proj_id is not None:
+            await asyncio.to_thread(invalidate_response_cache, project_tag(proj_id))
+
+    return SectionReviewResult(
+        section=section,
+        for_section=for_section,
+        review_pass=review_pass,
+        raised_error=raised_error,
+        process_msgs=process_msgs,
+    )
+
+
+# --------- 在线程中执行的数据库操作 ------------------
+
+
+def load_section(
+    session: Session, agent_params: dict[str, str], section: SectionType
+) -> tuple[dict[SectionType, DocumentContent], DocumentContent, Project]:
+    """加载各节的内容、审查的节以及所属的项目"""
+
+    dcontent_map = load_dcontent_map(session, agent_params)
+    doc_content = dcontent_map[section]
+
+    return dcontent_map, doc_content, doc_content.project
+
+
+def prepare_section_review(
+    session: Session,
+    project: Project,
+    doc_content: DocumentContent,
+    dcontent_map: dict[SectionType, DocumentContent],
+    for_section: ForSection,
+) -> tuple[AgentReviewRequest | None, str, bool, str]:
+    """构造请求智能体的参数, 输入与之前版本的审查相同时，直接复用之前的审查结果
+
+    Returns:
+        4个值的元祖，分别代表:
+
+        - 请求智能体的参数, 不需要请求(不支持审查的节、复用之前的结果)时为None
+        - 不需要请求时, 审查的错误信息
+        - 不需要请求时, 是否审查通过
+        - 审查输入的hash
+    """
+
+    agent_request, err_msg, review_pass = prepare_agent_request(
+        session,
+        project,
+        doc_content,
+        dcontent_map,
+        REVIEW_PROJ_TYPE_MAP[project.type],
+        for_section,
+    )
+
+    if agent_request is None:
+        return None, err_msg, review_pass, ""
+
+    review_hash = build_review_hash(for_section, agent_request)
+    prior_result = reuse_prior_review(session, doc_content, for_section, review_hash)
+
+    if prior_result is not None:
+        session.commit()
+
+        err_msg, review_pass = prior_result
+        return None, err_msg, review_pass, review_hash
+
+    return agent_request, err_msg, review_pass, review_hash
+
+
+def save_section_review(
+    session: Session,
+    doc_content: DocumentContent,
+    for_section: ForSection,
+    review_hash: str,
+    agent_resp: AgentResponseModel,
+) -> tuple[str, bool]:
+    """问题/建议详细、该节的建议以及审查记录在1个事务中提交"""
+
+    err_msg, review_pass = save_agent_review(
+        session, doc_content, for_section, agent_resp
+    )
+    record_section_review(
+        session, doc_content, for_section, review_hash, err_msg, review_pass
+    )
+    session.commit()
+
+    return err_msg, review_pass
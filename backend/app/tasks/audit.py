@@ -1,16 +1,22 @@
 import base64
 import json
+import threading
 import traceback
 import uuid
+from collections.abc import Callable
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from functools import partial
 from io import BytesIO
 from pathlib import Path
-from typing import BinaryIO
+from typing import Any, BinaryIO
 
 import pymupdf
 import requests
+from billiard.pool import Pool as BilliardPool  # type: ignore
 from celery import Task  # type: ignore
 from loguru import logger
 from pymupdf import Document
+from requests.adapters import HTTPAdapter
 from sqlmodel import Session
 
 from app.api.const import MEDIA_TYPE_MAP
@@ -27,6 +33,29 @@ from app.tasks.common import (
     save_doc_content_to_db,
     save_document_content,
 )
+from app.tasks.ocr_cache import ocr_content_digest, ocr_with_cache
+
+_ppocr_http_session: requests.Session | None = None
+_ppocr_http_session_lock = threading.Lock()
+
+
+def get_ppocr_http_session() -> requests.Session:
+    """获取请求ppocr共享的http会话, 带连接池, 多个线程同时识别时复用连接"""
+
+    global _ppocr_http_session
+
+    with _ppocr_http_session_lock:
+        if _ppocr_http_session is None:
+            http_session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=max(settings.PPOCR_MAX_INFLIGHT, 1),
+            )
+            http_session.mount("http://", adapter)
+            http_session.mount("https://", adapter)
+            _ppocr_http_session = http_session
+
+    return _ppocr_http_session
 
 
 def ppocr_post_png(
@@ -40,9 +69,10 @@ def ppocr_post_png(
 
     payload = {"img_base64": base64.b64encode(png_bytes).decode()}
 
-    resp = requests.post(
+    resp = get_ppocr_http_session().post(
         url,
         json=payload,
+        timeout=settings.PPOCR_TIMEOUT,
     )
 
     if resp.status_code != 200:
@@ -239,6 +269,192 @@ def baiduocr_post_png(
     return "", "\n".join(process_msgs)
 
 
+# --------- pdf 页面渲染 ------------------
+
+# 渲染线程中打开的pdf文档, 由 `_init_pdf_render_worker` 初始化。
+# 渲染进程/线程各自持有一份, 互不影响。
+_render_local = threading.local()
+
+
+def _init_pdf_render_worker(pdf_source: str | bytes) -> None:
+    """渲染进程(线程)的初始化, 每个进程只打开一次pdf文档"""
+
+    if isinstance(pdf_source, str):
+        _render_local.pdfdoc = pymupdf.open(pdf_source)
+    else:
+        _render_local.pdfdoc = pymupdf.Document(stream=pdf_source)
+
+
+def _render_pdf_page_png(page_index: int) -> bytes:
+    """渲染pdf的某一页为png图片的bytes"""
+
+    pdfdoc: Document = _render_local.pdfdoc
+    page = pdfdoc[page_index]
+    page_pixmap: pymupdf.Pixmap = page.get_pixmap(matrix=pymupdf.Matrix(2, 2))  # type: ignore
+
+    return page_pixmap.tobytes(output="png")  # 输出为png的图片
+
+
+class RenderProcessExecutor(Executor):
+    """基于 billiard(celery 使用的 multiprocessing 分支)进程池的执行器
+
+    celery prefork 的 worker 进程是守护进程, 标准库的 `ProcessPoolExecutor` 不能在其中创建子进程,
+    billiard 的进程池没有该限制。
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        initializer: Callable[..., None],
+        initargs: tuple[Any, ...],
+    ) -> None:
+        self._pool = BilliardPool(
+            processes=max_workers, initializer=initializer, initargs=initargs
+        )
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:  # type: ignore[override]
+        future: Future = Future()
+        future.set_running_or_notify_cancel()
+
+        def _set_exception(exc_info: Any) -> None:
+            # billiard 传递的是 ExceptionInfo
+            future.set_exception(getattr(exc_info, "exception", exc_info))
+
+        self._pool.apply_async(
+            fn,
+            args,
+            kwargs,
+            callback=future.set_result,
+            error_callback=_set_exception,
+        )
+
+        return future
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        if cancel_futures:
+            self._pool.terminate()
+        else:
+            self._pool.close()
+
+        if wait:
+            self._pool.join()
+
+
+def new_pdf_render_executor(pdf_source: str | bytes) -> Executor:
+    """创建渲染pdf页面的执行器
+
+    渲染是CPU密集的操作, `PPOCR_RENDER_PROCESSES` 大于0时在进程池中渲染(celery 的 worker 中也可以),
+    为0时在1个线程中渲染, 渲染和请求ppocr依旧可以重叠。
+    """
+
+    workers = settings.PPOCR_RENDER_PROCESSES
+
+    if workers > 0:
+        return RenderProcessExecutor(
+            max_workers=workers,
+            initializer=_init_pdf_render_worker,
+            initargs=(pdf_source,),
+        )
+
+    return ThreadPoolExecutor(
+        max_workers=1,
+        initializer=_init_pdf_render_worker,
+        initargs=(pdf_source,),
+    )
+
+
+def ppocr_pdf_pages(
+    pdf_source: str | bytes,
+    page_indexes: list[int],
+    proj_name: str,
+    proj_version: int,
+    *,
+    use_cache: bool = True,
+) -> list[tuple[str, str]]:
+    """流水线的方式OCR识别pdf的多个页面, 返回的结果与 page_indexes 的顺序一致
+
+    页面在进程池中渲染为png, 渲染完成后立即在线程池中请求ppocr识别;
+    同时在途的页面数不超过 `PPOCR_MAX_INFLIGHT`, 以限制内存占用和ppocr的并发。
+    渲染出的png与之前识别过的相同时, 直接使用缓存的识别结果。
+
+    Returns:
+        每页的 (识别的文本, 处理过程的消息)
+    """
+
+    max_inflight = max(settings.PPOCR_MAX_INFLIGHT, 1)
+    inflight = threading.BoundedSemaphore(max_inflight)
+
+    def ocr_page(render_future: Future[bytes], pno: int) -> tuple[str, str]:
+        try:
+            png_bytes = render_future.result()
+
+            return ocr_with_cache(
+                OcrApiType.PPOCR,
+                ocr_content_digest(png_bytes),
+                partial(ppocr_post_png, proj_name, proj_version, pno, png_bytes),
+                use_cache=use_cache,
+            )
+
+        finally:
+            inflight.release()
+
+    with (
+        new_pdf_render_executor(pdf_source) as render_executor,
+        ThreadPoolExecutor(max_workers=max_inflight) as ocr_executor,
+    ):
+        ocr_futures: list[Future[tuple[str, str]]] = []
+
+        for page_index in page_indexes:
+            inflight.acquire()
+
+            render_future = render_executor.submit(_render_pdf_page_png, page_index)
+            ocr_futures.append(
+                ocr_executor.submit(ocr_page, render_future, page_index + 1)
+            )
+
+        return [ocr_future.result() for ocr_future in ocr_futures]
+
+
+def extract_pdf_text_layer(pdfdoc: Document) -> dict[int, str]:
+    """提取pdf中带文本层页面的文本
+
+    由word等导出的pdf自带文本层, 直接提取即可, 不需要OCR识别;
+    文本层的(非空白)字符数少于 `PDF_TEXT_LAYER_MIN_CHARS` 的页面视为扫描的图片页。
+
+    Returns:
+        页面索引(从0开始) -> 页面的文本, 只包含带文本层的页面
+    """
+
+    min_chars = settings.PDF_TEXT_LAYER_MIN_CHARS
+
+    if min_chars <= 0:
+        return {}
+
+    text_pages: dict[int, str] = {}
+
+    for page_index, page in enumerate(pdfdoc):  # type: ignore
+        page_text: str = page.get_text("text", sort=True)  # type: ignore
+
+        if len("".join(page_text.split())) >= min_chars:
+            text_pages[page_index] = page_text.strip()
+
+    return text_pages
+
+
+def split_page_runs(page_indexes: list[int]) -> list[list[int]]:
+    """将页面索引按连续的区间分组, 如: [0, 1, 3, 4, 5, 8] -> [[0, 1], [3, 4, 5], [8]]"""
+
+    runs: list[list[int]] = []
+
+    for page_index in page_indexes:
+        if runs and runs[-1][-1] + 1 == page_index:
+            runs[-1].append(page_index)
+        else:
+            runs.append([page_index])
+
+    return runs
+
+
 def ocr_file2text(
     filename: str,
     filepath: str | BytesIO | BinaryIO,
@@ -246,10 +462,14 @@ def ocr_file2text(
     proj_version: int,
     *,
     api_type: OcrApiType = OcrApiType.PPOCR,
-    timeout: int | None = None
+    timeout: int | None = None,
+    use_cache: bool = True,
 ) -> tuple[str, str]:
     """OCR识别出文件中的文本，并返回
 
+    pdf中带文本层的页面直接提取文本, 只有图片页才调用OCR接口识别, 最终按页面顺序拼接。
+    识别结果按内容缓存(参考 `app.tasks.ocr_cache`), use_cache 为False时不读写缓存。
+
     参考接口文档:
 
         1.2 通用ocr识别图片接口: https://kdocs.cn/l/ct7Ln2R98HDz?linkname=KhwyszKB9S
@@ -263,29 +483,53 @@ def ocr_file2text(
 
     # 本地ppocr只支持单张图片。
     if api_type == OcrApiType.PPOCR:
+        # 渲染进程中需要重新打开文件, 路径直接传递, 文件流则传递其bytes
         if isinstance(filepath, str):
+            pdf_source: str | bytes = filepath
             pdfdoc: Document = pymupdf.open(filepath)
         else:
-            pdfdoc = pymupdf.Document(stream=filepath.read())
+            pdf_source = filepath.read()
+            pdfdoc = pymupdf.Document(stream=pdf_source)
+
+        page_count = len(pdfdoc)
+        text_pages = extract_pdf_text_layer(pdfdoc)
+        pdfdoc.close()
 
-        msg = f"项目:【{proj_name}】【第{proj_version}次提交】PDF文件共有: 【{len(pdfdoc)}】 页 内容"
+        ocr_page_indexes = [i for i in range(page_count) if i not in text_pages]
+
+        msg = f"项目:【{proj_name}】【第{proj_version}次提交】PDF文件共有: 【{page_count}】 页 内容, 其中【{len(text_pages)}】页直接提取文本, 【{len(ocr_page_indexes)}】页需要OCR识别"
         process_msgs.append(f"{cur_time()} - {msg}")
         logger.info(msg)
 
-        lines: list[str] = []
+        # 本地 ppocr 识别, 渲染和识别并行
+        ocr_results: dict[int, tuple[str, str]] = {}
+
+        if ocr_page_indexes:
+            ocr_results = dict(
+                zip(
+                    ocr_page_indexes,
+                    ppocr_pdf_pages(
+                        pdf_source,
+                        ocr_page_indexes,
+                        proj_name,
+                        proj_version,
+                        use_cache=use_cache,
+                    ),
+                    strict=True,
+                )
+            )
 
-        for pno, page in enumerate(pdfdoc, start=1):  # type: ignore
-            page_pixmap: pymupdf.Pixmap = page.get_pixmap(matrix=pymupdf.Matrix(2, 2))  # type: ignore
+        lines: list[str] = []
 
-            png_bytes = page_pixmap.tobytes(output="png")  # 输出为png的图片
+        for page_index in range(page_count):
+            if page_index in text_pages:
+                lines.append(text_pages[page_index])
 
-            # 本地 ppocr 识别
-            png_text, process_msg = ppocr_post_png(
-                proj_name, proj_version, pno, png_bytes
-            )
+            else:
+                png_text, process_msg = ocr_results[page_index]
 
-            lines.append(png_text)
-            process_msgs.append(process_msg)
+                lines.append(png_text)
+                process_msgs.append(process_msg)
 
             # 一页之后添加一个空行。
             lines.append("\n")
@@ -310,12 +554,106 @@ def ocr_file2text(
 
         assert file_media_type is not None, f"【{filename}】的媒体类型获取失败"
 
-        pdf_text, process_msg = baiduocr_post_png(filename, file_bytes, file_media_type, timeout=timeout)
+        if _suffix.lower() == "pdf":
+            pdf_text, process_msg = baiduocr_pdf_by_page_runs(
+                filename,
+                file_bytes,
+                file_media_type,
+                timeout=timeout,
+                use_cache=use_cache,
+            )
+        else:
+            pdf_text, process_msg = ocr_with_cache(
+                OcrApiType.BAIDU,
+                ocr_content_digest(file_bytes),
+                partial(
+                    baiduocr_post_png,
+                    filename,
+                    file_bytes,
+                    file_media_type,
+                    timeout=timeout,
+                ),
+                use_cache=use_cache,
+            )
+
         process_msgs.append(process_msg)
 
     return pdf_text, "\n".join(process_msgs)
 
 
+def baiduocr_pdf_by_page_runs(
+    filename: str,
+    file_bytes: bytes,
+    media_type: str,
+    timeout: int | None = None,
+    use_cache: bool = True,
+) -> tuple[str, str]:
+    """百度ocr识别pdf, 带文本层的页面直接提取
+
+    - 全部页面都带文本层: 不调用百度ocr
+    - 全部页面都是图片: 整个文件调用百度ocr
+    - 两者混合: 连续的图片页拆分为一个新的pdf调用百度ocr, 结果按页面顺序拼接
+    """
+
+    process_msgs: list[str] = []
+
+    with pymupdf.Document(stream=file_bytes) as pdfdoc:
+        page_count = len(pdfdoc)
+        text_pages = extract_pdf_text_layer(pdfdoc)
+
+        ocr_page_runs = split_page_runs(
+            [i for i in range(page_count) if i not in text_pages]
+        )
+
+        _msg = f"【baiduocr】文件 【{filename}】共有: 【{page_count}】 页, 其中【{len(text_pages)}】页直接提取文本"
+        process_msgs.append(_msg)
+        logger.info(_msg)
+
+        if not text_pages:
+            all_text, process_msg = ocr_with_cache(
+                OcrApiType.BAIDU,
+                ocr_content_digest(file_bytes),
+                partial(
+                    baiduocr_post_png, filename, file_bytes, media_type, timeout=timeout
+                ),
+                use_cache=use_cache,
+            )
+            process_msgs.append(process_msg)
+
+            return all_text, "\n".join(process_msgs)
+
+        # 页面索引 -> 该页(或从该页开始的连续图片页)的文本
+        chunks: dict[int, str] = dict(text_pages)
+
+        for page_run in ocr_page_runs:
+            page_range = f"{page_run[0] + 1}-{page_run[-1] + 1}"
+
+            with pymupdf.Document() as run_pdfdoc:
+                run_pdfdoc.insert_pdf(
+                    pdfdoc, from_page=page_run[0], to_page=page_run[-1]
+                )
+                run_bytes = run_pdfdoc.tobytes()
+
+            run_filename = f"{Path(filename).stem}_{page_range}.pdf"
+
+            run_text, process_msg = ocr_with_cache(
+                OcrApiType.BAIDU,
+                # 拆分出的pdf每次生成的bytes不同, 以原文件的摘要 + 页码范围作为缓存的键
+                ocr_content_digest(file_bytes, page_range),
+                partial(
+                    baiduocr_post_png, run_filename, run_bytes, media_type, timeout=timeout
+                ),
+                use_cache=use_cache,
+            )
+            process_msgs.append(process_msg)
+
+            chunks[page_run[0]] = run_text
+
+    all_text = "\n\n".join(chunks[page_index] for page_index in sorted(chunks))
+
+    return all_text, "\n".join(process_msgs)
+
+
 @celery_app.task(bind=True)
 def audit_scan_pdf_other(
     self: Task,  # noqa: ARG001
@@ -445,12 +783,9 @@ def audit_docx(
         process_msgs.append(f"{cur_time()} - {msg}")
         logger.info(msg)
 
+        # 边解析docx文件边按节切分内容
         parser = Extract(absolute_filepath, use_oss=False)
-        docx_shtml = parser.parse(render_format=RenderFormat.txt)
-
-        msg = f"项目:【{proj_name}】【第{proj_version}次提交】解析docx文件完成"
-        process_msgs.append(f"{cur_time()} - {msg}")
-        logger.info(msg)
+        docx_blocks = parser.iter_rendered_blocks(RenderFormat.txt)
 
         review_taskid, _process_msg = save_doc_content_to_db(
             session,
@@ -459,7 +794,7 @@ def audit_docx(
             proj_version,
             uuid.UUID(doc_id),
             iscuser_id,
-            docx_shtml,
+            docx_blocks,
         )
 
         process_msgs.append(_process_msg)
@@ -552,8 +887,10 @@ def ocr_appendix_file(
             # 本地ppocr
             pno = 1
             if api_type == OcrApiType.PPOCR:
-                file_content, _process_msg = ppocr_post_png(
-                    proj_name, proj_version, pno, png_bytes
+                file_content, _process_msg = ocr_with_cache(
+                    OcrApiType.PPOCR,
+                    ocr_content_digest(png_bytes),
+                    partial(ppocr_post_png, proj_name, proj_version, pno, png_bytes),
                 )
 
             # 百度api接口进行ocr
@@ -565,8 +902,10 @@ def ocr_appendix_file(
 
                 assert file_media_type is not None, f"【{filename}】的媒体类型获取失败"
 
-                file_content, _process_msg = baiduocr_post_png(
-                    filename, png_bytes, file_media_type
+                file_content, _process_msg = ocr_with_cache(
+                    OcrApiType.BAIDU,
+                    ocr_content_digest(png_bytes),
+                    partial(baiduocr_post_png, filename, png_bytes, file_media_type),
                 )
 
         msg = (
@@ -1,11 +1,15 @@
+import re
 import uuid
 from collections import defaultdict
-from datetime import datetime
+from collections.abc import Iterable
+from datetime import date, datetime
 
 from celery.result import AsyncResult
 from loguru import logger
+from sqlalchemy import insert
 from sqlmodel import Session
 
+from app.api.response_cache import invalidate_response_cache, project_tag
 from app.models.documents import (
     Document,
     DocumentContent,
@@ -17,9 +21,27 @@ from app.models.enums import (
     SectionTitleTypeMap,
     SectionType,
 )
+from app.tasks.analysis_stats import project_stat_days, refresh_analysis_stats
 
 std_section_titles = tuple(SectionTitleTypeMap.keys())
 
+# 标题行的归一化: 将空格去掉、括号替换为英文的括号。
+_title_line_table = str.maketrans({" ": None, "）": ")", "（": "(", "竣": "峻"})
+
+# 标题行: 不要 '一、', '1、' 等前缀(2个字符)，所以只匹配前缀后面的部分，前后共有2个其他字符。
+_section_title_pattern = re.compile(
+    ".{0,2}(?:"
+    + "|".join(
+        f"(?P<t{idx}>{re.escape(keyword[2:])})"
+        for idx, keyword in enumerate(std_section_titles)
+    )
+    + ").{0,2}",
+    re.DOTALL,
+)
+
+# 标题行的长度与某个节标题的长度一致
+_section_title_lengths = frozenset(len(keyword) for keyword in std_section_titles)
+
 
 def review_err(desc: str) -> str:
     """ 错误信息用红色显示 """
@@ -39,7 +61,7 @@ def save_doc_content_to_db(
     proj_version: int,
     doc_id: uuid.UUID,
     iscuser_id: str,
-    docx_shtml: str,
+    docx_blocks: str | Iterable[str],
 ) -> tuple[str | None, str]:
     """保存三措docx文档的内容到数据库, 并返回agent审查的celery任务ID
 
@@ -54,69 +76,43 @@ def save_doc_content_to_db(
         proj_version: 项目版本号
         doc_id: 数据库中存储的文档ID
         iscuser_id: isc用户ID
-        docx_shtml: 三措文档解析后的simple html内容
+        docx_blocks: 三措文档解析后的内容, 整个字符串或逐块渲染的内容
 
     Returns:
         保存的DocumentContent实例。
     """
     process_msgs: list[str] = []
 
-    txt_lines = docx_shtml.split("\n")
-
-    # 当前section
-    curren_section: SectionType = SectionType.head
-
-    section_contents: list[str] = []
-
-    document_contents: list[DocumentContent] = []
-
-    # 保存所有文档所有txt内容
-    logger.info(f"{type(docx_shtml) = }")
+    # 整个文档的内容也可以按块传入
+    if isinstance(docx_blocks, str):
+        docx_blocks = [docx_blocks]
 
     msg = f"项目:【{proj_name}】【第{proj_version}次提交】开始处理docx文件..."
     process_msgs.append(f"{cur_time()} - {msg}")
     logger.info(msg)
 
-    doc_all_content = save_document_content(
-        session, proj_id, proj_version, doc_id, iscuser_id, SectionType.all, docx_shtml
-    )
-    document_contents.append(doc_all_content)
-
-    # 文档的节名称和节内容ID的映射，要发送给异步审核函数。
-    agent_params: dict[str, str] = {SectionType.all.value: doc_all_content.id.hex}
-
-    # 缓存已解析到的section内容
-    section_content_cache: dict[SectionType, list[str]] = defaultdict(list)
-
-    # 保存文档各section内容
-    for line in txt_lines:
-        unwrap_line = line.strip()
-
-        # 使用 any() 和 in 操作符
-        section_title = find_section_title(unwrap_line)
-
-        if section_title:
-            # 保存section内容
-            content = "\n".join(section_contents)
-            section_content_cache[curren_section].append(content)
-            section_contents.clear()  # 保存之后要清空
+    # 边接收文档内容边切分各section
+    segmenter = SectionSegmenter()
 
+    for block in docx_blocks:
+        for section_title in segmenter.feed(block):
             msg = f"项目:【{proj_name}】【第{proj_version}次提交】找到节: {review_err(section_title)}"
             process_msgs.append(f"{cur_time()} - {msg}")
             logger.info(msg)
 
-            # 将下一个的section标题添加进去
-            section_contents.append(line)
+    docx_content = segmenter.close()
 
-            # 赋予新的section
-            curren_section = SectionTitleTypeMap[section_title]
-        else:
-            section_contents.append(line)
+    # 所有文档内容(整个文档以及每节)先在本地生成(包括ID), 然后1次写入
+    doc_all_content = build_document_content(
+        proj_id, proj_version, doc_id, iscuser_id, SectionType.all, docx_content
+    )
+    document_contents: list[DocumentContent] = [doc_all_content]
 
-    # 扫尾，保存最后一个块
-    content = "\n".join(section_contents)
+    # 文档的节名称和节内容ID的映射，要发送给异步审核函数。
+    agent_params: dict[str, str] = {SectionType.all.value: doc_all_content.id.hex}
 
-    section_content_cache[curren_section].append(content)
+    # 已解析到的section内容
+    section_content_cache = segmenter.section_contents
 
     # 保存每个section中对应的最多的内容的content
     logger.info(f"{section_content_cache = }")
@@ -124,8 +120,8 @@ def save_doc_content_to_db(
         # 最长的内容
         content = max(contents, key=len)
 
-        dc = save_document_content(
-            session, proj_id, proj_version, doc_id, iscuser_id, section, content
+        dc = build_document_content(
+            proj_id, proj_version, doc_id, iscuser_id, section, content
         )
         document_contents.append(dc)
         agent_params[section.value] = dc.id.hex
@@ -134,15 +130,37 @@ def save_doc_content_to_db(
 
     assert project is not None, "项目不存在"
 
-    # 更新项目状态和进度
-    project.review_begin_at = datetime.now()
-    project.review_status = ReviewStatus.UNREVIEWED
-    project.review_percent = 20
+    # 审查任务的ID在提交事务前生成，与文档一起保存，事务提交后再发送任务
+    taskid = str(uuid.uuid4())
 
-    session.add(project)
-    session.commit()
+    # 项目状态修改前后统计的日期(如再次提交前开始审查的日期)，都要刷新分析统计
+    stat_days = project_stat_days(project)
 
-    msg = f"项目:【{proj_name}】【第{proj_version}次提交】更新项目状态和进度为: 【{review_err(ReviewStatus.UNREVIEWED.value)}】"
+    try:
+        bulk_insert_document_contents(session, document_contents)
+
+        # 更新项目状态和进度
+        project.review_begin_at = datetime.now()
+        project.review_status = ReviewStatus.UNREVIEWED
+        project.review_percent = 20
+        session.add(project)
+
+        document = session.get(Document, doc_id)
+
+        if document is not None:
+            document.task_id = uuid.UUID(taskid)
+            session.add(document)
+
+        session.commit()
+
+    except Exception:
+        session.rollback()
+        raise
+
+    # 项目的文档内容、文档的审查任务ID已变化
+    invalidate_response_cache(project_tag(proj_id))
+
+    msg = f"项目:【{proj_name}】【第{proj_version}次提交】保存文档内容({len(document_contents)}条), 更新项目状态和进度为: 【{review_err(ReviewStatus.UNREVIEWED.value)}】"
     process_msgs.append(f"{cur_time()} - {msg}")
     logger.info(msg)
 
@@ -157,29 +175,22 @@ def save_doc_content_to_db(
     # todo: 调用智能体接口，审核各部分内容并生成建议。
     # 发送celery任务，调用agent对文档内容进行审查
 
-    # celery 任务
-    from app.tasks.reviews import review_by_agent
-
-    ares: AsyncResult = review_by_agent.delay(agent_params, **kwargs)  # type: ignore
+    # celery 任务, 每节作为子任务并行审查，全部完成后汇总
+    from app.tasks.reviews import dispatch_review_by_agent
 
-    taskid: str | None = ares.id
+    ares: AsyncResult = dispatch_review_by_agent(agent_params, task_id=taskid, **kwargs)
 
-    msg = f"项目:【{proj_name}】【第{proj_version}次提交】提交agent审核任务, id: {review_err(taskid or '')}"
+    msg = f"项目:【{proj_name}】【第{proj_version}次提交】提交agent审核任务, id: {review_err(ares.id or '')}"
     process_msgs.append(f"{cur_time()} - {msg}")
     logger.info(msg)
 
-    document = session.get(Document, doc_id)
+    # 新的工程、文档以及等待审查的工程
+    refresh_analysis_stats(stat_days | project_stat_days(project) | {date.today()})
 
-    if document is not None:
-        document.task_id = uuid.UUID(taskid) if taskid else None
-        session.add(document)
-        session.commit()
-
-    return taskid, '\n'.join(process_msgs)
+    return ares.id, '\n'.join(process_msgs)
 
 
-def save_document_content(
-    session: Session,
+def build_document_content(
     proj_id: uuid.UUID,
     proj_version: int,
     doc_id: uuid.UUID,
@@ -187,7 +198,7 @@ def save_document_content(
     section: SectionType,
     content: str,
 ) -> DocumentContent:
-    """保存文档内容"""
+    """生成文档内容(未保存), ID在本地生成"""
 
     dc_create = DocumentContentCreate(
         section=section,
@@ -201,7 +212,36 @@ def save_document_content(
         "doc_id": doc_id,
         "iscuser_id": iscuser_id,
     }
-    dc = DocumentContent.model_validate(dc_create, update=update)
+
+    return DocumentContent.model_validate(dc_create, update=update)
+
+
+def bulk_insert_document_contents(
+    session: Session, document_contents: list[DocumentContent]
+) -> None:
+    """用1条 INSERT 语句(executemany)写入多个文档内容, 由调用者提交"""
+
+    if document_contents:
+        session.exec(
+            insert(DocumentContent),  # type: ignore
+            params=[dc.model_dump() for dc in document_contents],
+        )
+
+
+def save_document_content(
+    session: Session,
+    proj_id: uuid.UUID,
+    proj_version: int,
+    doc_id: uuid.UUID,
+    iscuser_id: str,
+    section: SectionType,
+    content: str,
+) -> DocumentContent:
+    """保存文档内容"""
+
+    dc = build_document_content(
+        proj_id, proj_version, doc_id, iscuser_id, section, content
+    )
 
     try:
         session.add(dc)
@@ -225,13 +265,73 @@ def find_section_title(line: str) -> str | None:
 
         十、现场作业示意图
     """
-    for keyword in std_section_titles:
-        # 1. 将空格去掉、括号替换为英文的括号。
-        _line = line.replace(" ", "").replace('）',')').replace('（', '(').replace('竣', '峻')
-        # 2. 不要 '一、', '二、', '三、', '1、', '2、', '3、' 等前缀
-        # 3. 确保是【节内容标题】单独占一行。
-        if keyword[2:] in _line and len(_line) == len(keyword):
-            logger.info(f"{keyword} => 匹配到的行: {_line}")
-            return keyword
-
-    return None
+
+    _line = line.translate(_title_line_table)
+
+    if len(_line) not in _section_title_lengths:
+        return None
+
+    m = _section_title_pattern.fullmatch(_line)
+
+    if m is None or m.lastgroup is None:
+        return None
+
+    keyword = std_section_titles[int(m.lastgroup[1:])]
+
+    # 确保是【节内容标题】单独占一行。
+    if len(_line) != len(keyword):
+        return None
+
+    logger.info(f"{keyword} => 匹配到的行: {_line}")
+    return keyword
+
+
+class SectionSegmenter:
+    """按三措十条的节标题切分文档内容
+
+    逐块接收渲染后的文档内容(1块可能有多行)，遇到节标题时切分出上一节的内容。
+    """
+
+    def __init__(self) -> None:
+        self.current_section: SectionType = SectionType.head
+
+        # 每个section切分出的内容, 同一个section可能出现多次
+        self.section_contents: dict[SectionType, list[str]] = defaultdict(list)
+
+        self._section_lines: list[str] = []
+        self._blocks: list[str] = []
+
+    def feed(self, block: str) -> list[str]:
+        """接收1块内容，返回其中找到的节标题"""
+
+        self._blocks.append(block)
+
+        found_titles: list[str] = []
+
+        for line in block.split("\n"):
+            section_title = find_section_title(line.strip())
+
+            if section_title:
+                self._cut()
+                found_titles.append(section_title)
+
+                # 赋予新的section
+                self.current_section = SectionTitleTypeMap[section_title]
+
+            # section的标题也是该section的内容
+            self._section_lines.append(line)
+
+        return found_titles
+
+    def close(self) -> str:
+        """切分出最后一节，返回整个文档的内容"""
+
+        self._cut()
+
+        return "\n".join(self._blocks)
+
+    def _cut(self) -> None:
+        self.section_contents[self.current_section].append(
+            "\n".join(self._section_lines)
+        )
+        self._section_lines.clear()
@@ -0,0 +1,47 @@
+"""按配置初始化文档解析使用的图片缓存
+
+`app.mydocx` 不依赖 app 的配置, 进程启动时(api 的 lifespan、celery worker 子进程初始化)
+调用 `setup_image_cache` 按 `IMAGE_CACHE_*` 配置进程内LRU的大小以及进程间共享的缓存层。
+"""
+
+import os
+import tempfile
+
+from loguru import logger
+
+from app.core.config import settings
+from app.core.redis import get_redis_client
+from app.mydocx.tools.image_cache import (
+    DiskImageCache,
+    ImageCache,
+    RedisImageCache,
+    SharedImageCache,
+    set_image_cache,
+)
+
+
+def setup_image_cache() -> ImageCache:
+    """按配置创建进程内共享的图片缓存"""
+
+    shared: SharedImageCache | None = None
+
+    if settings.IMAGE_CACHE_BACKEND == "redis":
+        redis = get_redis_client()
+        shared = RedisImageCache(redis, settings.IMAGE_CACHE_TTL)
+
+    elif settings.IMAGE_CACHE_BACKEND == "disk":
+        directory = settings.IMAGE_CACHE_DIR or os.path.join(
+            tempfile.gettempdir(), "image-cache"
+        )
+        shared = DiskImageCache(directory, settings.IMAGE_CACHE_TTL)
+
+    image_cache = ImageCache(
+        max_memory_bytes=settings.IMAGE_CACHE_MEMORY_BYTES,
+        max_item_bytes=settings.IMAGE_CACHE_MAX_ITEM_BYTES,
+        shared=shared,
+    )
+    set_image_cache(image_cache)
+
+    logger.info(f"图片缓存的共享层: {settings.IMAGE_CACHE_BACKEND}")
+
+    return image_cache
@@ -0,0 +1,326 @@
+"""智能体调用的限流
+
+替代每节审查后固定的 `time.sleep(2)`:
+
+1. 并发数: 同一个智能体同时在途的请求数不超过 `AGENT_CONCURRENCY_PER_AGENT`
+2. 速率: 同一个智能体两次请求的开始时间至少间隔 `AGENT_MIN_INTERVAL` 秒
+
+以 协议 + 主机 + 端口 + 智能体编码 区分不同的智能体。
+
+chord 的每节子任务在不同的 celery worker 进程中执行，`AGENT_LIMITER_BACKEND` 为 redis(默认)时，
+并发数和调用间隔保存在redis中，所有进程(包括多台机器)共享同一个限制:
+
+- 并发数: 有序集合, 成员为每个在途请求的令牌, 分数为令牌的过期时间(进程异常退出时不会永久占用),
+  请求智能体的超时时间(`AGENT_RUN_TIMEOUT`)小于占用时间, 正常执行的请求不会在结束前过期
+- 间隔: 下一个可以发起请求的时间点
+
+两者在1个lua脚本中原子地检查和更新, 时间以redis服务器的时间为准。
+redis 不可用时退回到进程内的限流器, 只记录日志。
+
+为 local 时限流器按进程共享(asyncio 版本按事件循环共享), 只适用于单个进程内的并发审查。
+"""
+
+import asyncio
+import threading
+import time
+import uuid
+import weakref
+from collections.abc import AsyncIterator, Iterator
+from contextlib import asynccontextmanager, contextmanager
+
+from loguru import logger
+from redis import RedisError, StrictRedis
+
+from app.core.config import settings
+from app.core.redis import get_redis_client
+from app.models.agentsetting import AgentSetting
+
+AGENT_LIMITER_PREFIX = "agent:limiter"
+
+# KEYS: 在途请求的有序集合, 下一个请求的时间点
+# ARGV: 令牌, 并发数, 最小间隔(秒), 令牌的有效期(秒)
+# 返回: 获取失败(并发数已满)时为 -1, 否则为需要等待的毫秒数
+_ACQUIRE_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[2]) then
+    return -1
+end
+
+local lease_ms = tonumber(ARGV[4]) * 1000
+redis.call('ZADD', KEYS[1], now + lease_ms, ARGV[1])
+redis.call('PEXPIRE', KEYS[1], lease_ms)
+
+local next_at = tonumber(redis.call('GET', KEYS[2]) or '0')
+local start_at = math.max(now, next_at)
+local interval_ms = math.floor(tonumber(ARGV[3]) * 1000)
+redis.call('SET', KEYS[2], start_at + interval_ms, 'PX', math.max(interval_ms, 1000))
+
+return start_at - now
+"""
+
+
+class AgentRateLimiter:
+    """单个智能体的限流器: 并发数 + 最小调用间隔"""
+
+    def __init__(self, concurrency: int, min_interval: float) -> None:
+        self._semaphore = threading.BoundedSemaphore(max(concurrency, 1))
+        self._min_interval = max(min_interval, 0)
+        self._lock = threading.Lock()
+        self._next_at: float = 0
+
+    def _wait_turn(self) -> None:
+        """等待到下一个可以发起请求的时间点"""
+
+        with self._lock:
+            now = time.monotonic()
+            wait_seconds = self._next_at - now
+            self._next_at = max(now, self._next_at) + self._min_interval
+
+        if wait_seconds > 0:
+            time.sleep(wait_seconds)
+
+    @contextmanager
+    def limit(self) -> Iterator[None]:
+        """在限流的范围内执行请求"""
+
+        with self._semaphore:
+            self._wait_turn()
+            yield
+
+
+_limiters: dict[str, "AgentRateLimiter | RedisAgentRateLimiter"] = {}
+_limiters_lock = threading.Lock()
+
+
+def agent_limiter_key(agent_setting: AgentSetting) -> str:
+    """智能体限流器的键"""
+
+    return f"{agent_setting.protocol}://{agent_setting.host}:{agent_setting.port}/{agent_setting.agent_code}"
+
+
+def get_agent_limiter(
+    agent_setting: AgentSetting,
+) -> "AgentRateLimiter | RedisAgentRateLimiter":
+    """获取(或创建)某个智能体的限流器"""
+
+    key = agent_limiter_key(agent_setting)
+
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+
+        if limiter is None:
+            if settings.AGENT_LIMITER_BACKEND == "redis":
+                limiter = RedisAgentRateLimiter(
+                    get_redis_client(),
+                    key,
+                    settings.AGENT_CONCURRENCY_PER_AGENT,
+                    settings.AGENT_MIN_INTERVAL,
+                    settings.AGENT_LIMITER_LEASE_SECONDS,
+                )
+            else:
+                limiter = AgentRateLimiter(
+                    settings.AGENT_CONCURRENCY_PER_AGENT, settings.AGENT_MIN_INTERVAL
+                )
+
+            _limiters[key] = limiter
+
+    return limiter
+
+
+class AsyncAgentRateLimiter:
+    """单个智能体的asyncio限流器: 并发数 + 最小调用间隔"""
+
+    def __init__(self, concurrency: int, min_interval: float) -> None:
+        self._semaphore = asyncio.BoundedSemaphore(max(concurrency, 1))
+        self._min_interval = max(min_interval, 0)
+        self._next_at: float = 0
+
+    async def _wait_turn(self) -> None:
+        """等待到下一个可以发起请求的时间点"""
+
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        wait_seconds = self._next_at - now
+        self._next_at = max(now, self._next_at) + self._min_interval
+
+        if wait_seconds > 0:
+            await asyncio.sleep(wait_seconds)
+
+    @asynccontextmanager
+    async def limit(self) -> AsyncIterator[None]:
+        """在限流的范围内执行请求"""
+
+        async with self._semaphore:
+            await self._wait_turn()
+            yield
+
+
+_async_limiters: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop,
+    dict[str, "AsyncAgentRateLimiter | AsyncRedisAgentRateLimiter"],
+] = weakref.WeakKeyDictionary()
+
+
+def get_async_agent_limiter(
+    agent_setting: AgentSetting,
+) -> "AsyncAgentRateLimiter | AsyncRedisAgentRateLimiter":
+    """获取(或创建)当前事件循环中某个智能体的限流器"""
+
+    loop = asyncio.get_running_loop()
+    limiters = _async_limiters.setdefault(loop, {})
+
+    key = agent_limiter_key(agent_setting)
+    limiter = limiters.get(key)
+
+    if limiter is None:
+        if settings.AGENT_LIMITER_BACKEND == "redis":
+            limiter = AsyncRedisAgentRateLimiter(
+                get_redis_client(),
+                key,
+                settings.AGENT_CONCURRENCY_PER_AGENT,
+                settings.AGENT_MIN_INTERVAL,
+                settings.AGENT_LIMITER_LEASE_SECONDS,
+            )
+        else:
+            limiter = AsyncAgentRateLimiter(
+                settings.AGENT_CONCURRENCY_PER_AGENT, settings.AGENT_MIN_INTERVAL
+            )
+
+        limiters[key] = limiter
+
+    return limiter
+
+
+class RedisAgentRateLimiter:
+    """基于redis的智能体限流器, 所有进程共享: 并发数 + 最小调用间隔"""
+
+    # 并发数已满时, 重新尝试获取的间隔, 单位秒
+    poll_interval: float = 0.2
+
+    def __init__(
+        self,
+        redis: StrictRedis,
+        key: str,
+        concurrency: int,
+        min_interval: float,
+        lease_seconds: int,
+    ) -> None:
+        self._redis = redis
+        self._inflight_key = f"{AGENT_LIMITER_PREFIX}:{key}:inflight"
+        self._next_at_key = f"{AGENT_LIMITER_PREFIX}:{key}:next_at"
+        self._concurrency = max(concurrency, 1)
+        self._min_interval = max(min_interval, 0)
+        self._lease_seconds = max(lease_seconds, 1)
+        self._script = redis.register_script(_ACQUIRE_SCRIPT)
+
+        # redis 不可用时使用的进程内限流器
+        self._fallback = AgentRateLimiter(concurrency, min_interval)
+
+    def try_acquire(self, token: str) -> float | None:
+        """尝试占用1个并发数, 成功时返回需要等待的秒数, 并发数已满时返回None"""
+
+        wait_ms = int(
+            self._script(  # type: ignore
+                keys=[self._inflight_key, self._next_at_key],
+                args=[
+                    token,
+                    self._concurrency,
+                    self._min_interval,
+                    self._lease_seconds,
+                ],
+            )
+        )
+
+        return None if wait_ms < 0 else wait_ms / 1000
+
+    def release(self, token: str) -> None:
+        """释放占用的并发数, 失败时等待令牌过期"""
+
+        try:
+            self._redis.zrem(self._inflight_key, token)
+
+        except RedisError as e:
+            logger.warning(f"释放智能体限流令牌失败: {e}")
+
+    def _acquire(self) -> str:
+        token = uuid.uuid4().hex
+
+        while (wait_seconds := self.try_acquire(token)) is None:
+            time.sleep(self.poll_interval)
+
+        if wait_seconds > 0:
+            time.sleep(wait_seconds)
+
+        return token
+
+    @contextmanager
+    def limit(self) -> Iterator[None]:
+        """在限流的范围内执行请求"""
+
+        try:
+            token = self._acquire()
+
+        except RedisError as e:
+            logger.warning(f"redis限流不可用, 使用进程内的限流: {e}")
+
+            with self._fallback.limit():
+                yield
+
+            return
+
+        try:
+            yield
+        finally:
+            self.release(token)
+
+
+class AsyncRedisAgentRateLimiter(RedisAgentRateLimiter):
+    """基于redis的智能体asyncio限流器, redis 命令在线程中执行, 等待时不阻塞事件循环"""
+
+    def __init__(
+        self,
+        redis: StrictRedis,
+        key: str,
+        concurrency: int,
+        min_interval: float,
+        lease_seconds: int,
+    ) -> None:
+        super().__init__(redis, key, concurrency, min_interval, lease_seconds)
+        self._async_fallback = AsyncAgentRateLimiter(concurrency, min_interval)
+
+    async def _async_acquire(self) -> str:
+        token = uuid.uuid4().hex
+
+        while (
+            wait_seconds := await asyncio.to_thread(self.try_acquire, token)
+        ) is None:
+            await asyncio.sleep(self.poll_interval)
+
+        if wait_seconds > 0:
+            await asyncio.sleep(wait_seconds)
+
+        return token
+
+    @asynccontextmanager
+    async def limit(self) -> AsyncIterator[None]:  # type: ignore[override]
+        """在限流的范围内执行请求"""
+
+        try:
+            token = await self._async_acquire()
+
+        except RedisError as e:
+            logger.warning(f"redis限流不可用, 使用进程内的限流: {e}")
+
+            async with self._async_fallback.limit():
+                yield
+
+            return
+
+        try:
+            yield
+        finally:
+            await asyncio.to_thread(self.release, token)
@@ -0,0 +1,139 @@
+"""OCR识别结果的缓存
+
+以内容的 SHA-256 为键缓存识别出的文本, 重复提交(项目版本+1)时未修改的页面、附件不再调用OCR接口:
+
+- ppocr: 渲染后页面的png图片 / 附件图片的bytes
+- 百度ocr: 整个文件的bytes, 拆分识别的连续图片页附加上页码范围
+
+缓存保存在redis中, 每条缓存都有过期时间(`OCR_CACHE_TTL`), 超过 `OCR_CACHE_MAX_TEXT_BYTES` 的文本不缓存;
+redis 内存不足时按其 maxmemory-policy(建议 volatile-lru) 淘汰。命中和未命中的次数记录在redis的hash中。
+"""
+
+import hashlib
+import threading
+from collections.abc import Callable
+
+from loguru import logger
+from redis import RedisError, StrictRedis
+
+from app.core.config import settings
+from app.core.enums import OcrApiType
+from app.core.redis import get_redis_client
+
+OCR_CACHE_PREFIX = "ocr:text"
+OCR_CACHE_STATS_KEY = "ocr:stats"
+
+
+def ocr_content_digest(content: bytes, suffix: str = "") -> str:
+    """识别内容的摘要, suffix 用于区分同一文件的不同部分(如页码范围)"""
+
+    digest = hashlib.sha256(content).hexdigest()
+
+    return f"{digest}:{suffix}" if suffix else digest
+
+
+class OcrCache:
+    """基于redis的OCR识别结果缓存"""
+
+    def __init__(self, redis: StrictRedis, ttl: int, max_text_bytes: int) -> None:
+        self._redis = redis
+        self._ttl = ttl
+        self._max_text_bytes = max_text_bytes
+
+    @staticmethod
+    def _key(api_type: OcrApiType, digest: str) -> str:
+        return f"{OCR_CACHE_PREFIX}:{api_type.value}:{digest}"
+
+    def _incr(self, api_type: OcrApiType, field: str) -> None:
+        self._redis.hincrby(OCR_CACHE_STATS_KEY, f"{api_type.value}:{field}", 1)
+
+    def get(self, api_type: OcrApiType, digest: str) -> str | None:
+        """获取缓存的文本, 未命中时返回None"""
+
+        value: bytes | None = self._redis.get(self._key(api_type, digest))  # type: ignore
+
+        self._incr(api_type, "hits" if value is not None else "misses")
+
+        return value.decode() if value is not None else None
+
+    def set(self, api_type: OcrApiType, digest: str, text: str) -> bool:
+        """缓存识别的文本, 文本过大时不缓存"""
+
+        value = text.encode()
+
+        if len(value) > self._max_text_bytes:
+            return False
+
+        self._redis.setex(self._key(api_type, digest), self._ttl, value)
+
+        return True
+
+    def stats(self) -> dict[str, int]:
+        """命中和未命中的次数, 如: {"ppocr:hits": 10, "ppocr:misses": 2}"""
+
+        raw: dict[bytes, bytes] = self._redis.hgetall(OCR_CACHE_STATS_KEY)  # type: ignore
+
+        return {k.decode(): int(v) for k, v in raw.items()}
+
+
+_ocr_cache: OcrCache | None = None
+_ocr_cache_lock = threading.Lock()
+
+
+def get_ocr_cache() -> OcrCache | None:
+    """获取(celery worker)进程共享的OCR缓存, 未启用缓存时返回None"""
+
+    global _ocr_cache
+
+    if not settings.OCR_CACHE_ENABLED:
+        return None
+
+    with _ocr_cache_lock:
+        if _ocr_cache is None:
+            redis = get_redis_client()
+            _ocr_cache = OcrCache(
+                redis, settings.OCR_CACHE_TTL, settings.OCR_CACHE_MAX_TEXT_BYTES
+            )
+
+    return _ocr_cache
+
+
+def ocr_with_cache(
+    api_type: OcrApiType,
+    digest: str,
+    ocr_func: Callable[[], tuple[str, str]],
+    *,
+    use_cache: bool = True,
+) -> tuple[str, str]:
+    """先查缓存, 未命中时调用 ocr_func 识别并缓存结果
+
+    只缓存识别出文本的结果, 识别失败(文本为空)时下次重新识别。
+    redis 不可用时不影响识别, 直接调用 ocr_func。
+
+    Returns:
+        (识别的文本, 处理过程的消息), 同 ocr_func
+    """
+
+    ocr_cache = get_ocr_cache() if use_cache else None
+
+    if ocr_cache is not None:
+        try:
+            text = ocr_cache.get(api_type, digest)
+
+            if text is not None:
+                logger.info(f"【{api_type.value}】ocr缓存命中: {digest}")
+                return text, f"【{api_type.value}】ocr缓存命中: {digest}"
+
+        except RedisError as e:
+            logger.warning(f"【{api_type.value}】读取ocr缓存失败: {e}")
+
+    text, process_msg = ocr_func()
+
+    if ocr_cache is not None and text:
+        try:
+            ocr_cache.set(api_type, digest, text)
+
+        except RedisError as e:
+            logger.warning(f"【{api_type.value}】写入ocr缓存失败: {e}")
+
+    return text, process_msg
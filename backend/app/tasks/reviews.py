@@ -1,19 +1,28 @@
+import asyncio
+import hashlib
 import json
-import time
 import uuid
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from typing import NamedTuple
 
-import requests  # type: ignore
-from celery import Task  # type: ignore
+import httpx
+from celery import Task, chord, group  # type: ignore
+from celery.result import AsyncResult
 from loguru import logger
 from requests.models import Response as RequestsResponse
-from sqlmodel import Session, select
+from sqlalchemy import insert
+from sqlmodel import Session, col, desc, select
 
+from app.api.response_cache import invalidate_response_cache, project_tag
 from app.api.schems import AgentResponseModel, RunAgentMessagePayload, RunAgentPayload
 from app.api.utils import (
+    build_agent_headers,
     clear_agent_session,
     create_agent_session,
     delete_agent_session,
+    get_agent_http_session,
+    get_agent_session_pool,
 )
 from app.core import celery_app
 from app.core.config import settings
@@ -23,6 +32,7 @@ from app.models.documents import (
     Document,
     DocumentContent,
     DocumentContentReview,
+    DocumentSectionReview,
     Project,
 )
 from app.models.enums import (
@@ -38,7 +48,9 @@ from app.models.enums import (
     SectionTitleTypeMap,
     SectionType,
 )
+from app.tasks.analysis_stats import project_stat_days, refresh_analysis_stats
 from app.tasks.common import cur_time, review_err
+from app.tasks.limiter import get_agent_limiter
 
 # 模拟数据
 
@@ -46,6 +58,78 @@ std_all_sections = set(SectionTitleTypeMap.values())
 
 REVIEW_PASS_TEXT = "该节审查通过"
 
+# 项目类型对应的智能体类型
+REVIEW_PROJ_TYPE_MAP: dict[ProjectTypeEnum, AgentType] = {
+    ProjectTypeEnum.TRNAS: AgentType.transmission,
+    ProjectTypeEnum.DISTRIBUTION: AgentType.distribute,
+    ProjectTypeEnum.SUBSTATION: AgentType.substation,
+}
+
+# 节对应的审查智能体，第七节单独审核4次
+REVIEW_SECTION_MAP: dict[SectionType, tuple[ForSection, ...]] = {
+    SectionType.one: (ForSection.one,),
+    SectionType.two: (ForSection.two,),
+    SectionType.three: (ForSection.three,),
+    SectionType.four: (ForSection.four,),
+    SectionType.five: (ForSection.five,),
+    SectionType.six: (ForSection.six,),
+    SectionType.seven: (
+        ForSection.sevenone,
+        ForSection.seventwo,
+        ForSection.seventhree,
+        ForSection.sevenfour,
+    ),
+    SectionType.eight: (ForSection.eight,),
+    SectionType.nine: (ForSection.nine,),
+    SectionType.ten: (ForSection.ten,),
+}
+
+
+class SectionReviewResult(NamedTuple):
+    """某节的某个智能体(ForSection)的审查结果"""
+
+    section: SectionType
+    """ 审查的节 """
+
+    for_section: ForSection
+    """ 审查该节使用的智能体 """
+
+    review_pass: bool
+    """ 是否审查通过 """
+
+    raised_error: bool
+    """ 审查过程中是否发生过异常 """
+
+    process_msgs: list[str]
+    """ 审查过程的消息 """
+
+
+def failed_section_result(
+    section: SectionType, for_section: ForSection, msg: str
+) -> SectionReviewResult:
+    """审查子任务本身失败(未能返回结果)时该节的结果: 未通过并标识发生过异常"""
+
+    return SectionReviewResult(
+        section=section,
+        for_section=for_section,
+        review_pass=False,
+        raised_error=True,
+        process_msgs=[f"{cur_time()} - {msg}"],
+    )
+
+
+class AgentReviewRequest(NamedTuple):
+    """请求智能体审查某节时的参数"""
+
+    agent_setting: AgentSetting
+    """ 审查使用的智能体配置 """
+
+    message: str
+    """ 审查的内容(包含依赖节的内容) """
+
+    attachment: dict[str, str]
+    """ 附件内容 """
+
 
 @celery_app.task(bind=True)
 def review_by_agent(
@@ -59,7 +143,8 @@ def review_by_agent(
 ) -> str:
     """调用远程AI的智能体接口
 
-    # todo: ai建议完，则要判断所有section中的内容是否都建议完，建议完则要更新项目/工程的审批状态。
+    各节(包括第七节的4次审查)相互独立，按 `AGENT_REVIEW_CONCURRENT` 配置并发或逐节审查，
+    所有节审查完成后，再统一汇总建议并更新文档/项目的审查状态。
 
     Args:
         self: CeleryTask实例
@@ -70,238 +155,554 @@ def review_by_agent(
         proj_id: 项目ID, uuid_str
     """
 
-    found_sections = {SectionType(value) for value in agent_params.keys()}
+    process_msgs: list[str] = []
+
+    with Session(engine) as session:
+        project, doc_all_content, miss_section_suggestion, _process_msgs = (
+            begin_review(session, agent_params)
+        )
+        process_msgs.extend(_process_msgs)
+
+        review_jobs, _process_msgs = build_review_jobs(
+            agent_params, project.name, project.version
+        )
+        process_msgs.extend(_process_msgs)
+
+        results = run_section_reviews(agent_params, review_jobs)
+
+        for result in results:
+            process_msgs.extend(result.process_msgs)
+
+        finish_review(
+            session,
+            project,
+            doc_all_content,
+            agent_params,
+            results,
+            miss_section_suggestion=miss_section_suggestion,
+        )
+
+    # 记录一下，将来在页面中好搜索
+    msg = f"项目:【{project.name}】【第{project.version}次提交】审查完成."
+    process_msgs.append(f"{cur_time()} - {msg}")
+    logger.info(msg)
+
+    return "\n".join(process_msgs)
+
+
+@celery_app.task(
+    bind=True,
+    max_retries=settings.AGENT_REVIEW_SECTION_MAX_RETRIES,
+    default_retry_delay=settings.AGENT_REVIEW_SECTION_RETRY_DELAY,
+)
+def review_section_by_agent(
+    self: Task,
+    agent_params: dict[str, str],
+    *,
+    section: str,
+    for_section: str,
+) -> dict:
+    """审查文档的某节的某个智能体(ForSection)，作为 chord 的子任务
+
+    审查失败时单独重试该子任务，重试次数用完后记录审查异常并返回结果，不影响其他节。
+
+    Args:
+        self: CeleryTask实例
+        agent_params: 文档所属节: 文档节内容ID 的字典。 (str -> uuid_str),
+        section: 审查的节, SectionType 的值
+        for_section: 审查使用的智能体, ForSection 的值
+
+    Returns:
+        SectionReviewResult 的字典
+    """
+
+    last_try = self.request.retries >= self.max_retries
+
+    try:
+        result = review_one_section(
+            agent_params,
+            SectionType(section),
+            ForSection(for_section),
+            reraise=not last_try,
+        )
+    except Exception as e:
+        if not last_try:
+            logger.warning(f"【{for_section}】审查失败, 第{self.request.retries + 1}次重试: {e}")
+            raise self.retry(exc=e)
+
+        # 重试次数用完后(包括审查前加载内容、提交结果时的异常)不再抛出，
+        # 返回审查异常的结果，保证 chord 的回调(finish_review_by_agent)总是执行
+        msg = f"【{for_section}】审查异常, 重试次数已用完, 错误: {review_err(str(e))}"
+        logger.exception(msg)
+
+        result = failed_section_result(
+            SectionType(section), ForSection(for_section), msg
+        )
+
+    return result._asdict()
+
+
+@celery_app.task(bind=True)
+def finish_review_by_agent(
+    self: Task,  # noqa: ARG001
+    section_results: list[dict],
+    agent_params: dict[str, str],
+    *,
+    proj_name: str,  # noqa: ARG001
+    proj_version: int,  # noqa: ARG001
+    proj_type: str,  # noqa: ARG001
+    proj_id: str,  # noqa: ARG001
+) -> str:
+    """chord 的回调: 所有节的子任务完成后，汇总建议并更新文档/项目的审查状态
+
+    Args:
+        self: CeleryTask实例
+        section_results: 各个子任务(review_section_by_agent)返回的结果
+        agent_params: 文档所属节: 文档节内容ID 的字典。 (str -> uuid_str),
+        proj_name: 项目名称
+        proj_version: 第几次提交
+        proj_type: 项目类型
+        proj_id: 项目ID, uuid_str
+    """
+
+    process_msgs: list[str] = []
 
-    process_msgs = []
+    results = [
+        SectionReviewResult(
+            section=SectionType(res["section"]),
+            for_section=ForSection(res["for_section"]),
+            review_pass=res["review_pass"],
+            raised_error=res["raised_error"],
+            process_msgs=res["process_msgs"],
+        )
+        for res in section_results
+    ]
 
     with Session(engine) as session:
-        # 少解析到的section
-        miss_sections = std_all_sections - found_sections
+        project, doc_all_content, miss_section_suggestion, _process_msgs = (
+            begin_review(session, agent_params)
+        )
+        process_msgs.extend(_process_msgs)
 
-        all_doc_content_id = uuid.UUID(agent_params[SectionType.all.value])
-        doc_all_content = session.get(DocumentContent, all_doc_content_id)
+        _, _process_msgs = build_review_jobs(
+            agent_params, project.name, project.version
+        )
+        process_msgs.extend(_process_msgs)
+
+        for result in results:
+            process_msgs.extend(result.process_msgs)
+
+        finish_review(
+            session,
+            project,
+            doc_all_content,
+            agent_params,
+            results,
+            miss_section_suggestion=miss_section_suggestion,
+        )
 
-        assert doc_all_content is not None, "获取文档内容失败"
+    # 记录一下，将来在页面中好搜索
+    msg = f"项目:【{project.name}】【第{project.version}次提交】审查完成."
+    process_msgs.append(f"{cur_time()} - {msg}")
+    logger.info(msg)
 
-        project = session.get(Project, doc_all_content.proj_id)
-        if not project:
-            msg = f"项目:【{doc_all_content.proj_id}】 不存在，无法审查."
-            raise ValueError(msg)
-        else:
-            # 记录一下
-            msg = f"项目:【{project.name}】【第{project.version}次提交】开始审查..."
-            process_msgs.append(f"{cur_time()} - {msg}")
-            logger.info(msg)
+    return "\n".join(process_msgs)
 
-        # 是否发生过的异常 或 提取章节失败
-        review_raised_error: bool = False
-        missed_section: bool = False
-        miss_section_suggestion = ""
 
-        # 缺少相关的节，直接返回
-        if miss_sections:
-            missed_section = True
+def dispatch_review_by_agent(
+    agent_params: dict[str, str],
+    *,
+    proj_name: str,
+    proj_version: int,
+    proj_type: str,
+    proj_id: str,
+    task_id: str | None = None,
+) -> AsyncResult:
+    """发送agent审查文档的celery任务
 
-            # 这里会更新project 的 suggestion
-            miss_section_suggestion = suggestion_by_miss_section(
-                session, doc_all_content, miss_sections
-            )
+    `AGENT_REVIEW_USE_CHORD` 开启时，每节的每个智能体(ForSection)作为一个子任务并行审查，
+    所有子任务完成后由 finish_review_by_agent 汇总; 否则由单个 review_by_agent 任务审查整个文档。
+
+    task_id: 汇总审查结果的任务的ID, 为None时由celery生成
+
+    Returns:
+        汇总审查结果的任务(finish_review_by_agent 或 review_by_agent)的 AsyncResult
+    """
+
+    kwargs = {
+        "proj_name": proj_name,
+        "proj_version": proj_version,
+        "proj_type": proj_type,
+        "proj_id": proj_id,
+    }
+
+    if not settings.AGENT_REVIEW_USE_CHORD:
+        return review_by_agent.apply_async(  # type: ignore
+            (agent_params,), kwargs, task_id=task_id
+        )
+
+    review_jobs, _ = build_review_jobs(agent_params, proj_name, proj_version)
+
+    header = group(
+        review_section_by_agent.s(  # type: ignore
+            agent_params, section=section.value, for_section=for_section.value
+        )
+        for section, for_section in review_jobs
+    )
+    callback = finish_review_by_agent.s(agent_params, **kwargs)  # type: ignore
+
+    return chord(header, callback).apply_async(task_id=task_id)
+
+
+def begin_review(
+    session: Session, agent_params: dict[str, str]
+) -> tuple[Project, DocumentContent, str, list[str]]:
+    """获取审查的项目和文档内容，并处理缺少的节
+
+    Returns:
+        4个值的元祖，分别代表:
+
+        - 项目
+        - 文档全部内容
+        - 缺少节时的建议, 不缺少时为空字符串
+        - 处理过程的消息
+    """
+
+    process_msgs: list[str] = []
+
+    found_sections = {SectionType(value) for value in agent_params.keys()}
+
+    # 少解析到的section
+    miss_sections = std_all_sections - found_sections
+
+    all_doc_content_id = uuid.UUID(agent_params[SectionType.all.value])
+    doc_all_content = session.get(DocumentContent, all_doc_content_id)
+
+    assert doc_all_content is not None, "获取文档内容失败"
+
+    project = session.get(Project, doc_all_content.proj_id)
+    if not project:
+        msg = f"项目:【{doc_all_content.proj_id}】 不存在，无法审查."
+        raise ValueError(msg)
+    else:
+        # 记录一下
+        msg = f"项目:【{project.name}】【第{project.version}次提交】开始审查..."
+        process_msgs.append(f"{cur_time()} - {msg}")
+        logger.info(msg)
+
+    miss_section_suggestion = ""
+
+    # 缺少相关的节，直接返回
+    if miss_sections:
+        # 这里会更新project 的 suggestion
+        miss_section_suggestion = suggestion_by_miss_section(
+            session, doc_all_content, miss_sections
+        )
 
-            # 记录一下
-            msg = f"项目:【{project.name}】【第{project.version}次提交】的 {review_err('标题不规范，部分内容提取失败')}，将进行【有限审查】..."
+        # 记录一下
+        msg = f"项目:【{project.name}】【第{project.version}次提交】的 {review_err('标题不规范，部分内容提取失败')}，将进行【有限审查】..."
+        process_msgs.append(f"{cur_time()} - {msg}")
+        logger.info(msg)
+
+    return project, doc_all_content, miss_section_suggestion, process_msgs
+
+
+def build_review_jobs(
+    agent_params: dict[str, str], proj_name: str, proj_version: int
+) -> tuple[list[tuple[SectionType, ForSection]], list[str]]:
+    """构建待审查的 (节, 智能体) 列表，按节的顺序
+
+    Returns:
+        待审查的 (节, 智能体) 列表, 以及处理过程的消息
+    """
+
+    process_msgs: list[str] = []
+    review_jobs: list[tuple[SectionType, ForSection]] = []
+
+    for title, stype in SectionTitleTypeMap.items():
+        if not agent_params.get(stype.value):
+            msg = f"项目:【{proj_name}】【第{proj_version}次提交】中【{title}】的{review_err('内容提取失败')}，无法审查."
             process_msgs.append(f"{cur_time()} - {msg}")
-            logger.info(msg)
+            logger.warning(msg)
+            continue
 
-        # 构建节和内容的映射
-        dcontent_map: dict[SectionType, DocumentContent] = {}
-        for title, doc_id in agent_params.items():
-            _dcontent = session.get(DocumentContent, uuid.UUID(doc_id))
-            assert _dcontent is not None
-            dcontent_map[SectionType(title)] = _dcontent
-
-        completed_doc_contents: list[DocumentContent] = []
-
-        review_proj_type_map = {
-            ProjectTypeEnum.TRNAS: AgentType.transmission,
-            ProjectTypeEnum.DISTRIBUTION: AgentType.distribute,
-            ProjectTypeEnum.SUBSTATION: AgentType.substation,
-        }
-
-        review_section_map: dict[SectionType, ForSection | tuple[ForSection, ...]] = {
-            SectionType.one: ForSection.one,
-            SectionType.two: ForSection.two,
-            SectionType.three: ForSection.three,
-            SectionType.four: ForSection.four,
-            SectionType.five: ForSection.five,
-            SectionType.six: ForSection.six,
-            # 第七节单独审核4次
-            SectionType.seven: (
-                ForSection.sevenone,
-                ForSection.seventwo,
-                ForSection.seventhree,
-                ForSection.sevenfour,
-            ),
-            SectionType.eight: ForSection.eight,
-            SectionType.nine: ForSection.nine,
-            SectionType.ten: ForSection.ten,
-        }
-
-        review_section_total: int = 0
-        review_pass_count: int = 0
-
-        for title, stype in SectionTitleTypeMap.items():
-            logger.info(f"审查 【{title}】部分的内容....")
-            doc_content_id_str = agent_params.get(stype.value)
-
-            if not doc_content_id_str:
-                msg = f"项目:【{project.name}】【第{project.version}次提交】中【{title}】的{review_err('内容提取失败')}，无法审查."
-                process_msgs.append(f"{cur_time()} - {msg}")
-                logger.warning(msg)
-                continue
+        review_jobs.extend(
+            (stype, for_section) for for_section in REVIEW_SECTION_MAP[stype]
+        )
 
-            doc_content = dcontent_map[stype]
+    return review_jobs, process_msgs
 
-            if not doc_content:
-                msg = f"项目:【{project.name}】【第{project.version}次提交】中【{title}：{doc_content.id}】的{review_err('内容提取失败')}，无法审查."
-                process_msgs.append(f"{cur_time()} - {msg}")
-                logger.warning(msg)
-                continue
 
-            review_proj_type = review_proj_type_map[doc_content.project.type]
-            review_section = review_section_map[doc_content.section]
+def run_section_reviews(
+    agent_params: dict[str, str],
+    review_jobs: list[tuple[SectionType, ForSection]],
+) -> list[SectionReviewResult]:
+    """审查各节，返回的结果与 review_jobs 的顺序一致
+
+    并发时按 `AGENT_REVIEW_ENGINE` 配置，在同一个事件循环中(asyncio)，
+    或在独立的线程和数据库会话中(thread)执行每个审查，
+    对智能体的请求数量和频率由 `app.tasks.limiter` 限制。
+    """
+
+    if not settings.AGENT_REVIEW_CONCURRENT or len(review_jobs) <= 1:
+        results: list[SectionReviewResult] = []
 
+        for section, for_section in review_jobs:
             try:
-                review_pass: bool = False
-                if isinstance(review_section, tuple):
-                    err_msg = ""
-                    for _review_section in review_section:
-                        msg = f"项目:【{project.name}】【第{project.version}次提交】的【{_review_section.value}】开始审查."
-                        process_msgs.append(f"{cur_time()} - {msg}")
-                        logger.info(msg)
-
-                        review_section_total += 1
-
-                        _, _err_msg, review_pass = request_remote_agent(
-                            session,
-                            project,
-                            doc_content,
-                            dcontent_map,
-                            review_proj_type,
-                            _review_section,
-                        )
-
-                        err_msg += _err_msg
-                else:
-                    msg = f"项目:【{project.name}】【第{project.version}次提交】的【{review_section.value}】开始审查."
-                    process_msgs.append(f"{cur_time()} - {msg}")
-                    logger.info(msg)
-
-                    review_section_total += 1
-
-                    _, err_msg, review_pass = request_remote_agent(
-                        session,
-                        project,
-                        doc_content,
-                        dcontent_map,
-                        review_proj_type,
-                        review_section,
-                    )
-
-                if err_msg:
-                    review_raised_error = True
-                    msg = f"项目:【{project.name}】【第{project.version}次提交】的【{doc_content.section.value}】agent 审查异常, 错误: {review_err(err_msg)}"
-                    process_msgs.append(f"{cur_time()} - {msg}")
-                    logger.info(msg)
-
-                if review_pass:
-                    review_pass_count += 1
+                results.append(review_one_section(agent_params, section, for_section))
+            except Exception as e:
+                results.append(section_error_result(section, for_section, e))
+
+        return results
+
+    if settings.AGENT_REVIEW_ENGINE == "asyncio":
+        from app.tasks.async_reviews import async_run_section_reviews
+
+        return asyncio.run(async_run_section_reviews(agent_params, review_jobs))
 
+    max_workers = min(settings.AGENT_REVIEW_MAX_WORKERS, len(review_jobs))
+
+    with ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="agent-review"
+    ) as executor:
+        futures = [
+            executor.submit(review_one_section, agent_params, section, for_section)
+            for section, for_section in review_jobs
+        ]
+
+        results = []
+
+        # 单个节的异常不影响其他节, 保证之后汇总审查结果(finish_review)
+        for (section, for_section), future in zip(review_jobs, futures, strict=True):
+            try:
+                results.append(future.result())
             except Exception as e:
-                msg = f"项目:【{project.name}】【第{project.version}次提交】的【{doc_content.section.value}】审查异常, 错误: {review_err(str(e))}"
-                process_msgs.append(f"{cur_time()} - {msg}")
-                logger.exception(msg)
+                results.append(section_error_result(section, for_section, e))
+
+        return results
+
+
+def section_error_result(
+    section: SectionType, for_section: ForSection, error: BaseException
+) -> SectionReviewResult:
+    """记录并转换审查某节时抛出的异常"""
+
+    msg = f"【{for_section.value}】审查异常, 错误: {review_err(str(error))}"
+    logger.opt(exception=error).error(msg)
+
+    return failed_section_result(section, for_section, msg)
+
+
+def load_dcontent_map(
+    session: Session, agent_params: dict[str, str]
+) -> dict[SectionType, DocumentContent]:
+    """构建节和内容的映射"""
+
+    dcontent_ids = [uuid.UUID(doc_id) for doc_id in agent_params.values()]
+
+    statement = select(DocumentContent).where(
+        col(DocumentContent.id).in_(dcontent_ids)
+    )
+    dcontents = {dc.id: dc for dc in session.exec(statement).all()}
+
+    dcontent_map: dict[SectionType, DocumentContent] = {}
+    for title, doc_id in agent_params.items():
+        _dcontent = dcontents.get(uuid.UUID(doc_id))
+        assert _dcontent is not None
+        dcontent_map[SectionType(title)] = _dcontent
+
+    return dcontent_map
+
+
+def review_one_section(
+    agent_params: dict[str, str],
+    section: SectionType,
+    for_section: ForSection,
+    *,
+    reraise: bool = False,
+) -> SectionReviewResult:
+    """使用独立的数据库会话，调用某个智能体审查某节的内容
+
+    Args:
+        agent_params: 文档所属节: 文档节内容ID 的字典。 (str -> uuid_str),
+        section: 审查的节
+        for_section: 审查使用的智能体
+        reraise: 审查异常时是否直接抛出(用于celery任务重试)，否则记录异常到该节的建议中
+    """
+
+    process_msgs: list[str] = []
+    review_pass = False
+    raised_error = False
+
+    with Session(engine) as session:
+        # 加载失败时没有项目的信息
+        doc_content: DocumentContent | None = None
+        proj_label = f"【{for_section.value}】"
+        proj_id: uuid.UUID | None = None
 
-                doc_content.suggestion = f"审查异常: {review_err(str(e))}"
-                session.add(doc_content)
-                session.commit()
-                session.refresh(doc_content)
+        try:
+            dcontent_map = load_dcontent_map(session, agent_params)
+            doc_content = dcontent_map[section]
+            project = doc_content.project
 
-                # 继续审查， 不过要标识发生过错误，表示【算法审查失败】！
-                review_raised_error = True
+            review_proj_type = REVIEW_PROJ_TYPE_MAP[project.type]
 
-            # 记录一下，将来在页面中好搜索
-            msg = f"项目:【{project.name}】【第{project.version}次提交】的【{doc_content.section.value}】审查完成."
+            # 提交后对象的属性会过期，提前取出日志和缓存失效使用的值
+            proj_label = f"项目:【{project.name}】【第{project.version}次提交】的【{for_section.value}】"
+            proj_id = project.id
+
+            msg = f"{proj_label}开始审查."
             process_msgs.append(f"{cur_time()} - {msg}")
             logger.info(msg)
 
-            completed_doc_contents.append(doc_content)
+            _, err_msg, review_pass = request_remote_agent(
+                session,
+                project,
+                doc_content,
+                dcontent_map,
+                review_proj_type,
+                for_section,
+            )
 
-            # 每节审查后，暂停2秒
-            time.sleep(2)
+            if err_msg:
+                raised_error = True
+                msg = f"{proj_label}agent 审查异常, 错误: {review_err(err_msg)}"
+                process_msgs.append(f"{cur_time()} - {msg}")
+                logger.info(msg)
 
-        # 根据完成的内容审查，生成一个针对该文档的概述。同时同步到项目的审查结果（建议）。
-        content_suggestions: list[str] = []
-        for content in completed_doc_contents:
-            content_suggestions.append(
-                f"# {content.section}"
-            )  # 添加节标题，markdown格式
-            content_suggestions.append(content.suggestion)
+        except Exception as e:
+            if reraise:
+                raise
+
+            msg = f"{proj_label}审查异常, 错误: {review_err(str(e))}"
+            process_msgs.append(f"{cur_time()} - {msg}")
+            logger.exception(msg)
+
+            if doc_content is not None:
+                save_section_error(
+                    session, doc_content, f"审查异常: {review_err(str(e))}"
+                )
+
+            # 继续审查， 不过要标识发生过错误，表示【算法审查失败】！
+            raised_error = True
+
+        # 记录一下，将来在页面中好搜索
+        msg = f"{proj_label}审查完成."
+        process_msgs.append(f"{cur_time()} - {msg}")
+        logger.info(msg)
+
+        # 该节的建议已变化
+        if proj_id is not None:
+            invalidate_response_cache(project_tag(proj_id))
+
+    return SectionReviewResult(
+        section=section,
+        for_section=for_section,
+        review_pass=review_pass,
+        raised_error=raised_error,
+        process_msgs=process_msgs,
+    )
 
-        combined_suggestion = combine_ai_suggestion(session, content_suggestions)
 
-        # 同步文档整体内容的建议
-        # 合并缺失节的建议
-        review_suggestion = combined_suggestion
-        if miss_section_suggestion:
-            review_suggestion = f"{miss_section_suggestion}\n{combined_suggestion}"
+def save_section_error(
+    session: Session, doc_content: DocumentContent, suggestion: str
+) -> None:
+    """审查异常时，记录异常到该节的建议中
 
-        doc_all_content.suggestion = review_suggestion
-        session.add(doc_all_content)
-        session.commit()
-        session.refresh(doc_all_content)
-
-        # 同步项目的该版本的文档的建议
-        review_status = ReviewStatus.AI_REVIEW_PASSED
-        review_percent = 80
-
-        # 缺少节
-        # 审查抛出过异常
-        # 审核通过的节数量 小于 审核的总节数量
-        # 则 审核未通过
-        if (
-            missed_section
-            or review_raised_error
-            or review_pass_count < review_section_total
-        ):
-            review_percent = 60
-            review_status = ReviewStatus.AI_REVIEW_NOTPASS
-
-        document = doc_all_content.document
-        document.review_suggestion = review_suggestion
-        document.review_done_at = datetime.now()
-        document.review_percent = review_percent
-        document.review_status = review_status
-
-        session.add(document)
-        session.commit()
-        session.refresh(document)
+    先回滚未完成的事务(异常可能来自失败的flush/提交), 记录失败时只写日志。
+    """
 
-        # 同步项目的整体建议
-        project.review_suggestion = review_suggestion
-        project.review_done_at = datetime.now()
-        project.review_percent = review_percent
-        project.review_status = review_status
+    session.rollback()
 
-        session.add(project)
+    try:
+        doc_content.suggestion = suggestion
+        session.add(doc_content)
         session.commit()
-        session.refresh(project)
 
-    # 记录一下，将来在页面中好搜索
-    msg = f"项目:【{project.name}】【第{project.version}次提交】审查完成."
-    process_msgs.append(f"{cur_time()} - {msg}")
-    logger.info(msg)
+    except Exception:
+        session.rollback()
+        logger.exception(f"记录审查异常到该节的建议中失败: {suggestion}")
 
-    return "\n".join(process_msgs)
+
+def finish_review(
+    session: Session,
+    project: Project,
+    doc_all_content: DocumentContent,
+    agent_params: dict[str, str],
+    results: list[SectionReviewResult],
+    *,
+    miss_section_suggestion: str = "",
+) -> None:
+    """所有节审查完成后，汇总建议并更新文档和项目的审查状态"""
+
+    review_section_total = len(results)
+    review_pass_count = sum(1 for result in results if result.review_pass)
+    review_raised_error = any(result.raised_error for result in results)
+
+    # 审查完成的节，按节的顺序
+    completed_sections = list(dict.fromkeys(result.section for result in results))
+    dcontent_map = load_dcontent_map(session, agent_params)
+
+    # 根据完成的内容审查，生成一个针对该文档的概述。同时同步到项目的审查结果（建议）。
+    content_suggestions: list[str] = []
+    for section in completed_sections:
+        content = dcontent_map[section]
+        content_suggestions.append(
+            f"# {content.section}"
+        )  # 添加节标题，markdown格式
+        content_suggestions.append(content.suggestion)
+
+    combined_suggestion = combine_ai_suggestion(session, content_suggestions)
+
+    # 同步文档整体内容的建议
+    # 合并缺失节的建议
+    review_suggestion = combined_suggestion
+    if miss_section_suggestion:
+        review_suggestion = f"{miss_section_suggestion}\n{combined_suggestion}"
+
+    doc_all_content.suggestion = review_suggestion
+    session.add(doc_all_content)
+
+    # 同步项目的该版本的文档的建议
+    review_status = ReviewStatus.AI_REVIEW_PASSED
+    review_percent = 80
+
+    # 缺少节
+    # 审查抛出过异常
+    # 审核通过的节数量 小于 审核的总节数量
+    # 则 审核未通过
+    if (
+        miss_section_suggestion
+        or review_raised_error
+        or review_pass_count < review_section_total
+    ):
+        review_percent = 60
+        review_status = ReviewStatus.AI_REVIEW_NOTPASS
+
+    document = doc_all_content.document
+    document.review_suggestion = review_suggestion
+    document.review_done_at = datetime.now()
+    document.review_percent = review_percent
+    document.review_status = review_status
+
+    session.add(document)
+
+    # 审查前项目被统计的日期(开始审查的日期)
+    stat_days = project_stat_days(project)
+
+    # 同步项目的整体建议
+    project.review_suggestion = review_suggestion
+    project.review_done_at = datetime.now()
+    project.review_percent = review_percent
+    project.review_status = review_status
+
+    session.add(project)
+    session.commit()
+    session.refresh(project)
+
+    # 项目的审核状态、审查中产生的问题/建议
+    refresh_analysis_stats(stat_days | project_stat_days(project) | {date.today()})
+    invalidate_response_cache(project_tag(project.id))
 
 
 def suggestion_by_miss_section(
@@ -367,6 +768,8 @@ def suggestion_by_miss_section(
 
     session.commit()
 
+    invalidate_response_cache(project_tag(dcontent.proj_id))
+
     return suggestion
 
 
@@ -387,6 +790,63 @@ def request_remote_agent(
     Args:
         dcontent: 文档内容对象。
     """
+
+    agent_request, err_msg, review_pass = prepare_agent_request(
+        session, proj, dcontent, dcontent_map, review_proj_type, review_section
+    )
+
+    if agent_request is None:
+        return dcontent, err_msg, review_pass
+
+    # 输入与之前版本的审查相同时，直接复用之前的审查结果
+    review_hash = build_review_hash(review_section, agent_request)
+    prior_result = reuse_prior_review(session, dcontent, review_section, review_hash)
+
+    if prior_result is not None:
+        session.commit()
+
+        err_msg, review_pass = prior_result
+        return dcontent, err_msg, review_pass
+
+    # 该message应为agent返回的文本, 从该文本中extract 问题/建议详细
+    # agent_resp = post_agent_api(agent_setting, dcontent.suggestion)
+    # 限制同一个智能体的并发数和请求频率，代替每节审查后固定的暂停
+    with get_agent_limiter(agent_request.agent_setting).limit():
+        agent_resp = post_agent_api(
+            agent_request.agent_setting,
+            agent_request.message,
+            attachment=agent_request.attachment,
+        )
+
+    # 问题/建议详细、该节的建议以及审查记录在1个事务中提交
+    err_msg, review_pass = save_agent_review(
+        session, dcontent, review_section, agent_resp
+    )
+    record_section_review(
+        session, dcontent, review_section, review_hash, err_msg, review_pass
+    )
+    session.commit()
+
+    return dcontent, err_msg, review_pass
+
+
+def prepare_agent_request(
+    session: Session,
+    proj: Project,
+    dcontent: DocumentContent,
+    dcontent_map: dict[SectionType, DocumentContent],
+    review_proj_type: AgentType,
+    review_section: ForSection,
+) -> tuple[AgentReviewRequest | None, str, bool]:
+    """获取agent的配置，并构造agent需要的参数
+
+    Returns:
+        3个值的元祖，分别代表:
+
+        - 请求智能体的参数, 不需要请求智能体时为None
+        - 不需要请求时, 审查的错误信息
+        - 不需要请求时, 是否审查通过
+    """
     logger.info(
         f"审查【{proj.name}({proj.version})】的【{dcontent.section.value}】 部分中..."
     )
@@ -408,7 +868,7 @@ def request_remote_agent(
         session.commit()
         session.refresh(dcontent)
 
-        return dcontent, "", True
+        return None, "", True
 
     # 构造有上下文的请求消息
     related_sections = SectionContextRelated[dcontent.section]
@@ -420,7 +880,7 @@ def request_remote_agent(
             _err_msg = f"【{dcontent.section.value}】节审查，依赖的相关节 【{r_section.value}】获取失败, 无法审查！！"
             err_msgs.append(_err_msg)
 
-            return dcontent, ";".join(err_msgs), False
+            return None, ";".join(err_msgs), False
 
         context_messages.append(dcontent_map[r_section].content)
 
@@ -439,14 +899,34 @@ def request_remote_agent(
             f"【{dcontent.project.type.name}】-【{dcontent.section.name}】的智能体尚未支持审查或未启用！"
         )
 
-        return dcontent, ";".join(err_msgs), True
+        return None, ";".join(err_msgs), True
 
-    # 该message应为agent返回的文本, 从该文本中extract 问题/建议详细
-    # agent_resp = post_agent_api(agent_setting, dcontent.suggestion)
-    agent_resp = post_agent_api(
-        agent_setting, contexted_message_json_str, attachment=attachment
+    return (
+        AgentReviewRequest(
+            agent_setting=agent_setting,
+            message=contexted_message_json_str,
+            attachment=attachment,
+        ),
+        "",
+        False,
     )
 
+
+def save_agent_review(
+    session: Session,
+    dcontent: DocumentContent,
+    review_section: ForSection,
+    agent_resp: AgentResponseModel,
+) -> tuple[str, bool]:
+    """解析agent的返回结果，并保存问题/建议详细
+
+    Returns:
+        审查的错误信息, 以及是否审查通过
+    """
+
+    # 审查该节过程中产生的错误:
+    err_msgs: list[str] = []
+
     # 实际返回的json字符串总会包含在 ```json xxx ``` 块中，所以需要替换，然后json.loads
     resp_text, err_msg = get_agent_resp_text(agent_resp)
     if err_msg:
@@ -457,7 +937,7 @@ def request_remote_agent(
 
     # 该节审查通过，则直接返回
     if REVIEW_PASS_TEXT in resp_text:
-        return dcontent, REVIEW_PASS_TEXT, True
+        return REVIEW_PASS_TEXT, True
 
     # 实际格式如:
     # [
@@ -496,6 +976,8 @@ def request_remote_agent(
     # feedbacks = random.choices(
     #     mock_section_feedbacks[dcontent.section], k=random.randint(1, 10)
     # )
+    reviews: list[DocumentContentReview] = []
+
     for feedback in feedbacks:
         review = DocumentContentReview(
             iscuser_id=dcontent.iscuser_id,
@@ -504,6 +986,7 @@ def request_remote_agent(
             doc_id=dcontent.doc_id,
             content_id=dcontent.id,
             section=dcontent.section,
+            for_section=review_section,
             question=feedback.get("risk_type"),  # 问题详细
             question_tag=feedback.get("risk_type_class"),  # 问题标签
             feedback=feedback.get("modification_suggestion"),  # 建议反馈详细内容
@@ -517,11 +1000,156 @@ def request_remote_agent(
             source_location=feedback.get("project_source_location"),  # 原文内容位置
             ai_error=feedback.get("ai_error"),
         )
+        reviews.append(review)
 
-        session.add(review)
-        session.commit()
+    bulk_insert_content_reviews(session, dcontent, reviews)
+
+    return ";".join(err_msgs), False
 
-    return dcontent, ";".join(err_msgs), False
+
+def build_review_hash(
+    review_section: ForSection, agent_request: AgentReviewRequest
+) -> str:
+    """请求智能体的全部输入的摘要(sha256), 用于增量审查
+
+    包括该节及依赖节的内容、附件内容，以及智能体的编码、版本、审核风险分类和引用文件分类。
+    """
+
+    agent_setting = agent_request.agent_setting
+
+    review_input = {
+        "for_section": review_section.value,
+        "message": agent_request.message,
+        "attachment": agent_request.attachment,
+        "agent_code": agent_setting.agent_code,
+        "agent_version": agent_setting.agent_version,
+        "risk_types": agent_setting.risk_types,
+        "ref_docs": agent_setting.ref_docs,
+    }
+    review_input_json = json.dumps(review_input, ensure_ascii=False, sort_keys=True)
+
+    return hashlib.sha256(review_input_json.encode()).hexdigest()
+
+
+def reuse_prior_review(
+    session: Session,
+    dcontent: DocumentContent,
+    review_section: ForSection,
+    review_hash: str,
+) -> tuple[str, bool] | None:
+    """复用该项目之前版本中输入相同的审查结果
+
+    复制之前的问题/建议详细和该节的建议到当前版本，并记录当前版本的审查。
+    `AGENT_REVIEW_INCREMENTAL` 关闭或没有可复用的审查时返回None。
+
+    Returns:
+        审查的错误信息, 以及是否审查通过
+    """
+
+    if not settings.AGENT_REVIEW_INCREMENTAL:
+        return None
+
+    statement = (
+        select(DocumentSectionReview)
+        .where(
+            DocumentSectionReview.proj_id == dcontent.proj_id,
+            DocumentSectionReview.proj_version < dcontent.proj_version,
+            DocumentSectionReview.for_section == review_section,
+            DocumentSectionReview.review_hash == review_hash,
+            DocumentSectionReview.is_delete == False,  # noqa: E712
+        )
+        .order_by(desc(DocumentSectionReview.proj_version))
+    )
+    prior = session.exec(statement).first()
+
+    if prior is None:
+        return None
+
+    logger.info(
+        f"【{dcontent.section.value}】的【{review_section.value}】与第{prior.proj_version}次提交的审查输入相同，复用其审查结果"
+    )
+
+    statement1 = select(DocumentContentReview).where(
+        DocumentContentReview.content_id == prior.content_id,
+        DocumentContentReview.for_section == review_section,
+        DocumentContentReview.is_delete == False,  # noqa: E712
+    )
+
+    reviews = [
+        DocumentContentReview.model_validate(
+            prior_review.model_dump(exclude={"id", "create_at", "update_at"}),
+            update={
+                "iscuser_id": dcontent.iscuser_id,
+                "proj_version": dcontent.proj_version,
+                "doc_id": dcontent.doc_id,
+                "content_id": dcontent.id,
+            },
+        )
+        for prior_review in session.exec(statement1).all()
+    ]
+
+    prior_content = session.get(DocumentContent, prior.content_id)
+
+    if prior_content is not None and prior_content.suggestion:
+        dcontent.suggestion = prior_content.suggestion
+
+    bulk_insert_content_reviews(session, dcontent, reviews)
+
+    record_section_review(
+        session, dcontent, review_section, review_hash, prior.err_msg, prior.review_pass
+    )
+
+    return prior.err_msg, prior.review_pass
+
+
+def record_section_review(
+    session: Session,
+    dcontent: DocumentContent,
+    review_section: ForSection,
+    review_hash: str,
+    err_msg: str,
+    review_pass: bool,
+) -> None:
+    """记录某节的某个智能体的审查，供之后的版本复用
+
+    审查出错(有错误信息且未通过)时不记录，之后的版本重新审查。
+    """
+
+    if err_msg and not review_pass:
+        return
+
+    section_review = DocumentSectionReview(
+        proj_id=dcontent.proj_id,
+        proj_version=dcontent.proj_version,
+        content_id=dcontent.id,
+        section=dcontent.section,
+        for_section=review_section,
+        review_hash=review_hash,
+        review_pass=review_pass,
+        err_msg=err_msg,
+    )
+
+    session.add(section_review)
+
+
+def bulk_insert_content_reviews(
+    session: Session,
+    dcontent: DocumentContent,
+    reviews: list[DocumentContentReview],
+) -> None:
+    """批量写入某节的问题/建议详细, 由调用者提交
+
+    所有条目用1条 INSERT 语句(executemany)写入，不逐条 add/commit;
+    该节内容(如建议)的修改也加入当前会话，与问题/建议详细在同一个事务中提交。
+    """
+
+    if reviews:
+        session.exec(
+            insert(DocumentContentReview),  # type: ignore
+            params=[review.model_dump() for review in reviews],
+        )
+
+    session.add(dcontent)
 
 
 def get_attachment_from_db(session: Session, proj: Project) -> dict[str, str]:
@@ -601,10 +1229,14 @@ def post_agent_api(
     attachment: dict | None = None,
     is_chat: bool = False,
 ) -> AgentResponseModel:
-    """请求智能体接口并返回结果"""
+    """请求智能体接口并返回结果, 超时时间为 `AGENT_RUN_TIMEOUT`"""
 
     url, headers, payload, session_id, resp = post_agent_api_core(
-        agent_setting, _message, attachment=attachment, is_chat=is_chat
+        agent_setting,
+        _message,
+        attachment=attachment,
+        is_chat=is_chat,
+        timeout=settings.AGENT_RUN_TIMEOUT,
     )
 
     logger.info(f"调用agent 返回: {resp.text = }")
@@ -615,7 +1247,7 @@ def post_agent_api(
     return parse_agent_raw_rasp(resp)
 
 
-def parse_agent_raw_rasp(resp: RequestsResponse) -> AgentResponseModel:
+def parse_agent_raw_rasp(resp: RequestsResponse | httpx.Response) -> AgentResponseModel:
     agent_resp = AgentResponseModel.model_validate(resp.json())
 
     if not agent_resp.success:
@@ -659,20 +1291,57 @@ def post_agent_api_core(
         - 请求的响应，resp
     """
 
-    if attachment is None:
-        attachment = {}
-
     url = settings.build_agent_api(
         agent_setting.protocol, agent_setting.host, agent_setting.port
     )
 
-    headers = {
-        "Authorization": f"Bearer {agent_setting.app_key}",
-        "Content-Type": "application/json",
-    }
+    headers = build_agent_headers(agent_setting)
 
     # 创建1个新的session, 用于当前请求，防止上一个session_id执行超时后，影响后面的请求。
-    new_session_id = create_agent_session(agent_setting)
+    # 启用session池时，复用已清理过的session
+    session_pool = get_agent_session_pool(agent_setting)
+    if session_pool is not None:
+        new_session_id = session_pool.acquire(agent_setting)
+    else:
+        new_session_id = create_agent_session(agent_setting)
+
+    payload = build_agent_run_payload(
+        agent_setting, _message, new_session_id, attachment=attachment, is_chat=is_chat
+    )
+
+    # 请求成功的session才可以放回池中复用
+    reusable = False
+
+    try:
+        resp = get_agent_http_session(agent_setting).post(
+            url, json=payload, headers=headers, timeout=timeout
+        )
+        reusable = resp.status_code == 200
+
+        return url, headers, payload, new_session_id, resp
+
+    finally:
+        if session_pool is not None:
+            session_pool.release(agent_setting, new_session_id, reusable=reusable)
+            logger.info(f"归还agent session_id: {new_session_id} 到session池!")
+        else:
+            clear_agent_session(agent_setting, new_session_id)
+            logger.info(f"清理新创建的agent session_id: {new_session_id} 成功!")
+            delete_agent_session(agent_setting, new_session_id)
+            logger.info(f"删除新创建的agent session_id: {new_session_id} 成功!")
+
+
+def build_agent_run_payload(
+    agent_setting: AgentSetting,
+    _message: str,
+    session_id: str,
+    attachment: dict | None = None,
+    is_chat: bool = False,
+) -> dict:
+    """构造请求智能体(run)接口的json载荷"""
+
+    if attachment is None:
+        attachment = {}
 
     # 封装agent需要的结构, 如果是智能体助手，则不需要。
     if is_chat:
@@ -695,19 +1364,10 @@ def post_agent_api_core(
         )
 
     payload = RunAgentPayload(
-        sessionId=new_session_id, stream=False, message=message
+        sessionId=session_id, stream=False, message=message
     ).model_dump(mode="json")
 
-    try:
-        resp = requests.post(url, json=payload, headers=headers, timeout=timeout)
-
-        return url, headers, payload, new_session_id, resp
-
-    finally:
-        clear_agent_session(agent_setting, new_session_id)
-        logger.info(f"清理新创建的agent session_id: {new_session_id} 成功!")
-        delete_agent_session(agent_setting, new_session_id)
-        logger.info(f"删除新创建的agent session_id: {new_session_id} 成功!")
+    return payload
 
 
 def get_agent_resp_text(agent_resp: AgentResponseModel) -> tuple[str, str]:
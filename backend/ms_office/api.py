@@ -14,10 +14,13 @@ def open_pptx(filename: str | BinaryIO):
     return Presentation(pptx_package, pptx_package.presentation_part)
 
 
-def open_docx(filename: str | BinaryIO):
-    """打开docx文件"""
+def open_docx(filename: str | BinaryIO, lazy_parts: bool = True):
+    """打开docx文件
 
-    docx_package = WordPackage.open(filename)
+    *lazy_parts* 为 True 时图片、嵌入对象等部件的内容在第一次访问时才读取。
+    """
+
+    docx_package = WordPackage.open(filename, lazy_parts)
 
     return WordProcessing(docx_package, docx_package.docx_main_part)
 
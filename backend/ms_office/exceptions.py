@@ -7,3 +7,9 @@ class XfrmNotExistsError(Exception):
     """xfrm 未存在错误"""
 
     ...
+
+
+class RevisionMarkupError(Exception):
+    """文档中存在批注范围或修订(插入、删除)标记"""
+
+    ...
@@ -18,7 +18,7 @@ from typing import (
 from ..descriptor import lazyproperty
 from ..oxml.xsd_types import XSD_ID, XSD_AnyURI
 from ..packuri import PACKAGE_URI, PackURI
-from ..part import PartFactory, SpecificPart
+from ..part import BlobLoader, PartFactory, SpecificPart
 from ..relationship import RelationshipCollection
 from ..utils import (
     DMLPartFinder,
@@ -67,11 +67,13 @@ class PackageBase:
         logger.info("清除OPC包....")
 
     @classmethod
-    def open(cls: type[Self], pkg_file: str | BinaryIO):
+    def open(cls: type[Self], pkg_file: str | BinaryIO, lazy_parts: bool = True):
         """
         返回 |OpcPackage| 实例加载了 *pkg_file* 的内容。
+
+        *lazy_parts* 为 True 时部件的内容(图片、嵌入对象等)在第一次访问时才从 zip 包中读取。
         """
-        pkg_reader = PackageReader.from_file(pkg_file)
+        pkg_reader = PackageReader.from_file(pkg_file, lazy_parts)
         opc_pkg = cls(pkg_reader)
 
         logger.info("解组 opc 包 的 部件")
@@ -114,28 +116,31 @@ class PackageBase:
 
     @staticmethod
     def _walk_parts(
-        rels: RelationshipCollection, parts: list[SpecificPart] = []
+        rels: RelationshipCollection, visited_part_names: set[PackURI] | None = None
     ) -> Generator[SpecificPart, Any, Any]:
         """
         通过执行 rels 图的深度优先遍历，准确生成对包中每个部件的一个引用。
+
+        关系的目标部件是弱引用代理(不可哈希), 以部件名称记录已遍历的部件。
         """
-        visited_parts: list[SpecificPart] = parts or []
+        if visited_part_names is None:
+            visited_part_names = set()
 
         for rel in rels:  # type: ignore
             if rel.is_external:
                 continue
             part = rel.target_part
 
-            if part in visited_parts:
+            if part.part_name in visited_part_names:
                 continue
 
-            visited_parts.append(part)  # type: ignore
+            visited_part_names.add(part.part_name)
 
             yield part  # type: ignore
 
             for part in OpcPackage._walk_parts(
                 part._relationship_collect,
-                visited_parts,  # type: ignore
+                visited_part_names,
             ):
                 yield part
 
@@ -526,7 +531,8 @@ class Unmarshaller:
         pkg_reader: PackageReader,
         opc_pkg: AnyPackage,
         part_factory: Callable[
-            [PackURI, AnyContentType, bytes, bytes | None, bool], SpecificPart
+            [PackURI, AnyContentType, bytes | BlobLoader, bytes | None, bool],
+            SpecificPart,
         ],
     ):
         """
@@ -553,7 +559,8 @@ class Unmarshaller:
     def _unmarshal_parts(
         pkg_reader: PackageReader,
         part_factory: Callable[
-            [PackURI, AnyContentType, bytes, bytes | None, bool], SpecificPart
+            [PackURI, AnyContentType, bytes | BlobLoader, bytes | None, bool],
+            SpecificPart,
         ],
     ):
         """
@@ -573,7 +580,7 @@ class Unmarshaller:
                 spart.part_name,
                 spart.content_type,
                 spart.blob,
-                spart.blob,
+                spart.srels._xml_blob,
                 spart.is_external,
             )
 
@@ -16,7 +16,7 @@ from ..oxml.opc.content_types import CT_Types
 from ..oxml.opc.relationships import CT_Relationship, CT_Relationships, ST_TargetMode
 from ..oxml.xsd_types import XSD_AnyURI
 from ..packuri import PACKAGE_URI, PackURI
-from .zip_pkg import ZipPkgReader
+from .zip_pkg import LazyBlob, ZipPkgReader
 
 logger = logging.getLogger(__name__)
 
@@ -44,9 +44,12 @@ class PackageReader:
         logger.info("清除PackageReade...")
 
     @staticmethod
-    def from_file(pkg_file: str | BinaryIO):
+    def from_file(pkg_file: str | BinaryIO, lazy_parts: bool = True):
         """
         返回 |PackageReader| 实例加载了 *pkg_file* 的内容。
+
+        *lazy_parts* 为 True 时部件只记录 zip 成员名称，第一次访问 blob 时才解压读取，
+        zip 存档保持打开直到所有部件被释放；为 False 时立即读取所有部件的内容并关闭 zip 存档。
         """
         zip_reader = ZipPkgReader(pkg_file)
 
@@ -58,13 +61,16 @@ class PackageReader:
             zip_reader, PACKAGE_URI
         )
         all_parts = PackageReader._load_all_serialized_parts(
-            zip_reader, pkg_srels, pkg_content_type
+            zip_reader, pkg_srels, pkg_content_type, lazy_parts
         )
 
         # logger.info(f"{pkg_srels = }")
         logger.info(f"所有部件数量: {len(all_parts) = }")
 
-        zip_reader.close()
+        # 延迟加载时由部件的 LazyBlob 保持 zip 存档的引用
+        if not lazy_parts:
+            zip_reader.close()
+
         return PackageReader(pkg_content_type, pkg_srels, all_parts)
 
     def iter_serialized_parts(self):
@@ -90,12 +96,15 @@ class PackageReader:
         zip_reader: ZipPkgReader,
         pkg_srels: "SerializedRelationshipCollection",
         content_types: "PackageContentType",
+        lazy_parts: bool = True,
     ):
         """
         返回 | SerializedPart| 的列表 与 *zip_reader* 中的部件相对应的实例可以通过遍历以 *pkg_srels* 开头的关系图来访问。
         """
         sparts: list[SerializedPart] = []
-        part_walker = PackageReader._walk_zip_all_parts(zip_reader, pkg_srels)
+        part_walker = PackageReader._walk_zip_all_parts(
+            zip_reader, pkg_srels, lazy_parts=lazy_parts
+        )
         for part_name, blob, srels, is_external in part_walker:
             # logger.info(f"求部件: {part_name} {part_name.ext} 的内容类型")
             content_type = content_types.get(part_name, "unkonw")
@@ -133,15 +142,20 @@ class PackageReader:
     def _walk_zip_all_parts(
         zip_reader: ZipPkgReader,
         srels: "SerializedRelationshipCollection",
-        visited_part_names: list[PackURI | XSD_AnyURI] | None = None,
+        visited_part_names: set[PackURI | XSD_AnyURI] | None = None,
+        lazy_parts: bool = True,
     ) -> Generator[
-        tuple[PackURI, bytes, "SerializedRelationshipCollection", bool], Any, None
+        tuple[PackURI, bytes | LazyBlob, "SerializedRelationshipCollection", bool],
+        Any,
+        None,
     ]:
         """
         通过遍历以 srels 为根的关系图，为 *zip_reader* 中的每个部件生成一个 3 元组“(partname, blob, srels)”。
+
+        *lazy_parts* 为 True 时 blob 为 |LazyBlob|, 不解压部件的内容。
         """
         if visited_part_names is None:
-            visited_part_names = []
+            visited_part_names = set()
 
         for srel in srels:
             # 外部资源, 继续下一次遍历
@@ -158,7 +172,7 @@ class PackageReader:
             if part_name in visited_part_names:
                 continue
 
-            visited_part_names.append(part_name)
+            visited_part_names.add(part_name)
 
             if not isinstance(part_name, PackURI):
                 # logger.info(f"部件:{part_name} 的类型不是 PackURI, 是外部资源")
@@ -175,8 +189,12 @@ class PackageReader:
                 zip_reader, part_name
             )
 
+            blob: bytes | LazyBlob
             if not srel.is_external and zip_reader.exists(part_name.member_name):
-                blob = zip_reader.blob_for(part_name)
+                if lazy_parts:
+                    blob = zip_reader.lazy_blob_for(part_name)
+                else:
+                    blob = zip_reader.blob_for(part_name)
 
             else:
                 blob = b""
@@ -191,7 +209,7 @@ class PackageReader:
                 srels,
                 is_external,
             ) in PackageReader._walk_zip_all_parts(
-                zip_reader, part_srels, visited_part_names
+                zip_reader, part_srels, visited_part_names, lazy_parts
             ):
                 yield (part_name, blob, srels, is_external)
 
@@ -268,7 +286,7 @@ class SerializedPart(NamedTuple):
 
     part_name: PackURI
     content_type: AnyContentType
-    blob: bytes
+    blob: bytes | LazyBlob
     srels: "SerializedRelationshipCollection"
     is_external: bool
 
@@ -2,7 +2,7 @@
 为 物理 的 OPC 包 提供通用接口， 这里针对 zip 文件
 """
 import logging
-from typing import AnyStr, BinaryIO
+from typing import IO, AnyStr, BinaryIO
 from zipfile import ZIP_DEFLATED, ZipFile
 
 from ..packuri import PackURI
@@ -51,6 +51,18 @@ class ZipPkgReader:
         """
         return self._zipf.read(pack_uri.member_name)
 
+    def open_blob(self, pack_uri: PackURI):
+        """
+        以流的方式打开对应于 *pack_uri* 的成员，读取时才解压，用于流式解析较大的部件。
+        """
+        return self._zipf.open(pack_uri.member_name)
+
+    def lazy_blob_for(self, pack_uri: PackURI):
+        """
+        返回对应于 *pack_uri* 的 |LazyBlob|, 只记录成员名称, 调用时才解压读取。
+        """
+        return LazyBlob(self, pack_uri)
+
     def close(self):
         """
         关闭 zip 存档，释放它正在使用的所有资源。
@@ -77,6 +89,31 @@ class ZipPkgReader:
         return self._zipf.read(member_name)
 
 
+class LazyBlob:
+    """
+    zip 包中某个成员的延迟读取器。
+
+    只保存成员名称和对 |ZipPkgReader| 的引用, 在部件第一次访问 blob 时调用读取(解压)成员的内容，
+    引用保证了在所有部件释放之前 zip 存档不会被关闭。
+    """
+
+    __slots__ = ("_zip_reader", "_pack_uri")
+
+    def __init__(self, zip_reader: ZipPkgReader, pack_uri: PackURI):
+        self._zip_reader = zip_reader
+        self._pack_uri = pack_uri
+
+    def __call__(self) -> bytes:
+        return self._zip_reader.blob_for(self._pack_uri)
+
+    def open(self) -> IO[bytes]:
+        """以流的方式打开成员"""
+        return self._zip_reader.open_blob(self._pack_uri)
+
+    def __repr__(self):
+        return f"<LazyBlob {self._pack_uri.member_name}>"
+
+
 class ZipPkgWriter:
     """
     实现 |PhysPkgWriter| zip 文件 OPC 包的接口。
@@ -1,7 +1,10 @@
 from __future__ import annotations
 
 import logging
+from collections.abc import Callable
+from io import BytesIO
 from typing import (
+    IO,
     Self,
     TypeAlias,
     TypeVar,
@@ -17,19 +20,24 @@ T = TypeVar("T")
 AnyURI = str
 AnyContentType: TypeAlias = str
 
+# 延迟读取部件内容的可调用对象, 比如 zip 包中的 LazyBlob
+BlobLoader: TypeAlias = Callable[[], bytes]
+
 logger = logging.getLogger(__name__)
 
 
 class Part:
     """
     封装部件的基类。 提供通用属性和方法，但旨在在客户端代码中进行子类化以实现特定的部件行为。
+
+    blob 可以是 |BlobLoader|, 此时部件的内容在第一次访问 blob/oxml 时才读取。
     """
 
     def __init__(
         self,
         part_name: PackURI,
         content_type: AnyContentType,
-        blob: bytes = b"",
+        blob: bytes | BlobLoader = b"",
         rels_blob: bytes | None = None,
         is_external: bool = False,
     ):
@@ -37,7 +45,14 @@ class Part:
 
         self._part_name = part_name
         self._content_type = content_type
-        self._blob = blob
+        self._blob_loader: BlobLoader | None = None
+        self._blob_bytes: bytes | None = None
+
+        if callable(blob):
+            self._blob_loader = blob
+        else:
+            self._blob_bytes = blob
+
         self._relationship_collect = RelationshipCollection(
             part_name.baseURI, rels_blob
         )
@@ -49,7 +64,7 @@ class Part:
         cls,
         part_name: PackURI,
         content_type: AnyContentType,
-        blob: bytes = b"",
+        blob: bytes | BlobLoader = b"",
         rels_blob: bytes | None = None,
         is_external: bool = False,
     ) -> Self:
@@ -62,6 +77,36 @@ class Part:
         """
         return self._blob
 
+    @property
+    def _blob(self) -> bytes:
+        """部件的内容，延迟加载的部件在第一次访问时读取"""
+
+        if self._blob_bytes is None:
+            loader, self._blob_loader = self._blob_loader, None
+            self._blob_bytes = loader() if loader is not None else b""
+
+        return self._blob_bytes
+
+    def open_blob(self) -> IO[bytes]:
+        """
+        以流的方式打开部件的内容。
+
+        未读取的延迟加载部件(LazyBlob)直接从 zip 包中边解压边读取，不在内存中保留全部内容。
+        """
+
+        open_stream = getattr(self._blob_loader, "open", None)
+
+        if self._blob_bytes is None and open_stream is not None:
+            return open_stream()
+
+        return BytesIO(self._blob)
+
+    @property
+    def is_loaded(self) -> bool:
+        """部件的内容是否已经读取"""
+
+        return self._blob_bytes is not None
+
     @property
     def content_type(self):
         """
@@ -141,7 +186,7 @@ PART_TYPE_MAP: dict[AnyURI, type[Part]] = {}
 def PartFactory(
     partname: PackURI,
     content_type: AnyContentType,
-    blob: bytes,
+    blob: bytes | BlobLoader,
     rels_blob: bytes | None,
     is_external: bool,
 ):
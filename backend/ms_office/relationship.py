@@ -65,6 +65,8 @@ class Relationship:
 class RelationshipCollection:
     """
     |Relationship| 的集合对象 实例，具有列表语义。
+
+    同时按 rId、关系类型建立索引, 按 rId 或类型查找关系时不需要遍历整个集合。
     """
 
     def __init__(self, baseURI: PackURI, rels_blob: bytes | None = None):
@@ -73,6 +75,10 @@ class RelationshipCollection:
         self._relationships: list[Relationship] = []
         self._iter_idx = 0
 
+        # rId 重复时(不符合规范的包)保留第1个关系, 与按顺序查找的结果一致
+        self._rels_by_id: dict[str, Relationship] = {}
+        self._rels_by_type: dict[str, list[Relationship]] = {}
+
     def __getitem__(self, key: AnyStr) -> Relationship:
         """
         通过下标实现访问，例如 ``rels[9]``。
@@ -80,13 +86,18 @@ class RelationshipCollection:
         它还通过 rId 实现关系的字典式查找，例如 ``rels['rId1']``。
         """
         if isinstance(key, (str | bytes)):
-            for rel in self._relationships:
-                if rel.rId == key:
-                    return rel
-            raise KeyError(f"RelationshipCollection 中没有 rId 为 '{key!r}' 的关系")
+            rel = self._rels_by_id.get(key)  # type: ignore
+            if rel is None:
+                raise KeyError(
+                    f"RelationshipCollection 中没有 rId 为 '{key!r}' 的关系"
+                )
+            return rel
         else:
             return self._relationships.__getitem__(key)
 
+    def __iter__(self):
+        return iter(self._relationships)
+
     def __len__(self):
         """Implements len() built-in on this object"""
         return self._relationships.__len__()
@@ -103,6 +114,8 @@ class RelationshipCollection:
         """
         rel = Relationship(rId, reltype, target, self._baseURI, external)
         self._relationships.append(rel)
+        self._rels_by_id.setdefault(rId, rel)
+        self._rels_by_type.setdefault(reltype, []).append(rel)
         return rel
 
     def get_rel_by_type(self, reltype: RT_BASE):
@@ -110,7 +123,7 @@ class RelationshipCollection:
         从集合中返回类型为 *reltype* 的单一关系。 引发 |KeyError| 如果没有找到匹配关系。 引发 |ValueError| 如果找到多个匹配关系。
         """
 
-        matching = [rel for rel in self._relationships if rel.reltype == reltype]
+        matching = self._rels_by_type.get(reltype, [])  # type: ignore
 
         if len(matching) == 0:
             return None
@@ -125,30 +138,21 @@ class RelationshipCollection:
     def get_rel_by_type_and_id(self, reltype: RT_BASE, rid: str):
         """根据关系类型和ID返某个关系"""
 
-        matching = [
-            rel
-            for rel in self._relationships
-            if rel.reltype == reltype and rel.rId == rid
-        ]
+        rel = self._rels_by_id.get(rid)
 
-        if len(matching) == 0:
+        if rel is None or rel.reltype != reltype:
             return None
 
             # raise KeyError(f"集合中没有类型为: '{reltype}'的关系")
 
-        if len(matching) > 1:
-            raise ValueError(f"集合中关系类型为: '{reltype}' 和 '{rid}' 的大于1")
-
-        return matching[0]
+        return rel
 
     def get_rels_by_type(self, reltype: RT_BASE):
         """
         从集合中返回类型为 *reltype* 的单一关系。 引发 |KeyError| 如果没有找到匹配关系。 引发 |ValueError| 如果找到多个匹配关系。
         """
 
-        matching = [rel for rel in self._relationships if rel.reltype == reltype]
-
-        return matching
+        return list(self._rels_by_type.get(reltype, []))  # type: ignore
 
     @property
     def xml(self):
@@ -63,6 +63,12 @@ class Numbering:
         # 获取对应的抽象编号实例获取编号文本。
         return self.abstract_map[abstract_num_id].get_numbering_text(lvl_id)
 
+    def reset_numbering(self):
+        """重置所有编号的计数, 再次遍历文档时从起始值重新编号"""
+
+        for abstract_num in self.abstract_map.values():
+            abstract_num.re_init_other_lvl_num(-1)
+
     def get_lvl_style(self, numPr: CT_NumPr):
         lvl_id = numPr.ilvl.val_dec_num if numPr.ilvl is not None else 0
         num_id = int(numPr.numId.val_dec_num) if numPr.numId is not None else 0
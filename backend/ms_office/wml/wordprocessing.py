@@ -4,12 +4,18 @@
 
 import logging
 import sys
+from collections.abc import Iterator
 from typing import Any, NewType
 
+from lxml import etree
+
 from ..descriptor import lazyproperty
 from ..dml.chart import DiagrameChart
 from ..dml.theme import Theme
+from ..exceptions import RevisionMarkupError
+from ..oxml.base import lookup
 from ..oxml.vml.const import NS_MAP as namespaces
+from ..shared.constants import RELATIONSHIP_TYPE as SRT
 from ..shared.image import Image
 
 # from .slide import Slide
@@ -60,7 +66,12 @@ class WordProcessing:
 
         self.package: WordPackage = package
         self.part = part
-        self.oxml = part.oxml
+
+    @lazyproperty
+    def oxml(self):
+        """主文档的xml对象，第一次访问时才解析整个 document.xml"""
+
+        return self.part.oxml
 
     @property
     def is_review(self):
@@ -85,6 +96,45 @@ class WordProcessing:
 
         return False
 
+    def iter_body_elts(self) -> Iterator[Any]:
+        """流式解析 document.xml，逐个生成正文(w:body)的块级元素
+
+        基于 lxml 的 iterparse 以及 oxml 的元素类查找，生成的元素与 `body.block_level_elts` 中的相同；
+        每个元素在处理完(请求下一个元素)之后即被清除，内存占用只与最大的块级元素相关，与文档的大小无关。
+
+        遇到批注范围或修订(插入、删除)标记时抛出 |RevisionMarkupError|, 同 `is_review`。
+        """
+
+        from ..oxml.wml.main import EG_BlockLevelElts, qn
+
+        body_tag = qn("w:body")
+        review_tags = {qn("w:commentRangeStart"), qn("w:ins"), qn("w:del")}
+
+        with self.part.open_blob() as stream:
+            context = etree.iterparse(
+                stream,
+                events=("end",),
+                tag=EG_BlockLevelElts.block_level_elts_choice_tags,
+                remove_blank_text=True,
+            )
+            context.set_element_class_lookup(lookup)
+
+            for _event, elem in context:
+                if elem.tag in review_tags:
+                    raise RevisionMarkupError(f"正文中存在标记: {elem.tag}")
+
+                # 段落、表格中嵌套的元素随父元素一起处理
+                parent = elem.getparent()
+                if parent is None or parent.tag != body_tag:
+                    continue
+
+                yield elem
+
+                # 清除已处理的元素及其之前的兄弟元素
+                elem.clear(keep_tail=True)
+                while (prev := elem.getprevious()) is not None:
+                    parent.remove(prev)
+
     def close(self):
         """删除本次的解析包"""
 
@@ -184,6 +234,15 @@ class WordProcessing:
 
         return Image(image_part)
 
+    def get_images(self) -> list[Image]:
+        """获取主文档关联的所有图片, 不包含外部链接的图片"""
+
+        return [
+            Image(rel.target_part)
+            for rel in self.part.rels.get_rels_by_type(SRT.Image)
+            if not rel.is_external
+        ]
+
     def get_chart_data(self, rid: str):
         """获取跟当前docx关联的chart图形数据文件"""
 
@@ -0,0 +1,108 @@
+"""包关系查找、部件遍历的基准测试
+
+生成1个带有大量图片(默认2000张, 每张图片都是独立的部件)的docx, 测试:
+
+- 打开包(遍历所有部件、建立关系)的耗时
+- 按 rId 获取每张图片(`WordProcessing.get_image`)的耗时, 与逐个遍历关系的查找方式比较
+- 遍历包中所有部件(`package.parts`)的耗时
+
+    cd backend && python -m script.bench_relationships [--images 2000]
+"""
+
+import argparse
+import io
+import struct
+import time
+import zlib
+
+import docx
+from docx.shared import Pt
+
+from ms_office.api import open_docx
+from ms_office.relationship import RelationshipCollection
+from ms_office.shared.constants import RELATIONSHIP_TYPE as SRT
+
+
+def build_png(seed: int) -> bytes:
+    """1x1的png图片, 每个 seed 的像素颜色不同, 图片的sha1不同"""
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        body = tag + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+    ihdr = struct.pack(">IIBBBBB", 1, 1, 8, 2, 0, 0, 0)
+    pixel = b"\x00" + seed.to_bytes(3, "big")
+
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", ihdr)
+        + chunk(b"IDAT", zlib.compress(pixel))
+        + chunk(b"IEND", b"")
+    )
+
+
+def build_docx(total_images: int) -> bytes:
+    """生成测试用的docx"""
+
+    document = docx.Document()
+    paragraph = document.add_paragraph()
+
+    for idx in range(total_images):
+        run = paragraph.add_run()
+        run.add_picture(io.BytesIO(build_png(idx)), width=Pt(10), height=Pt(10))
+
+    buffer = io.BytesIO()
+    document.save(buffer)
+
+    return buffer.getvalue()
+
+
+def linear_rel_by_type_and_id(rels: RelationshipCollection, reltype: SRT, rid: str):
+    """建立索引之前的查找方式: 逐个比较集合中的关系"""
+
+    for idx in range(len(rels)):
+        rel = rels[idx]
+        if rel.reltype == reltype and rel.rId == rid:
+            return rel
+
+    return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--images", type=int, default=2000)
+    args = parser.parse_args()
+
+    docx_bytes = build_docx(args.images)
+    print(f"docx大小: {len(docx_bytes) / 1024:.0f}KB")
+
+    start = time.perf_counter()
+    wp = open_docx(io.BytesIO(docx_bytes))
+    print(f"打开包:       {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    rels = wp.part.rels
+    rids = [rel.rId for rel in rels.get_rels_by_type(SRT.Image)]
+    assert len(rids) == args.images
+
+    start = time.perf_counter()
+    images = [wp.get_image(rid) for rid in rids]
+    indexed_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    linear = [linear_rel_by_type_and_id(rels, SRT.Image, rid) for rid in rids]
+    linear_seconds = time.perf_counter() - start
+
+    assert [image.part for image in images] == [rel.target_part for rel in linear]
+
+    print(f"按rId获取图片: {indexed_seconds * 1000:.1f}ms (索引)")
+    print(f"按rId获取图片: {linear_seconds * 1000:.1f}ms (逐个比较)")
+
+    start = time.perf_counter()
+    parts = wp.package.parts
+    print(
+        f"遍历部件:     {(time.perf_counter() - start) * 1000:.1f}ms ({len(parts)}个)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""样式解析缓存的微基准测试
+
+生成1个带有30个样式(basedOn 样式链)、2万个run的docx, 分别用缓存和不用缓存的方式
+解析每个段落、run引用的样式，比较耗时并校验二者的结果一致。
+
+    cd backend && python -m script.bench_style_cache [--runs 20000] [--styles 30]
+"""
+
+import argparse
+import io
+import random
+import time
+from collections.abc import Callable
+from typing import Any
+
+import docx
+from docx.enum.style import WD_STYLE_TYPE
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.shared import Pt
+
+from app.mydocx.tools import style as style_tool
+from ms_office.api import open_docx
+from ms_office.oxml.wml.main import CT_P, CT_R
+
+
+def build_docx(total_runs: int, total_styles: int) -> bytes:
+    """生成测试用的docx"""
+
+    rnd = random.Random(0)
+    document = docx.Document()
+
+    paragraph_styles = []
+    for idx in range(total_styles):
+        p_style = document.styles.add_style(f"BenchPara{idx}", WD_STYLE_TYPE.PARAGRAPH)
+        # 每5个样式组成1条 basedOn 样式链
+        p_style.base_style = (
+            paragraph_styles[-1] if idx % 5 else document.styles["Normal"]
+        )
+        p_style.font.size = Pt(10 + idx % 6)
+        p_style.font.bold = idx % 2 == 0
+        p_style.paragraph_format.space_after = Pt(idx % 4)
+        p_style.paragraph_format.line_spacing = 1 + (idx % 3) * 0.25
+
+        # 依赖字号的缩进、段前间距
+        ppr = p_style.element.get_or_add_pPr()
+        ind = OxmlElement("w:ind")
+        ind.set(qn("w:firstLineChars"), str(100 * (idx % 3)))
+        ppr.append(ind)
+        spacing = ppr.find(qn("w:spacing"))
+        spacing.set(qn("w:before"), "120")
+        spacing.set(qn("w:beforeLines"), str(50 * (idx % 2)))
+
+        paragraph_styles.append(p_style)
+
+    character_styles = []
+    for idx in range(total_styles // 3):
+        c_style = document.styles.add_style(f"BenchChar{idx}", WD_STYLE_TYPE.CHARACTER)
+        c_style.font.italic = True
+        c_style.font.size = Pt(9 + idx)
+        character_styles.append(c_style)
+
+    created_runs = 0
+    while created_runs < total_runs:
+        paragraph = document.add_paragraph(style=rnd.choice(paragraph_styles))
+
+        for _ in range(rnd.randint(3, 12)):
+            run = paragraph.add_run("测试文本", style=rnd.choice(character_styles))
+            run.bold = rnd.random() < 0.3
+            created_runs += 1
+
+    buffer = io.BytesIO()
+    document.save(buffer)
+
+    return buffer.getvalue()
+
+
+def style_refs(docx_bytes: bytes) -> tuple[Any, list[tuple[str, str]]]:
+    """文档的样式表以及每个段落、run引用的样式ID"""
+
+    wp = open_docx(io.BytesIO(docx_bytes))
+
+    refs: list[tuple[str, str]] = []
+    for block in wp.iter_body_elts():
+        if not isinstance(block, CT_P):
+            continue
+
+        if block.pPr is not None and block.pPr.pStyle is not None:
+            refs.append(("paragraph", block.pPr.pStyle.val_str))
+
+        for r in block.p_content:
+            if isinstance(r, CT_R) and r.rPr is not None and r.rPr.rStyle is not None:
+                refs.append(("character", r.rPr.rStyle.val_str))
+
+    return wp, refs
+
+
+def resolve_all(
+    styles: Any,
+    refs: list[tuple[str, str]],
+    paragraph_func: Callable[..., dict[str, Any]],
+    character_func: Callable[..., dict[str, Any]],
+) -> list[dict[str, Any]]:
+    """按段落解析时的方式, 解析每个引用的样式"""
+
+    results: list[dict[str, Any]] = []
+    character_styles: dict[str, Any] = {"font-size": "12pt"}
+
+    for kind, style_id in refs:
+        if kind == "paragraph":
+            character_styles = character_func(styles, style_id, {"font-size": "12pt"})
+            results.append(
+                paragraph_func(
+                    styles, style_id, character_styles, {"text-indent": "24pt"}
+                )
+            )
+        else:
+            results.append(character_func(styles, style_id, character_styles.copy()))
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=20000)
+    parser.add_argument("--styles", type=int, default=30)
+    args = parser.parse_args()
+
+    wp, refs = style_refs(build_docx(args.runs, args.styles))
+    print(f"样式引用数: {len(refs)}")
+
+    start = time.perf_counter()
+    uncached = resolve_all(
+        wp.styles,
+        refs,
+        style_tool._apply_paragraph_styles_from_define,
+        style_tool._apply_character_styles_from_define,
+    )
+    uncached_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cached = resolve_all(
+        wp.styles,
+        refs,
+        style_tool.get_paragraph_styles_from_define,
+        style_tool.get_character_styles_from_define,
+    )
+    cached_seconds = time.perf_counter() - start
+
+    # 合并后的样式以及样式的顺序都要一致
+    assert [list(r.items()) for r in uncached] == [list(r.items()) for r in cached]
+
+    cache_size = len(style_tool.get_resolved_style_cache(wp.styles))
+    print(f"不使用缓存: {uncached_seconds * 1000:.1f}ms")
+    print(f"使用缓存:   {cached_seconds * 1000:.1f}ms (缓存条目: {cache_size})")
+    print(f"加速: {uncached_seconds / cached_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
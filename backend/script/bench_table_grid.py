@@ -0,0 +1,108 @@
+"""表格网格(跨行、跨列)计算的基准测试
+
+生成1个带有大表格(纵向合并第1列、横向合并部分单元格)的docx, 分别按不同的行数计算表格的网格
+以及解析整个表格，比较耗时随行数的增长，耗时应与行数成线性关系。
+
+    cd backend && python -m script.bench_table_grid [--rows 2000] [--cols 6] [--parse]
+"""
+
+import argparse
+import io
+import time
+
+import docx
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+
+from app.mydocx.entry import Extract, RenderFormat
+from app.mydocx.tools.style import gen_table_grid
+from ms_office.api import open_docx
+from ms_office.oxml.wml.main import CT_Tbl
+
+
+def build_docx(total_rows: int, total_cols: int) -> bytes:
+    """生成测试用的docx"""
+
+    rows_xml: list[str] = []
+
+    for r_no in range(total_rows):
+        cells_xml: list[str] = []
+        c_no = 0
+
+        while c_no < total_cols:
+            tcpr = ""
+            colspan = 1
+
+            # 第1列每5行纵向合并, 类似设备清单中的分类
+            if c_no == 0:
+                tcpr = '<w:vMerge w:val="restart"/>' if r_no % 5 == 0 else "<w:vMerge/>"
+
+            # 每7行的第2、3列横向合并
+            elif c_no == 1 and r_no % 7 == 0:
+                colspan = 2
+                tcpr = f'<w:gridSpan w:val="{colspan}"/>'
+
+            cells_xml.append(
+                f"<w:tc><w:tcPr>{tcpr}</w:tcPr>"
+                f"<w:p><w:r><w:t>r{r_no}c{c_no}</w:t></w:r></w:p></w:tc>"
+            )
+            c_no += colspan
+
+        rows_xml.append(f"<w:tr>{''.join(cells_xml)}</w:tr>")
+
+    grid_xml = "<w:gridCol/>" * total_cols
+    tbl = parse_xml(
+        f"<w:tbl {nsdecls('w')}><w:tblPr/><w:tblGrid>{grid_xml}</w:tblGrid>"
+        f"{''.join(rows_xml)}</w:tbl>"
+    )
+
+    document = docx.Document()
+    document.element.body.insert(0, tbl)
+
+    buffer = io.BytesIO()
+    document.save(buffer)
+
+    return buffer.getvalue()
+
+
+def first_table(docx_bytes: bytes) -> CT_Tbl:
+    wp = open_docx(io.BytesIO(docx_bytes))
+
+    return next(ele for ele in wp.iter_body_elts() if isinstance(ele, CT_Tbl))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--cols", type=int, default=6)
+    parser.add_argument("--parse", action="store_true", help="同时解析整个表格为html")
+    args = parser.parse_args()
+
+    prev_seconds: float | None = None
+
+    for total_rows in (args.rows // 4, args.rows // 2, args.rows):
+        docx_bytes = build_docx(total_rows, args.cols)
+        tbl = first_table(docx_bytes)
+
+        start = time.perf_counter()
+        grid = gen_table_grid(tbl)
+        seconds = time.perf_counter() - start
+
+        # 每个纵向合并的起始单元格跨5行
+        assert grid[0][0].rowspan == 5 and grid[1][0].covered
+
+        growth = f"{seconds / prev_seconds:.1f}x" if prev_seconds else "-"
+        print(
+            f"{total_rows}行: 网格 {seconds * 1000:.1f}ms "
+            f"(每行 {seconds / total_rows * 1e6:.1f}us, 增长 {growth})"
+        )
+        prev_seconds = seconds
+
+        if args.parse:
+            start = time.perf_counter()
+            Extract(io.BytesIO(docx_bytes), use_oss=False).parse(RenderFormat.html)
+            print(f"    解析html: {(time.perf_counter() - start) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""热点查询的执行计划
+
+在内存 sqlite 中按模型(`SQLModel.metadata`)建表, 执行接口、审查任务中的查询并记录实际的SQL,
+对每条查询执行 `EXPLAIN QUERY PLAN`, 检查使用了对应的复合索引, 且没有全表扫描(SCAN)和临时排序(USE TEMP B-TREE)。
+索引被删除、查询条件与索引不再匹配时失败。
+
+测试的表中只有几行数据, 索引的统计信息(sqlite_stat1)按生产数据的分布模拟:
+`is_delete` 几乎都为 False, 区分度很低, 其他列每个值约占 1%, 与 MySQL 根据统计信息选择索引一致。
+"""
+
+import re
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+from sqlalchemy.dialects.mysql import LONGTEXT, MEDIUMTEXT
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+import app.models  # noqa: F401
+from app.api.routes.documents import (
+    DocumentContentReviewRoute,
+    DocumentContentRoute,
+    ProjectsRoute,
+)
+from app.api.schems import UserinfoResp
+from app.core.config import settings
+from app.models.documents import (
+    Document,
+    DocumentContent,
+    DocumentSectionReview,
+    Project,
+)
+from app.models.enums import FileCategory, ForSection, ProjectTypeEnum, SectionType
+from app.tasks.reviews import reuse_prior_review
+
+
+@compiles(MEDIUMTEXT, "sqlite")
+@compiles(LONGTEXT, "sqlite")
+def _compile_text(*_args, **_kwargs) -> str:
+    return "TEXT"
+
+
+USER = UserinfoResp(id="user-1", username="user-1", name="用户", orgId="org-1")
+SUPERUSER = UserinfoResp(
+    id="admin", username=settings.SUPERUSER_USERNAME, name="管理员", orgId="org-1"
+)
+
+
+# 模拟的统计信息: 表的行数, 以及每列的值筛选后剩余行数的比例
+STAT_ROWS = 100_000
+STAT_SELECTIVITY = {"is_delete": 0.9}
+STAT_DEFAULT_SELECTIVITY = 0.01
+
+
+def seed_index_stats(engine: Engine) -> None:
+    """按生产数据的分布写入所有索引的统计信息"""
+
+    rows = []
+
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            stat = [STAT_ROWS]
+            remaining = float(STAT_ROWS)
+
+            for column in index.columns:
+                remaining *= STAT_SELECTIVITY.get(column.name, STAT_DEFAULT_SELECTIVITY)
+                stat.append(max(round(remaining), 1))
+
+            rows.append((table.name, index.name, " ".join(map(str, stat))))
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+        conn.exec_driver_sql("DELETE FROM sqlite_stat1")
+
+        for row in rows:
+            conn.exec_driver_sql("INSERT INTO sqlite_stat1 VALUES (?, ?, ?)", row)
+
+        conn.exec_driver_sql("ANALYZE sqlite_schema")
+
+
+@pytest.fixture
+def engine() -> Iterator[Engine]:
+    # 内存数据库只有1个连接, 统计信息在所有会话中生效
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    seed_index_stats(engine)
+
+    yield engine
+
+    engine.dispose()
+
+
+@pytest.fixture
+def session(engine: Engine) -> Iterator[Session]:
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture
+def dcontent(session: Session) -> DocumentContent:
+    """第2次提交的三措文档的某节内容, 第1次提交中该节已审查过"""
+
+    project = Project(
+        name="工程", type=ProjectTypeEnum.TRNAS, iscuser_id=USER.id, version=2
+    )
+    session.add(project)
+    session.flush()
+
+    contents: list[DocumentContent] = []
+
+    for version in (1, 2):
+        document = Document(
+            file_name="三措.docx",
+            file_suffix="docx",
+            file_size=1,
+            file_category=FileCategory.THREESTEP,
+            save_path="三措.docx",
+            iscuser_id=USER.id,
+            proj_id=project.id,
+            proj_version=version,
+        )
+        session.add(document)
+        session.flush()
+
+        content = DocumentContent(
+            section=SectionType.one,
+            content="内容",
+            suggestion="",
+            iscuser_id=USER.id,
+            proj_id=project.id,
+            proj_version=version,
+            doc_id=document.id,
+        )
+        session.add(content)
+        session.flush()
+        contents.append(content)
+
+    session.add(
+        DocumentSectionReview(
+            proj_id=project.id,
+            proj_version=1,
+            content_id=contents[0].id,
+            section=SectionType.one,
+            for_section=ForSection.one,
+            review_hash="hash",
+            review_pass=True,
+        )
+    )
+    session.commit()
+
+    return contents[1]
+
+
+@contextmanager
+def capture_selects(engine: Engine, table: str) -> Iterator[list[tuple[str, tuple]]]:
+    """记录执行的查询某个表的SELECT语句及其参数"""
+
+    statements: list[tuple[str, tuple]] = []
+    from_table = re.compile(rf"\bFROM {table}\b")
+
+    def _before_cursor_execute(_conn, _cursor, statement, parameters, *_args) -> None:
+        if statement.lstrip().upper().startswith("SELECT") and from_table.search(
+            statement
+        ):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", _before_cursor_execute)
+
+
+def assert_plans_use_index(
+    engine: Engine, statements: list[tuple[str, tuple]], index: str
+) -> None:
+    assert statements, "没有执行查询"
+
+    with engine.connect() as conn:
+        for statement, parameters in statements:
+            rows = conn.exec_driver_sql(
+                f"EXPLAIN QUERY PLAN {statement}", parameters
+            ).all()
+            plan = "\n".join(row[-1] for row in rows)
+
+            assert index in plan, f"{statement}\n{plan}"
+            assert "SCAN" not in plan, f"{statement}\n{plan}"
+            assert "USE TEMP B-TREE" not in plan, f"{statement}\n{plan}"
+
+
+@pytest.mark.parametrize(
+    ("uinfo", "index"),
+    [
+        (USER, "ix_project_iscuser_id_is_delete_update_at"),
+        (SUPERUSER, "ix_project_is_delete_update_at"),
+    ],
+)
+def test_read_projects(
+    engine: Engine, session: Session, uinfo: UserinfoResp, index: str
+) -> None:
+    with capture_selects(engine, "project") as statements:
+        ProjectsRoute().read_projects(session, uinfo)
+
+    assert_plans_use_index(engine, statements, index)
+
+
+@pytest.mark.parametrize("uinfo", [USER, SUPERUSER])
+def test_get_project_reviews(
+    engine: Engine, session: Session, dcontent: DocumentContent, uinfo: UserinfoResp
+) -> None:
+    proj_id, version = dcontent.proj_id, dcontent.proj_version
+
+    with (
+        capture_selects(engine, "document") as document_statements,
+        capture_selects(engine, "documentcontent") as content_statements,
+    ):
+        ProjectsRoute().get_project_reviews(session, uinfo, proj_id, version)
+
+    assert_plans_use_index(
+        engine, document_statements, "ix_document_proj_id_proj_version_file_category"
+    )
+    assert_plans_use_index(
+        engine, content_statements, "ix_documentcontent_doc_id_section"
+    )
+
+
+@pytest.mark.parametrize("uinfo", [USER, SUPERUSER])
+def test_read_document_content(
+    engine: Engine, session: Session, uinfo: UserinfoResp
+) -> None:
+    with capture_selects(engine, "documentcontent") as statements:
+        with pytest.raises(HTTPException):
+            DocumentContentRoute().read_document_content(
+                session, uinfo, uuid.uuid4(), SectionType.one
+            )
+
+    assert_plans_use_index(engine, statements, "ix_documentcontent_doc_id_section")
+
+
+@pytest.mark.parametrize("uinfo", [USER, SUPERUSER])
+def test_read_proj_content_reviews(
+    engine: Engine, session: Session, uinfo: UserinfoResp
+) -> None:
+    with capture_selects(engine, "documentcontentreview") as statements:
+        DocumentContentReviewRoute().read_proj_content_reviews(
+            session, uinfo, uuid.uuid4(), 1
+        )
+
+    assert_plans_use_index(
+        engine, statements, "ix_documentcontentreview_proj_id_proj_version"
+    )
+
+
+def test_reuse_prior_review(
+    engine: Engine, session: Session, dcontent: DocumentContent
+) -> None:
+    with capture_selects(engine, "documentcontentreview") as statements:
+        assert reuse_prior_review(session, dcontent, ForSection.one, "hash") is not None
+
+    assert_plans_use_index(
+        engine, statements, "ix_documentcontentreview_content_id_for_section"
+    )